@@ -147,8 +147,7 @@ def main(argv):
         input_shape=(224, 224, 3),
         num_classes=NUM_CLASSES,
         ensemble_size=FLAGS.ensemble_size,
-        random_sign_init=FLAGS.random_sign_init,
-        use_tpu=not FLAGS.use_gpu)
+        random_sign_init=FLAGS.random_sign_init)
     logging.info('Model input shape: %s', model.input_shape)
     logging.info('Model output shape: %s', model.output_shape)
     logging.info('Model number of weights: %s', model.count_params())
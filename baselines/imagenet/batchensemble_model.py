@@ -44,8 +44,7 @@ def bottleneck_block(inputs,
                      block,
                      strides,
                      ensemble_size,
-                     random_sign_init,
-                     use_tpu):
+                     random_sign_init):
   """Residual block with 1x1 -> 3x3 -> 1x1 convs in main path.
 
   Note that strides appear in the second conv (3x3) rather than the first (1x1).
@@ -62,7 +61,6 @@ def bottleneck_block(inputs,
         single model case.
     random_sign_init: whether uses random sign initializer to initializer
         the fast weights.
-    use_tpu: whether the model runs on TPU.
 
   Returns:
     tf.Tensor.
@@ -83,7 +81,6 @@ def bottleneck_block(inputs,
   x = ed.layers.ensemble_batchnorm(
       x,
       ensemble_size=ensemble_size,
-      use_tpu=use_tpu,
       momentum=BATCH_NORM_DECAY,
       epsilon=BATCH_NORM_EPSILON,
       name=bn_name_base+'2a')
@@ -103,7 +100,6 @@ def bottleneck_block(inputs,
   x = ed.layers.ensemble_batchnorm(
       x,
       ensemble_size=ensemble_size,
-      use_tpu=use_tpu,
       momentum=BATCH_NORM_DECAY,
       epsilon=BATCH_NORM_EPSILON,
       name=bn_name_base+'2b')
@@ -121,7 +117,6 @@ def bottleneck_block(inputs,
   x = ed.layers.ensemble_batchnorm(
       x,
       ensemble_size=ensemble_size,
-      use_tpu=use_tpu,
       momentum=BATCH_NORM_DECAY,
       epsilon=BATCH_NORM_EPSILON,
       name=bn_name_base+'2c')
@@ -141,7 +136,6 @@ def bottleneck_block(inputs,
     shortcut = ed.layers.ensemble_batchnorm(
         shortcut,
         ensemble_size=ensemble_size,
-        use_tpu=use_tpu,
         momentum=BATCH_NORM_DECAY,
         epsilon=BATCH_NORM_EPSILON,
         name=bn_name_base+'1')
@@ -152,14 +146,13 @@ def bottleneck_block(inputs,
 
 
 def group(inputs, filters, num_blocks, stage, strides,
-          ensemble_size, random_sign_init, use_tpu):
+          ensemble_size, random_sign_init):
   """Group of residual blocks."""
   bottleneck_block_ = functools.partial(bottleneck_block,
                                         filters=filters,
                                         stage=stage,
                                         ensemble_size=ensemble_size,
-                                        random_sign_init=random_sign_init,
-                                        use_tpu=use_tpu)
+                                        random_sign_init=random_sign_init)
   blocks = string.ascii_lowercase
   x = bottleneck_block_(inputs, block=blocks[0], strides=strides)
   for i in range(num_blocks - 1):
@@ -170,8 +163,7 @@ def group(inputs, filters, num_blocks, stage, strides,
 def ensemble_resnet50(input_shape,
                       num_classes,
                       ensemble_size,
-                      random_sign_init,
-                      use_tpu):
+                      random_sign_init):
   """Builds BatchEnsemble ResNet50.
 
   Using strided conv, pooling, four groups of residual blocks, and pooling, the
@@ -183,14 +175,12 @@ def ensemble_resnet50(input_shape,
     num_classes: Number of output classes.
     ensemble_size: Ensemble size.
     random_sign_init: float, probability of RandomSign initializer.
-    use_tpu: whether the model runs on TPU.
 
   Returns:
     tf.keras.Model.
   """
   group_ = functools.partial(group,
                              ensemble_size=ensemble_size,
-                             use_tpu=use_tpu,
                              random_sign_init=random_sign_init)
   inputs = tf.keras.layers.Input(shape=input_shape)
   x = tf.keras.layers.ZeroPadding2D(padding=3, name='conv1_pad')(inputs)
@@ -208,7 +198,6 @@ def ensemble_resnet50(input_shape,
   x = ed.layers.ensemble_batchnorm(
       x,
       ensemble_size=ensemble_size,
-      use_tpu=use_tpu,
       momentum=BATCH_NORM_DECAY,
       epsilon=BATCH_NORM_EPSILON,
       name='bn_conv1')
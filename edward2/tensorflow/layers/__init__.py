@@ -39,6 +39,7 @@ from edward2.tensorflow.layers.discrete_flows import SinkhornAutoregressiveFlow
 from edward2.tensorflow.layers.gaussian_process import ExponentiatedQuadratic
 from edward2.tensorflow.layers.gaussian_process import GaussianProcess
 from edward2.tensorflow.layers.gaussian_process import LinearKernel
+from edward2.tensorflow.layers.gaussian_process import RandomFeatureGaussianProcess
 from edward2.tensorflow.layers.gaussian_process import SparseGaussianProcess
 from edward2.tensorflow.layers.gaussian_process import Zeros
 from edward2.tensorflow.layers.made import MADE
@@ -48,9 +49,12 @@ from edward2.tensorflow.layers.noise import NCPCategoricalPerturb
 from edward2.tensorflow.layers.noise import NCPNormalOutput
 from edward2.tensorflow.layers.noise import NCPNormalPerturb
 from edward2.tensorflow.layers.normalization import ActNorm
+from edward2.tensorflow.layers.normalization import EnsembleBatchNormalization
 from edward2.tensorflow.layers.normalization import ensemble_batchnorm
 from edward2.tensorflow.layers.recurrent import LSTMCellFlipout
 from edward2.tensorflow.layers.recurrent import LSTMCellReparameterization
+from edward2.tensorflow.layers.recurrent import LSTMFlipout
+from edward2.tensorflow.layers.recurrent import LSTMReparameterization
 from edward2.tensorflow.layers.stochastic_output import MixtureLogistic
 
 from tensorflow.python.util.all_util import remove_undocumented  # pylint: disable=g-direct-tensorflow-import
@@ -72,17 +76,21 @@ _allowed_symbols = [
     "DenseVariationalDropout",
     "DiscreteAutoregressiveFlow",
     "DiscreteBipartiteFlow",
+    "EnsembleBatchNormalization",
     "ExponentiatedQuadratic",
     "GaussianProcess",
     "LinearKernel",
     "LSTMCellFlipout",
     "LSTMCellReparameterization",
+    "LSTMFlipout",
+    "LSTMReparameterization",
     "MADE",
     "MixtureLogistic",
     "NCPCategoricalPerturb",
     "NCPNormalOutput",
     "NCPNormalPerturb",
     "NeuralProcess",
+    "RandomFeatureGaussianProcess",
     "Reverse",
     "SinkhornAutoregressiveFlow",
     "SparseGaussianProcess",
@@ -20,8 +20,11 @@ from __future__ import division
 from __future__ import print_function
 
 from edward2.tensorflow import generated_random_variables
+from edward2.tensorflow.layers import gaussian_process
+from edward2.tensorflow.layers import utils
 
 import tensorflow.compat.v2 as tf
+import tensorflow_probability as tfp
 
 
 class BayesianLinearModel(tf.keras.Model):
@@ -37,48 +40,221 @@ class BayesianLinearModel(tf.keras.Model):
   It takes a Tensor of shape [batch_size, input_dim] as input and returns a
   Normal random variable of shape [batch_size] representing its outputs.
   After `fit()`, the forward pass computes the exact posterior predictive
-  distribution.
+  distribution. `partial_fit()` updates the posterior with a batch of data,
+  so the model can be fit by streaming over batches, e.g., from a
+  `tf.data.Dataset`.
+
+  The model also fits K independent outputs that share their inputs, i.e.,
+  outputs of shape [batch_size, K]. With a scalar `noise_variance`, all outputs
+  share one Cholesky factor of the coefficients' precision. With per-output
+  noise variances of shape [K], the precisions differ only in scale along the
+  eigenvectors of x^T x, so all outputs share one eigendecomposition.
   """
 
-  def __init__(self, noise_variance, **kwargs):
+  def __init__(self, noise_variance, full_covariance=False, chunk_size=None,
+               **kwargs):
+    """Constructs model.
+
+    Args:
+      noise_variance: float or Tensor of shape [K], observation noise variance,
+        either shared by or specified per output.
+      full_covariance: bool, whether the forward pass returns a multivariate
+        normal that is correlated across inputs. Its covariance is kept as a
+        rank-D factor. By default, it returns independent normals with only the
+        marginal variances, which costs O(batch_size D^2) time and no
+        [batch_size, batch_size] memory. For K outputs, the outputs are
+        independent multivariate normals, one per output, arranged as
+        [batch_size, K].
+      chunk_size: Optional integer. If specified, marginal predictions are
+        computed chunk_size inputs at a time, so memory beyond the inputs and
+        outputs does not grow with batch_size.
+      **kwargs: kwargs passed to parent class.
+    """
     super(BayesianLinearModel, self).__init__(**kwargs)
     self.noise_variance = noise_variance
+    self.full_covariance = full_covariance
+    self.chunk_size = chunk_size
     self.coeffs_precision_tril_op = None
+    # Eigendecomposition of x^T x, used instead of the Cholesky factor when
+    # noise variances are per output.
+    self.inputs_gram_eigenvalues = None
+    self.inputs_gram_eigenvectors = None
     self.coeffs_mean = None
+    # Sufficient statistic x^T y accumulated over all data seen so far. The
+    # other sufficient statistic, x^T x, is held in the precision's factor.
+    self.inputs_dot_outputs = None
 
   def call(self, inputs):
-    if self.coeffs_mean is None and self.coeffs_precision_tril_op is None:
-      # p(mean(ynew) | xnew) = Normal(ynew | mean = 0, variance = xnew xnew^T)
-      predictive_mean = 0.
-      predictive_variance = tf.reduce_sum(tf.square(inputs), axis=-1)
+    if self.full_covariance:
+      # The predictive covariance is v^T diag(weights) v with rank at most D;
+      # see _predictive_factor(). Keep it in low-rank form plus jitter.
+      v, weights = self._predictive_factor(inputs)
+      loc = self._predictive_mean(inputs)
+      cov_perturb_factor = tf.transpose(v)
+      if loc.shape.ndims == 2:
+        loc = tf.transpose(loc)
+        if weights is not None:
+          cov_perturb_factor = (cov_perturb_factor[tf.newaxis] *
+                                tf.transpose(tf.sqrt(weights))[:, tf.newaxis])
+      cov_diag_factor = tf.fill(tf.shape(loc), tf.keras.backend.epsilon())
+      random_variable = (
+          generated_random_variables
+          .MultivariateNormalDiagPlusLowRankCovariance(
+              loc=loc,
+              cov_diag_factor=cov_diag_factor,
+              cov_perturb_factor=cov_perturb_factor))
+      if loc.shape.ndims == 2:
+        # Transpose the per-output multivariate normals to [batch_size, K],
+        # matching the marginal predictive.
+        return gaussian_process._units_last(  # pylint: disable=protected-access
+            random_variable.distribution)
+      return random_variable
+
+    def predictive_moments(inputs):
+      v, weights = self._predictive_factor(inputs)
+      if weights is None:
+        predictive_variance = tf.reduce_sum(tf.square(v), axis=0)
+      else:
+        predictive_variance = tf.matmul(tf.square(v), weights,
+                                        transpose_a=True)
+      predictive_mean = self._predictive_mean(inputs)
+      if predictive_mean.shape.ndims > predictive_variance.shape.ndims:
+        # Outputs with a shared noise variance share predictive variances.
+        predictive_variance = tf.broadcast_to(
+            predictive_variance[:, tf.newaxis], tf.shape(predictive_mean))
+      return predictive_mean, predictive_variance
+
+    if self.chunk_size is None:
+      predictive_mean, predictive_variance = predictive_moments(inputs)
     else:
-      # p(mean(ynew) | xnew, x, y) = Normal(ynew |
-      #   mean = xnew (1/noise_variance) (1/noise_variance x^T x + I)^{-1}x^T y,
-      #   variance = xnew (1/noise_variance x^T x + I)^{-1} xnew^T)
-      predictive_mean = tf.einsum('nm,m->n', inputs, self.coeffs_mean)
-      predictive_covariance = tf.matmul(
+      inputs = tf.convert_to_tensor(inputs, dtype=self.dtype)
+      predictive_mean, predictive_variance = utils.map_chunks(
+          predictive_moments,
           inputs,
-          self.coeffs_precision_tril_op.solve(
-              self.coeffs_precision_tril_op.solve(inputs, adjoint_arg=True),
-              adjoint=True))
-      predictive_variance = tf.linalg.tensor_diag_part(predictive_covariance)
+          self.chunk_size,
+          fn_output_signature=(inputs.dtype, inputs.dtype))
     return generated_random_variables.Normal(loc=predictive_mean,
                                              scale=tf.sqrt(predictive_variance))
 
+  def _predictive_mean(self, inputs):
+    """Returns the predictive mean of shape [batch_size] or [batch_size, K]."""
+    if self.coeffs_mean is None:
+      # p(mean(ynew) | xnew) = Normal(ynew | mean = 0, variance = xnew xnew^T)
+      return tf.zeros(tf.concat([tf.shape(inputs)[:1],
+                                 tf.shape(self.noise_variance)], 0),
+                      inputs.dtype)
+    # p(mean(ynew) | xnew, x, y) = Normal(ynew |
+    #   mean = xnew (1/noise_variance) (1/noise_variance x^T x + I)^{-1}x^T y,
+    #   variance = xnew (1/noise_variance x^T x + I)^{-1} xnew^T)
+    return tf.tensordot(inputs, self.coeffs_mean, [[1], [0]])
+
+  def _predictive_factor(self, inputs):
+    """Returns v of shape [D, batch_size] and optional weights of shape [D, K].
+
+    The predictive covariance of output k is v^T diag(weights[:, k]) v, or v^T v
+    if weights is None.
+
+    Args:
+      inputs: Tensor of shape [batch_size, D].
+    """
+    if self.inputs_gram_eigenvectors is not None:
+      # With x^T x = Q diag(lambda) Q^T, output k's precision inverse is
+      # Q diag(noise_variance[k] / (noise_variance[k] + lambda)) Q^T.
+      noise_variance = tf.cast(self.noise_variance, inputs.dtype)
+      weights = noise_variance / (noise_variance +
+                                  self.inputs_gram_eigenvalues[:, tf.newaxis])
+      return tf.matmul(self.inputs_gram_eigenvectors, inputs,
+                       transpose_a=True, transpose_b=True), weights
+    if self.coeffs_precision_tril_op is None:
+      return tf.transpose(inputs), None
+    # xnew P^{-1} xnew^T = v^T v, where v = L^{-1} xnew^T and P = L L^T.
+    return self.coeffs_precision_tril_op.solve(inputs, adjoint_arg=True), None
+
   def fit(self, x=None, y=None):
     # p(coeffs | x, y) = Normal(coeffs |
     #   mean = (1/noise_variance) (1/noise_variance x^T x + I)^{-1} x^T y,
     #   covariance = (1/noise_variance x^T x + I)^{-1})
-    # TODO(trandustin): We newly fit the data at each call. Extend to do
-    # Bayesian updating.
-    kernel_matrix = tf.matmul(x, x, transpose_a=True) / self.noise_variance
-    coeffs_precision = tf.linalg.set_diag(
-        kernel_matrix, tf.linalg.diag_part(kernel_matrix) + 1.)
-    coeffs_precision_tril = tf.linalg.cholesky(coeffs_precision)
+    # This refits from scratch; use partial_fit() to update the posterior.
+    x = tf.convert_to_tensor(x, dtype=self.dtype)
+    y = tf.convert_to_tensor(y, dtype=self.dtype)
+    self.inputs_dot_outputs = tf.tensordot(x, y, [[0], [0]])
+    kernel_matrix = tf.matmul(x, x, transpose_a=True)
+    if _is_per_output(self.noise_variance):
+      noise_variance = tf.cast(self.noise_variance, x.dtype)
+      eigenvalues, eigenvectors = tf.linalg.eigh(kernel_matrix)
+      self.inputs_gram_eigenvalues = tf.maximum(eigenvalues, 0.)
+      self.inputs_gram_eigenvectors = eigenvectors
+      self.coeffs_precision_tril_op = None
+      # Solve all outputs' systems at once in the shared eigenbasis.
+      projection = tf.matmul(eigenvectors, self.inputs_dot_outputs,
+                             transpose_a=True)
+      projection /= (noise_variance +
+                     self.inputs_gram_eigenvalues[:, tf.newaxis])
+      self.coeffs_mean = tf.matmul(eigenvectors, projection)
+    else:
+      kernel_matrix /= self.noise_variance
+      coeffs_precision = tf.linalg.set_diag(
+          kernel_matrix, tf.linalg.diag_part(kernel_matrix) + 1.)
+      coeffs_precision_tril = tf.linalg.cholesky(coeffs_precision)
+      self.coeffs_precision_tril_op = tf.linalg.LinearOperatorLowerTriangular(
+          coeffs_precision_tril)
+      self._solve_coeffs_mean()
+    # TODO(trandustin): To be fully Keras-compatible, return History object.
+    return
+
+  def partial_fit(self, x, y):
+    """Updates the posterior with a batch of data.
+
+    The posterior after any sequence of `partial_fit()` calls is the same as
+    after one `fit()` on all of the data, but each call costs O(batch_size D^2)
+    instead of O(N D^2 + D^3) for N data points seen so far and D features.
+
+    Args:
+      x: Tensor of shape [batch_size, D].
+      y: Tensor of shape [batch_size] or [batch_size, K].
+
+    Raises:
+      ValueError: If `noise_variance` is per output; the shared
+        eigendecomposition has no cheap update.
+    """
+    if _is_per_output(self.noise_variance):
+      raise ValueError('partial_fit requires a scalar noise_variance.')
+    x = tf.convert_to_tensor(x, dtype=self.dtype)
+    y = tf.convert_to_tensor(y, dtype=self.dtype)
+    if self.coeffs_precision_tril_op is None:
+      # The prior precision is the identity.
+      num_features = tf.compat.dimension_value(x.shape[-1])
+      coeffs_precision_tril = tf.eye(num_features, dtype=x.dtype)
+      self.inputs_dot_outputs = tf.zeros(
+          tf.concat([[num_features], tf.shape(y)[1:]], 0), dtype=x.dtype)
+    else:
+      coeffs_precision_tril = self.coeffs_precision_tril_op.to_dense()
+    # Adding x^T x / noise_variance to the precision is one rank-one update of
+    # its Cholesky factor per data point.
+    coeffs_precision_tril = tf.foldl(
+        tfp.math.cholesky_update,
+        x / tf.sqrt(tf.cast(self.noise_variance, x.dtype)),
+        initializer=coeffs_precision_tril)
     self.coeffs_precision_tril_op = tf.linalg.LinearOperatorLowerTriangular(
         coeffs_precision_tril)
-    self.coeffs_mean = self.coeffs_precision_tril_op.solvevec(
-        self.coeffs_precision_tril_op.solvevec(tf.einsum('nm,n->m', x, y)),
+    self.inputs_dot_outputs += tf.tensordot(x, y, [[0], [0]])
+    self._solve_coeffs_mean()
+
+  def _solve_coeffs_mean(self):
+    """Solves for the coefficients' mean given the precision's factor."""
+    # All outputs share the factor, so one pair of triangular solves handles
+    # them together.
+    inputs_dot_outputs = self.inputs_dot_outputs
+    if inputs_dot_outputs.shape.ndims == 1:
+      inputs_dot_outputs = inputs_dot_outputs[:, tf.newaxis]
+    coeffs_mean = self.coeffs_precision_tril_op.solve(
+        self.coeffs_precision_tril_op.solve(inputs_dot_outputs),
         adjoint=True) / self.noise_variance
-    # TODO(trandustin): To be fully Keras-compatible, return History object.
-    return
+    if self.inputs_dot_outputs.shape.ndims == 1:
+      coeffs_mean = coeffs_mean[:, 0]
+    self.coeffs_mean = coeffs_mean
+
+
+def _is_per_output(noise_variance):
+  """Returns whether noise_variance has one entry per output."""
+  return tf.convert_to_tensor(noise_variance).shape.ndims == 1
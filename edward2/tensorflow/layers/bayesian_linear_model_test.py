@@ -55,6 +55,121 @@ class BayesianLinearModelTest(tf.test.TestCase):
     self.assertAllClose(test_predictions, test_labels, atol=0.1)
     self.assertAllLessEqual(test_predictions_variance, noise_variance)
 
+  def testBayesianLinearModelPartialFit(self):
+    """Tests that streaming over batches matches fitting on all data."""
+    np.random.seed(42)
+    num_features = 3
+    noise_variance = 0.1
+    features = np.random.randn(10, num_features).astype(np.float32)
+    labels = np.random.randn(10).astype(np.float32)
+    test_features = np.random.randn(4, num_features).astype(np.float32)
+
+    model = ed.layers.BayesianLinearModel(noise_variance=noise_variance)
+    model.fit(features, labels)
+    outputs = model(test_features)
+
+    streaming_model = ed.layers.BayesianLinearModel(
+        noise_variance=noise_variance)
+    dataset = tf.data.Dataset.from_tensor_slices((features, labels)).batch(4)
+    for x, y in dataset:
+      streaming_model.partial_fit(x, y)
+    streaming_outputs = streaming_model(test_features)
+    self.assertAllClose(streaming_outputs.distribution.mean(),
+                        outputs.distribution.mean(), atol=1e-4)
+    self.assertAllClose(streaming_outputs.distribution.variance(),
+                        outputs.distribution.variance(), atol=1e-4)
+
+    # Continue updating a model fit with fit().
+    model.fit(features[:6], labels[:6])
+    model.partial_fit(features[6:], labels[6:])
+    self.assertAllClose(model(test_features).distribution.mean(),
+                        outputs.distribution.mean(), atol=1e-4)
+
+  def testBayesianLinearModelPredictive(self):
+    np.random.seed(42)
+    num_features = 3
+    features = np.random.randn(10, num_features).astype(np.float32)
+    labels = np.random.randn(10).astype(np.float32)
+    test_features = np.random.randn(7, num_features).astype(np.float32)
+    model = ed.layers.BayesianLinearModel(noise_variance=0.1)
+    full_model = ed.layers.BayesianLinearModel(noise_variance=0.1,
+                                               full_covariance=True)
+    chunked_model = ed.layers.BayesianLinearModel(noise_variance=0.1,
+                                                  chunk_size=3)
+    for fit in [False, True]:
+      if fit:
+        for m in [model, full_model, chunked_model]:
+          m.fit(features, labels)
+      outputs = model(test_features)
+      full_outputs = full_model(test_features)
+      chunked_outputs = chunked_model(test_features)
+      if fit:
+        precision = features.T.dot(features) / 0.1 + np.eye(num_features)
+        expected_covariance = test_features.dot(
+            np.linalg.inv(precision)).dot(test_features.T)
+      else:
+        expected_covariance = test_features.dot(test_features.T)
+      self.assertEqual(full_outputs.shape, (7,))
+      self.assertAllClose(full_outputs.distribution.covariance(),
+                          expected_covariance, atol=1e-4)
+      self.assertAllClose(outputs.distribution.variance(),
+                          np.diag(expected_covariance), atol=1e-4)
+      self.assertAllClose(chunked_outputs.distribution.variance(),
+                          np.diag(expected_covariance), atol=1e-4)
+      self.assertAllClose(full_outputs.distribution.mean(),
+                          outputs.distribution.mean())
+      self.assertAllClose(chunked_outputs.distribution.mean(),
+                          outputs.distribution.mean())
+
+  def testBayesianLinearModelMultipleOutputs(self):
+    np.random.seed(42)
+    num_features = 3
+    num_outputs = 4
+    features = np.random.randn(10, num_features).astype(np.float32)
+    labels = np.random.randn(10, num_outputs).astype(np.float32)
+    test_features = np.random.randn(7, num_features).astype(np.float32)
+    for noise_variance in [0.1, np.array([0.1, 0.5, 1., 2.], np.float32)]:
+      model = ed.layers.BayesianLinearModel(noise_variance=noise_variance)
+      model.fit(features, labels)
+      outputs = model(test_features)
+      full_model = ed.layers.BayesianLinearModel(noise_variance=noise_variance,
+                                                 full_covariance=True)
+      full_model.fit(features, labels)
+      full_outputs = full_model(test_features)
+      self.assertEqual(outputs.shape, (7, num_outputs))
+      self.assertEqual(full_outputs.shape, (7, num_outputs))
+      # The transposed distribution wraps Independent(MultivariateNormal).
+      full_distribution = full_outputs.distribution.distribution.distribution
+      self.assertAllClose(tf.transpose(full_distribution.mean()),
+                          outputs.distribution.mean(), atol=1e-4)
+      self.assertAllClose(
+          full_outputs.distribution.log_prob(outputs.distribution.mean()),
+          tf.reduce_sum(full_distribution.log_prob(
+              tf.transpose(outputs.distribution.mean()))))
+      for k in range(num_outputs):
+        single_model = ed.layers.BayesianLinearModel(
+            noise_variance=float(np.broadcast_to(noise_variance,
+                                                 [num_outputs])[k]),
+            full_covariance=True)
+        single_model.fit(features, labels[:, k])
+        single_outputs = single_model(test_features)
+        self.assertAllClose(outputs.distribution.mean()[:, k],
+                            single_outputs.distribution.mean(), atol=1e-4)
+        self.assertAllClose(outputs.distribution.variance()[:, k],
+                            single_outputs.distribution.variance(), atol=1e-4)
+        self.assertAllClose(full_distribution.covariance()[k],
+                            single_outputs.distribution.covariance(),
+                            atol=1e-4)
+
+    model = ed.layers.BayesianLinearModel(noise_variance=0.1)
+    model.partial_fit(features[:5], labels[:5])
+    model.partial_fit(features[5:], labels[5:])
+    expected_model = ed.layers.BayesianLinearModel(noise_variance=0.1)
+    expected_model.fit(features, labels)
+    self.assertAllClose(model(test_features).distribution.mean(),
+                        expected_model(test_features).distribution.mean(),
+                        atol=1e-4)
+
 
 if __name__ == '__main__':
   tf.enable_v2_behavior()
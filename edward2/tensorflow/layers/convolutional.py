@@ -164,16 +164,12 @@ class Conv2DFlipout(Conv2DReparameterization):
       channels = input_shape[-1]
       sign_input_shape = [batch_dim, 1, 1, channels]
       sign_output_shape = [batch_dim, 1, 1, self.filters]
-    sign_input = tf.cast(2 * tf.random.uniform(sign_input_shape,
-                                               minval=0,
-                                               maxval=2,
-                                               dtype=tf.int32) - 1,
-                         inputs.dtype)
-    sign_output = tf.cast(2 * tf.random.uniform(sign_output_shape,
-                                                minval=0,
-                                                maxval=2,
-                                                dtype=tf.int32) - 1,
-                          inputs.dtype)
+    # Draw input and output signs at once, then split them.
+    signs = utils.random_sign([batch_dim, channels + self.filters],
+                              dtype=inputs.dtype)
+    sign_input, sign_output = tf.split(signs, [channels, self.filters], axis=-1)
+    sign_input = tf.reshape(sign_input, sign_input_shape)
+    sign_output = tf.reshape(sign_output, sign_output_shape)
     kernel_mean = self.kernel.distribution.mean()
     perturbation = self.kernel - kernel_mean
     outputs = self._convolution_op(inputs, kernel_mean)
@@ -306,6 +302,13 @@ class Conv2DVariationalDropout(Conv2DReparameterization):
 
   Implementation follows the additive parameterization of
   Molchanov et al. (2017).
+
+  After training, `sparsify()` prunes weights with high dropout rates. The
+  layer then uses the pruned posterior mean as a sparse kernel whenever the
+  training flag is statically False. Any other call recomputes the weights and
+  discards the sparse kernel, so call `sparsify()` again after further
+  training. As TensorFlow has no sparse convolution, the sparse forward pass
+  multiplies the kernel with extracted image patches.
   """
 
   def __init__(self,
@@ -342,13 +345,61 @@ class Conv2DVariationalDropout(Conv2DReparameterization):
         kernel_constraint=constraints.get(kernel_constraint),
         bias_constraint=constraints.get(bias_constraint),
         **kwargs)
+    self.sparse_kernel = None
+
+  def sparsify(self, threshold=3.):
+    """Prunes the kernel for sparse inference.
+
+    Args:
+      threshold: Threshold on the log dropout rate above which weights are
+        pruned. The default follows Molchanov et al. (2017).
+
+    Returns:
+      Fraction of the kernel's weights which were pruned.
+    """
+    self.call_weights()
+    self.sparse_kernel, sparsity = utils.prune_kernel(self.kernel, threshold)
+    return sparsity
+
+  def call_weights(self):
+    """Calls any weights, discarding the sparse kernel they may invalidate."""
+    self.sparse_kernel = None
+    super(Conv2DVariationalDropout, self).call_weights()
+
+  def _sparse_call(self, inputs):
+    """Forward pass with the sparse kernel from `sparsify()`."""
+    inputs = tf.convert_to_tensor(inputs, dtype=self.dtype)
+    if self.data_format == 'channels_first':
+      inputs = tf.transpose(inputs, [0, 2, 3, 1])
+    # Patches are flattened in the same [height, width, channels] order as the
+    # kernel.
+    patches = tf.image.extract_patches(
+        inputs,
+        sizes=[1] + list(self.kernel_size) + [1],
+        strides=[1] + list(self.strides) + [1],
+        rates=[1] + list(self.dilation_rate) + [1],
+        padding=self.padding.upper())
+    outputs = utils.sparse_dense_matmul(patches, self.sparse_kernel)
+    if self.use_bias:
+      bias = self.bias
+      if isinstance(bias, random_variable.RandomVariable):
+        bias = bias.distribution.mean()
+      outputs = tf.nn.bias_add(outputs, bias, data_format='NHWC')
+    if self.data_format == 'channels_first':
+      outputs = tf.transpose(outputs, [0, 3, 1, 2])
+    if self.activation is not None:
+      outputs = self.activation(outputs)
+    return outputs
 
   def call(self, inputs, training=None):
     if not isinstance(self.kernel, random_variable.RandomVariable):
       return super(Conv2DVariationalDropout, self).call(inputs)
-    self.call_weights()
     if training is None:
       training = tf.keras.backend.learning_phase()
+    training_value = utils.smart_constant_value(training)
+    if self.sparse_kernel is not None and training_value is False:
+      return self._sparse_call(inputs)
+    self.call_weights()
     if self._convolution_op is None:
       padding = self.padding
       if self.padding == 'causal':
@@ -389,22 +440,40 @@ class Conv2DVariationalDropout(Conv2DReparameterization):
         outputs = self.activation(outputs)
       return outputs
 
+    def undropped_inputs():
+      """Forward pass without dropout."""
+      return super(Conv2DVariationalDropout, self).call(inputs)
+
     # Following tf.keras.Dropout, only apply variational dropout if training
     # flag is True.
-    training_value = utils.smart_constant_value(training)
     if training_value is not None:
       if training_value:
         return dropped_inputs()
       else:
-        return super(Conv2DVariationalDropout, self).call(inputs)
+        return undropped_inputs()
     return tf.cond(
         pred=training,
         true_fn=dropped_inputs,
-        false_fn=lambda: super(Conv2DVariationalDropout, self).call(inputs))
+        false_fn=undropped_inputs)
 
 
 class Conv2DBatchEnsemble(tf.keras.layers.Layer):
-  """A batch ensemble convolutional layer."""
+  """A batch ensemble convolutional layer.
+
+  The layer takes inputs in one of two layouts:
+
+  + Tiled inputs of shape `[ensemble_size * batch_size, ...]`, where the first
+    `batch_size` examples go to the first member, the next `batch_size` to the
+    second member, and so on. This is what `tf.tile(inputs, [ensemble_size, 1,
+    1, 1])` gives. Outputs have the same layout.
+  + Per-member inputs of shape `[num_members, batch_size, ...]`. Outputs have
+    shape `[num_members, batch_size, ...]`. If `num_members` is 1, the same
+    batch goes to every member by broadcasting, so an untiled batch
+    `inputs[tf.newaxis]` evaluates all members without copying it.
+
+  In either layout, the `members` argument to `call` evaluates only a subset of
+  the ensemble, e.g., for latency-bounded predictions.
+  """
 
   def __init__(self,
                filters,
@@ -452,8 +521,9 @@ class Conv2DBatchEnsemble(tf.keras.layers.Layer):
 
   def build(self, input_shape):
     input_shape = tf.TensorShape(input_shape)
+    # Index channels from the end so tiled 4-D and per-member 5-D inputs agree.
     if self.data_format == 'channels_first':
-      input_channel = input_shape[1]
+      input_channel = input_shape[-3]
     elif self.data_format == 'channels_last':
       input_channel = input_shape[-1]
 
@@ -480,30 +550,57 @@ class Conv2DBatchEnsemble(tf.keras.layers.Layer):
       self.bias = None
     self.built = True
 
-  def call(self, inputs):
-    axis_change = -1 if self.data_format == 'channels_first' else 1
-    batch_size = tf.shape(inputs)[0]
-    input_dim = self.alpha.shape[-1]
-    examples_per_model = batch_size // self.ensemble_size
-    alpha = tf.reshape(tf.tile(self.alpha, [1, examples_per_model]),
-                       [batch_size, input_dim])
-    gamma = tf.reshape(tf.tile(self.gamma, [1, examples_per_model]),
-                       [batch_size, self.filters])
-    alpha = tf.expand_dims(alpha, axis=axis_change)
-    alpha = tf.expand_dims(alpha, axis=axis_change)
-    gamma = tf.expand_dims(gamma, axis=axis_change)
-    gamma = tf.expand_dims(gamma, axis=axis_change)
-    outputs = self.conv2d(inputs*alpha) * gamma
-
+  def call(self, inputs, members=None):
+    """Computes the layer for tiled or per-member inputs.
+
+    Args:
+      inputs: Tensor of shape `[num_members * batch_size, ...]` (tiled) or
+        `[num_members, batch_size, ...]` (per-member). For per-member inputs,
+        `num_members` may also be 1 to broadcast across members.
+      members: Optional list or 1-D integer Tensor of member indices to
+        evaluate. Defaults to all members.
+
+    Returns:
+      Tensor of shape `[num_members * batch_size, ...]` for tiled inputs and
+      of shape `[num_members, batch_size, ...]` for per-member inputs.
+    """
+    inputs = tf.convert_to_tensor(inputs, dtype=self.dtype)
+    alpha = self.alpha
+    gamma = self.gamma
+    bias = self.bias
+    if members is not None:
+      alpha = tf.gather(alpha, members)
+      gamma = tf.gather(gamma, members)
+      if self.use_bias:
+        bias = tf.gather(bias, members)
+    num_members = tf.shape(alpha)[0]
+    tiled = inputs.shape.ndims == 4
+    if tiled:
+      inputs = tf.reshape(inputs,
+                          [num_members, -1] + _shape_list(inputs)[1:])
+
+    # Reshape per-member weights to [num_members, 1, 1, 1, channels] (or
+    # [num_members, 1, channels, 1, 1]) to broadcast over each member's batch.
+    if self.data_format == 'channels_first':
+      weight_shape = [-1, 1, alpha.shape[-1], 1, 1]
+      output_weight_shape = [-1, 1, self.filters, 1, 1]
+    else:
+      weight_shape = [-1, 1, 1, 1, alpha.shape[-1]]
+      output_weight_shape = [-1, 1, 1, 1, self.filters]
+    inputs *= tf.reshape(alpha, weight_shape)
+    input_shape = _shape_list(inputs)
+    outputs = self.conv2d(tf.reshape(inputs, [-1] + input_shape[2:]))
+    outputs = tf.reshape(outputs,
+                         [num_members, input_shape[1]] +
+                         _shape_list(outputs)[1:])
+    outputs *= tf.reshape(gamma, output_weight_shape)
     if self.use_bias:
-      bias = tf.reshape(tf.tile(self.bias, [1, examples_per_model]),
-                        [batch_size, self.filters])
-      bias = tf.expand_dims(bias, axis=axis_change)
-      bias = tf.expand_dims(bias, axis=axis_change)
-      outputs += bias
+      outputs += tf.reshape(bias, output_weight_shape)
 
     if self.activation is not None:
       outputs = self.activation(outputs)
+    if tiled:
+      outputs = tf.reshape(outputs, [-1] + _shape_list(outputs)[2:])
     return outputs
 
   def get_config(self):
@@ -523,3 +620,10 @@ class Conv2DBatchEnsemble(tf.keras.layers.Layer):
         list(base_config.items()) +
         list(conv_config.items()) +
         list(config.items()))
+
+
+def _shape_list(x):
+  """Returns the shape of a Tensor as a list, preferring static dimensions."""
+  dynamic_shape = tf.shape(x)
+  return [dim if dim is not None else dynamic_shape[i]
+          for i, dim in enumerate(x.shape.as_list())]
@@ -119,6 +119,102 @@ class ConvolutionalTest(parameterized.TestCase, tf.test.TestCase):
     else:
       self.assertLen(model.losses, 1)
 
+  @parameterized.parameters(
+      {"data_format": "channels_last", "padding": "same", "strides": 1},
+      {"data_format": "channels_first", "padding": "valid", "strides": 2},
+  )
+  def testConv2DVariationalDropoutSparsify(self, data_format, padding, strides):
+    inputs = np.random.rand(2, 5, 5, 3).astype(np.float32)
+    layer_inputs = inputs
+    if data_format == "channels_first":
+      layer_inputs = np.transpose(inputs, [0, 3, 1, 2])
+    layer = ed.layers.Conv2DVariationalDropout(4,
+                                               kernel_size=3,
+                                               strides=strides,
+                                               padding=padding,
+                                               data_format=data_format)
+    layer(layer_inputs, training=True)
+    # Zero means have infinite dropout rates, so those weights are pruned.
+    mean = np.random.normal(size=(3, 3, 3, 4)).astype(np.float32)
+    mean[:, :, :2] = 0.
+    layer.kernel_initializer.mean.assign(mean)
+    sparsity = layer.sparsify()
+    self.assertAllClose(sparsity, 2. / 3.)
+    outputs = layer(layer_inputs, training=False)
+    expected_outputs = tf.nn.conv2d(inputs, mean, strides=strides,
+                                    padding=padding.upper())
+    if data_format == "channels_first":
+      expected_outputs = tf.transpose(expected_outputs, [0, 3, 1, 2])
+    self.assertAllClose(outputs, expected_outputs, atol=1e-5)
+    layer(layer_inputs, training=True)
+    self.assertIsNone(layer.sparse_kernel)
+
+  @parameterized.parameters(
+      {"data_format": "channels_last"},
+      {"data_format": "channels_first"},
+  )
+  def testConv2DBatchEnsemble(self, data_format):
+    ensemble_size = 3
+    examples_per_model = 2
+    if data_format == "channels_last":
+      inputs = tf.random.normal([examples_per_model, 4, 4, 3])
+    else:
+      inputs = tf.random.normal([examples_per_model, 3, 4, 4])
+    layer = ed.layers.Conv2DBatchEnsemble(
+        filters=5,
+        kernel_size=3,
+        padding="same",
+        data_format=data_format,
+        alpha_initializer="he_normal",
+        gamma_initializer="he_normal",
+        ensemble_size=ensemble_size)
+    batched_inputs = tf.tile(inputs, [ensemble_size, 1, 1, 1])
+    output = layer(batched_inputs)
+    if data_format == "channels_last":
+      reshape = lambda x: tf.reshape(x, [1, 1, 1, -1])
+    else:
+      reshape = lambda x: tf.reshape(x, [1, -1, 1, 1])
+    manual_output = [
+        layer.conv2d(inputs * reshape(layer.alpha[i])) *
+        reshape(layer.gamma[i]) + reshape(layer.bias[i])
+        for i in range(ensemble_size)]
+    manual_output = tf.concat(manual_output, axis=0)
+    self.assertAllClose(output, manual_output)
+
+    # Per-member inputs broadcast an untiled batch across members.
+    member_output = layer(inputs[tf.newaxis])
+    self.assertEqual(member_output.shape[:2],
+                     (ensemble_size, examples_per_model))
+    self.assertAllClose(member_output,
+                        tf.reshape(manual_output, member_output.shape))
+    subset_output = layer(inputs[tf.newaxis], members=[1])
+    self.assertAllClose(subset_output, member_output[1:2])
+
+  @parameterized.parameters(
+      {"data_format": "channels_last"},
+      {"data_format": "channels_first"},
+  )
+  def testConv2DBatchEnsemblePerMemberBuild(self, data_format):
+    ensemble_size = 3
+    if data_format == "channels_last":
+      inputs = tf.random.normal([1, 2, 4, 4, 3])
+    else:
+      inputs = tf.random.normal([1, 2, 3, 4, 4])
+    layer = ed.layers.Conv2DBatchEnsemble(
+        filters=5,
+        kernel_size=3,
+        padding="same",
+        data_format=data_format,
+        alpha_initializer="he_normal",
+        gamma_initializer="he_normal",
+        ensemble_size=ensemble_size)
+    member_output = layer(inputs)
+    self.assertEqual(layer.alpha.shape, (ensemble_size, 3))
+    self.assertEqual(member_output.shape[:2], (ensemble_size, 2))
+    tiled_output = layer(tf.tile(inputs[0], [ensemble_size, 1, 1, 1]))
+    self.assertAllClose(member_output,
+                        tf.reshape(tiled_output, member_output.shape))
+
 
 if __name__ == "__main__":
   tf.enable_v2_behavior()
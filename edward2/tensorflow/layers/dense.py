@@ -92,9 +92,24 @@ class DenseDVI(DenseReparameterization):
   moments. It is accurate if the kernel and bias initializers return factorized
   normal random variables and the number of units is sufficiently large. The
   advantage is that the forward pass is deterministic, reducing variance of
-  gradients during training. The disadvantage is an O(features^2*units) compute
-  and O(features^2 + features*units) memory complexity. In comparison,
-  DenseReparameterization has O(features*units) compute and memory complexity.
+  gradients during training.
+
+  The `covariance` argument sets how the layer represents the covariance of its
+  outputs:
+
+  + `'full'` propagates full covariance matrices. It has O(features^2*units)
+    compute and O(features^2 + features*units) memory complexity, and it
+    returns a `MultivariateNormalFullCovariance` random variable.
+  + `'diagonal'` propagates only marginal variances, ignoring correlations
+    across units. It returns a `MultivariateNormalDiag` random variable.
+  + `'low_rank'` propagates a covariance of the form `diag(d) + U U^T`, where
+    `U` has `rank` columns. It keeps the marginal variances of `'diagonal'`
+    while retaining the leading correlations across units. It returns a
+    `MultivariateNormalDiagPlusLowRankCovariance` random variable.
+
+  The latter two have O(features*units + (features + units)*rank^2) compute
+  and memory complexity, which is linear in the layer's width. In all modes,
+  deterministic inputs skip the input covariance entirely.
 
   #### Examples
 
@@ -130,16 +145,76 @@ class DenseDVI(DenseReparameterization):
   predictions = ed.Normal(loc=locs.distribution.mean(),
                           scale=locs.distribution.variance() + 1.)
   ```
+
+  For wide layers, use `ed.layers.DenseDVI(1024, covariance='low_rank')` or
+  `covariance='diagonal'` in place of the default.
   """
 
+  def __init__(self,
+               units,
+               activation=None,
+               use_bias=True,
+               kernel_initializer='trainable_normal',
+               bias_initializer='zero',
+               kernel_regularizer='normal_kl_divergence',
+               bias_regularizer=None,
+               activity_regularizer=None,
+               covariance='full',
+               rank=8,
+               **kwargs):
+    if covariance not in ('full', 'diagonal', 'low_rank'):
+      raise ValueError('covariance must be one of "full", "diagonal", or '
+                       '"low_rank". Got {}.'.format(covariance))
+    self.covariance = covariance
+    self.rank = rank
+    super(DenseDVI, self).__init__(
+        units=units,
+        activation=activation,
+        use_bias=use_bias,
+        kernel_initializer=initializers.get(kernel_initializer),
+        bias_initializer=initializers.get(bias_initializer),
+        kernel_regularizer=regularizers.get(kernel_regularizer),
+        bias_regularizer=regularizers.get(bias_regularizer),
+        activity_regularizer=regularizers.get(activity_regularizer),
+        **kwargs)
+
+  def call_weights(self):
+    """Calls any weights if the initializer is itself a layer.
+
+    Unlike the parent's method, this does not sample the current weights to
+    get their shapes: moment propagation never uses the weights' samples.
+    """
+    if isinstance(self.kernel_initializer, tf.keras.layers.Layer):
+      self.kernel = self.kernel_initializer(
+          [self.input_spec.axes[-1], self.units], self.dtype)
+    if isinstance(self.bias_initializer, tf.keras.layers.Layer):
+      self.bias = self.bias_initializer([self.units], self.dtype)
+
   def call(self, inputs):
     if (not isinstance(inputs, random_variable.RandomVariable) and
         not isinstance(self.kernel, random_variable.RandomVariable) and
         not isinstance(self.bias, random_variable.RandomVariable)):
       return super(DenseDVI, self).call(inputs)
     self.call_weights()
-    inputs_mean, inputs_variance, inputs_covariance = get_moments(inputs)
-    kernel_mean, kernel_variance, _ = get_moments(self.kernel)
+    if (self.activation not in (tf.keras.activations.relu, tf.nn.relu) and
+        self.activation not in (tf.keras.activations.linear, None)):
+      raise NotImplementedError('Activation is {}. Deterministic variational '
+                                'inference is only available if activation is '
+                                'ReLU or None.'.format(self.activation))
+    if self.covariance == 'diagonal':
+      return self._call_diagonal(inputs)
+    elif self.covariance == 'low_rank':
+      return self._call_low_rank(inputs)
+    return self._call_full(inputs)
+
+  def _call_full(self, inputs):
+    """Propagates full covariance matrices."""
+    # Deterministic inputs have zero covariance, so we skip forming it.
+    inputs_mean, inputs_variance, inputs_covariance = get_moments(
+        inputs,
+        full_covariance=isinstance(inputs, random_variable.RandomVariable))
+    kernel_mean, kernel_variance, _ = get_moments(self.kernel,
+                                                  full_covariance=False)
     if self.use_bias:
       bias_mean, _, bias_covariance = get_moments(self.bias)
 
@@ -153,16 +228,21 @@ class DenseDVI(DenseReparameterization):
     # compute diagonal term.
     covariance_diag = tf.tensordot(inputs_variance + inputs_mean**2,
                                    kernel_variance, [[-1], [0]])
-    # Compute quadratic form E[W]^T Cov E[W] from right-to-left. First is
-    #  [..., features, features], [features, units] -> [..., features, units].
-    cov_w = tf.tensordot(inputs_covariance, kernel_mean, [[-1], [0]])
-    # Next is [..., features, units], [features, units] -> [..., units, units].
-    w_cov_w = tf.tensordot(cov_w, kernel_mean, [[-2], [0]])
-    covariance = w_cov_w
-    if self.use_bias:
-      covariance += bias_covariance
-    covariance = tf.linalg.set_diag(
-        covariance, tf.linalg.diag_part(covariance) + covariance_diag)
+    if inputs_covariance is not None:
+      # Compute quadratic form E[W]^T Cov E[W] from right-to-left. First is
+      #  [..., features, features], [features, units] -> [..., features, units].
+      cov_w = tf.tensordot(inputs_covariance, kernel_mean, [[-1], [0]])
+      # Next is [..., features, units], [features, units] -> [..., units, units].
+      w_cov_w = tf.tensordot(cov_w, kernel_mean, [[-2], [0]])
+      covariance = w_cov_w
+      if self.use_bias:
+        covariance += bias_covariance
+      covariance = tf.linalg.set_diag(
+          covariance, tf.linalg.diag_part(covariance) + covariance_diag)
+    else:
+      covariance = tf.linalg.diag(covariance_diag)
+      if self.use_bias:
+        covariance += bias_covariance
 
     if self.activation in (tf.keras.activations.relu, tf.nn.relu):
       # Compute activation's moments with variable names from Wu et al. (2018).
@@ -195,32 +275,200 @@ class DenseDVI(DenseReparameterization):
           -safe_rho / (2. * safe_gr * (1 + bar_rho)) +
           (gh - rho) / (safe_gr * safe_rho) * mu1 * mu2)
       covariance = s * (a + exp_negative_q)
-    elif self.activation not in (tf.keras.activations.linear, None):
-      raise NotImplementedError('Activation is {}. Deterministic variational '
-                                'inference is only available if activation is '
-                                'ReLU or None.'.format(self.activation))
 
     return generated_random_variables.MultivariateNormalFullCovariance(
         mean, covariance)
 
+  def _call_diagonal(self, inputs):
+    """Propagates marginal variances only."""
+    mean, variance, _, _ = self._linear_moments(inputs)
+    if self.activation in (tf.keras.activations.relu, tf.nn.relu):
+      mean, variance = relu_moments(mean, variance)
+    return generated_random_variables.MultivariateNormalDiag(
+        loc=mean, scale_diag=tf.sqrt(variance))
+
+  def _call_low_rank(self, inputs):
+    """Propagates a diagonal plus rank-`self.rank` covariance."""
+    mean, variance, inputs_diag, w_factor = self._linear_moments(inputs)
+    factors = []
+    if w_factor is not None:
+      factors.append(w_factor)
+    if inputs_diag is not None:
+      # E[W]^T diag(d) E[W] has full rank. Keep the rows of diag(d)^(1/2) E[W]
+      # which contribute the most to it; the rest only enter the variance.
+      kernel_mean = get_moments(self.kernel, full_covariance=False)[0]
+      num_rows = min(self.rank, kernel_mean.shape[0])
+      scores = inputs_diag * tf.reduce_sum(tf.square(kernel_mean), axis=-1)
+      _, indices = tf.math.top_k(scores, k=num_rows)
+      rows = tf.gather(kernel_mean, indices)  # [..., num_rows, units]
+      rows *= tf.sqrt(tf.gather(inputs_diag,
+                                indices,
+                                batch_dims=indices.shape.ndims - 1))[..., None]
+      factors.append(tf.linalg.matrix_transpose(rows))
+    factor = _truncate_factor(factors, self.rank, mean)
 
-def get_moments(x):
-  """Gets first and second moments of input."""
+    if self.activation in (tf.keras.activations.relu, tf.nn.relu):
+      # Cov(relu(x_i), x_j) = Phi(mu_i) Cov(x_i, x_j) (Stein's lemma), which
+      # gives the first-order covariance of the outputs.
+      scale = tf.sqrt(variance)
+      mu = mean / (scale + tf.keras.backend.epsilon())
+      mean, variance = relu_moments(mean, variance)
+      factor *= tfp.distributions.Normal(0., 1.).cdf(mu)[..., None]
+    # By construction the factor never explains more than the total variance,
+    # up to numerical error.
+    diag = tf.maximum(variance - tf.reduce_sum(tf.square(factor), axis=-1), 0.)
+    return (
+        generated_random_variables.MultivariateNormalDiagPlusLowRankCovariance(
+            loc=mean, cov_diag_factor=diag, cov_perturb_factor=factor))
+
+  def _linear_moments(self, inputs):
+    """Gets moments of the outputs before activation, without covariances.
+
+    Args:
+      inputs: Tensor or RandomVariable of shape `[..., features]`.
+
+    Returns:
+      Tuple of mean and variance of the outputs, each of shape `[..., units]`,
+      the diagonal `d` of the inputs' covariance `diag(d) + U U^T`, and the
+      projected factor `E[W]^T U` of shape `[..., units, rank]`. The latter
+      two are None if the inputs have no such part.
+    """
+    inputs_mean, inputs_diag, inputs_factor = get_low_rank_moments(inputs)
+    kernel_mean, kernel_variance, _ = get_moments(self.kernel,
+                                                  full_covariance=False)
+    # E[outputs] = E[inputs] * E[kernel] + E[bias]
+    mean = tf.tensordot(inputs_mean, kernel_mean, [[-1], [0]])
+    w_factor = None
+    if inputs_diag is None:
+      variance = tf.tensordot(inputs_mean**2, kernel_variance, [[-1], [0]])
+    else:
+      # Var = E[inputs**2] Var(kernel) + diag(E[W]^T Cov(inputs) E[W]) +
+      #   Var(bias), where Cov(inputs) = diag(d) + U U^T.
+      inputs_variance = inputs_diag
+      if inputs_factor is not None:
+        # [..., features, rank], [features, units] -> [..., units, rank].
+        w_factor = tf.einsum('...fr,fu->...ur', inputs_factor, kernel_mean)
+        inputs_variance += tf.reduce_sum(tf.square(inputs_factor), axis=-1)
+      variance = tf.tensordot(inputs_variance + inputs_mean**2,
+                              kernel_variance, [[-1], [0]])
+      variance += tf.tensordot(inputs_diag, tf.square(kernel_mean),
+                               [[-1], [0]])
+      if w_factor is not None:
+        variance += tf.reduce_sum(tf.square(w_factor), axis=-1)
+    if self.use_bias:
+      bias_mean, bias_variance, _ = get_moments(self.bias,
+                                                full_covariance=False)
+      mean = tf.nn.bias_add(mean, bias_mean)
+      variance += bias_variance
+    return mean, variance, inputs_diag, w_factor
+
+  def get_config(self):
+    config = {
+        'covariance': self.covariance,
+        'rank': self.rank,
+    }
+    base_config = super(DenseDVI, self).get_config()
+    return dict(list(base_config.items()) + list(config.items()))
+
+
+def get_moments(x, full_covariance=True):
+  """Gets first and second moments of input.
+
+  Args:
+    x: Tensor or RandomVariable.
+    full_covariance: Whether to compute the covariance over the last dimension.
+      If False, the returned covariance is None and no `[..., d, d]` matrix is
+      formed.
+
+  Returns:
+    Tuple of mean, variance, and covariance.
+  """
   if isinstance(x, random_variable.RandomVariable):
     mean = x.distribution.mean()
     variance = x.distribution.variance()
-    try:
-      covariance = x.distribution.covariance()
-    except NotImplementedError:
-      covariance = tf.zeros(x.shape.concatenate(x.shape[-1]), dtype=x.dtype)
-      covariance = tf.linalg.set_diag(covariance, variance)
+    if not full_covariance:
+      covariance = None
+    else:
+      try:
+        covariance = x.distribution.covariance()
+      except NotImplementedError:
+        covariance = tf.zeros(x.shape.concatenate(x.shape[-1]), dtype=x.dtype)
+        covariance = tf.linalg.set_diag(covariance, variance)
   else:
     mean = x
     variance = tf.zeros_like(x)
-    covariance = tf.zeros(x.shape.concatenate(x.shape[-1]), dtype=x.dtype)
+    if not full_covariance:
+      covariance = None
+    else:
+      covariance = tf.zeros(x.shape.concatenate(x.shape[-1]), dtype=x.dtype)
   return mean, variance, covariance
 
 
+def get_low_rank_moments(x):
+  """Gets mean and a diagonal plus low-rank covariance of input.
+
+  Args:
+    x: Tensor or RandomVariable.
+
+  Returns:
+    Tuple of mean, diagonal `d` of shape `[..., d]`, and factor `U` of shape
+    `[..., d, rank]` such that the covariance is `diag(d) + U U^T`. For
+    deterministic inputs, the diagonal and factor are None; for random
+    variables without a low-rank part, the factor is None.
+  """
+  if not isinstance(x, random_variable.RandomVariable):
+    return x, None, None
+  distribution = x.distribution
+  if isinstance(distribution,
+                tfp.distributions.MultivariateNormalDiagPlusLowRankCovariance):
+    return (distribution.mean(),
+            tf.convert_to_tensor(distribution.cov_diag_factor),
+            tf.convert_to_tensor(distribution.cov_perturb_factor))
+  return distribution.mean(), distribution.variance(), None
+
+
+def _truncate_factor(factors, rank, mean):
+  """Concatenates factors and returns the best rank-`rank` approximation.
+
+  Args:
+    factors: List of Tensors of shape `[..., units, r_i]`, possibly empty.
+    rank: Number of columns of the returned factor.
+    mean: Tensor of shape `[..., units]`, used for shape and dtype.
+
+  Returns:
+    Tensor `V` of shape `[..., units, rank]` such that `V V^T` is the best
+    rank-`rank` approximation to `F F^T`, where `F` concatenates `factors`
+    along the last dimension. Missing columns are zero.
+  """
+  if not factors:
+    return tf.zeros(tf.concat([tf.shape(mean), [rank]], 0), dtype=mean.dtype)
+  factor = tf.concat(factors, axis=-1)
+  num_columns = factor.shape[-1]
+  if num_columns > rank:
+    # The top eigenvectors of the [..., r, r] Gram matrix F^T F give F's top
+    # right singular vectors, so this costs O(units*r^2 + r^3).
+    gram = tf.matmul(factor, factor, transpose_a=True)
+    _, eigenvectors = tf.linalg.eigh(gram)
+    factor = tf.matmul(factor, eigenvectors[..., -rank:])
+  elif num_columns < rank:
+    paddings = [[0, 0]] * (factor.shape.ndims - 1) + [[0, rank - num_columns]]
+    factor = tf.pad(factor, paddings)
+  return factor
+
+
+def relu_moments(mean, variance):
+  """Gets mean and variance of relu(x) for x ~ Normal(mean, variance)."""
+  scale = tf.sqrt(variance)
+  mu = mean / (scale + tf.keras.backend.epsilon())
+  relu_mean = scale * soft_relu(mu)
+  # E[relu(x)**2] = variance * ((mu**2 + 1) Phi(mu) + mu phi(mu)).
+  second_moment = variance * (
+      (mu**2 + 1.) * tfp.distributions.Normal(0., 1.).cdf(mu) +
+      mu * tfp.distributions.Normal(0., 1.).prob(mu))
+  relu_variance = tf.maximum(second_moment - relu_mean**2, 0.)
+  return relu_mean, relu_variance
+
+
 def soft_relu(x):
   return (tfp.distributions.Normal(0., 1.).prob(x) +
           x * tfp.distributions.Normal(0., 1.).cdf(x))
@@ -259,17 +507,12 @@ class DenseFlipout(DenseReparameterization):
       return super(DenseFlipout, self).call(inputs)
     self.call_weights()
     input_shape = tf.shape(inputs)
-    output_shape = tf.concat([input_shape[:-1], [self.units]], 0)
-    sign_input = tf.cast(2 * tf.random.uniform(input_shape,
-                                               minval=0,
-                                               maxval=2,
-                                               dtype=tf.int32) - 1,
-                         inputs.dtype)
-    sign_output = tf.cast(2 * tf.random.uniform(output_shape,
-                                                minval=0,
-                                                maxval=2,
-                                                dtype=inputs.dtype) - 1,
-                          inputs.dtype)
+    input_dim = inputs.shape[-1]
+    # Draw input and output signs at once, then split them.
+    signs = utils.random_sign(
+        tf.concat([input_shape[:-1], [input_dim + self.units]], 0),
+        dtype=inputs.dtype)
+    sign_input, sign_output = tf.split(signs, [input_dim, self.units], axis=-1)
     kernel_mean = self.kernel.distribution.mean()
     perturbation = self.kernel - kernel_mean
     if inputs.shape.ndims <= 2:
@@ -292,6 +535,12 @@ class DenseVariationalDropout(DenseReparameterization):
 
   Implementation follows the additive parameterization of
   Molchanov et al. (2017).
+
+  After training, `sparsify()` prunes weights with high dropout rates. The
+  layer then uses the pruned posterior mean as a sparse kernel whenever the
+  training flag is statically False. Any other call recomputes the weights and
+  discards the sparse kernel, so call `sparsify()` again after further
+  training.
   """
 
   def __init__(self,
@@ -314,13 +563,49 @@ class DenseVariationalDropout(DenseReparameterization):
         bias_regularizer=regularizers.get(bias_regularizer),
         activity_regularizer=regularizers.get(activity_regularizer),
         **kwargs)
+    self.sparse_kernel = None
+
+  def sparsify(self, threshold=3.):
+    """Prunes the kernel for sparse inference.
+
+    Args:
+      threshold: Threshold on the log dropout rate above which weights are
+        pruned. The default follows Molchanov et al. (2017).
+
+    Returns:
+      Fraction of the kernel's weights which were pruned.
+    """
+    self.call_weights()
+    self.sparse_kernel, sparsity = utils.prune_kernel(self.kernel, threshold)
+    return sparsity
+
+  def call_weights(self):
+    """Calls any weights, discarding the sparse kernel they may invalidate."""
+    self.sparse_kernel = None
+    super(DenseVariationalDropout, self).call_weights()
+
+  def _sparse_call(self, inputs):
+    """Forward pass with the sparse kernel from `sparsify()`."""
+    inputs = tf.convert_to_tensor(inputs, dtype=self.dtype)
+    outputs = utils.sparse_dense_matmul(inputs, self.sparse_kernel)
+    if self.use_bias:
+      bias = self.bias
+      if isinstance(bias, random_variable.RandomVariable):
+        bias = bias.distribution.mean()
+      outputs = tf.nn.bias_add(outputs, bias)
+    if self.activation is not None:
+      outputs = self.activation(outputs)
+    return outputs
 
   def call(self, inputs, training=None):
     if not isinstance(self.kernel, random_variable.RandomVariable):
       return super(DenseVariationalDropout, self).call(inputs)
-    self.call_weights()
     if training is None:
       training = tf.keras.backend.learning_phase()
+    training_value = utils.smart_constant_value(training)
+    if self.sparse_kernel is not None and training_value is False:
+      return self._sparse_call(inputs)
+    self.call_weights()
 
     def dropped_inputs():
       """Forward pass with dropout."""
@@ -352,18 +637,21 @@ class DenseVariationalDropout(DenseReparameterization):
         outputs = self.activation(outputs)
       return outputs
 
+    def undropped_inputs():
+      """Forward pass without dropout."""
+      return super(DenseVariationalDropout, self).call(inputs)
+
     # Following tf.keras.Dropout, only apply variational dropout if training
     # flag is True.
-    training_value = utils.smart_constant_value(training)
     if training_value is not None:
       if training_value:
         return dropped_inputs()
       else:
-        return super(DenseVariationalDropout, self).call(inputs)
+        return undropped_inputs()
     return tf.cond(
         pred=training,
         true_fn=dropped_inputs,
-        false_fn=lambda: super(DenseVariationalDropout, self).call(inputs))
+        false_fn=undropped_inputs)
 
 
 class DenseHierarchical(DenseVariationalDropout):
@@ -470,7 +758,22 @@ class DenseHierarchical(DenseVariationalDropout):
 
 
 class DenseBatchEnsemble(tf.keras.layers.Layer):
-  """A batch ensemble dense layer."""
+  """A batch ensemble dense layer.
+
+  The layer takes inputs in one of two layouts:
+
+  + Tiled inputs of shape `[ensemble_size * batch_size, input_dim]`, where the
+    first `batch_size` examples go to the first member, the next `batch_size`
+    to the second member, and so on. This is what `tf.tile(inputs,
+    [ensemble_size, 1])` gives. Outputs have the same layout.
+  + Per-member inputs of shape `[num_members, batch_size, input_dim]`. Outputs
+    have shape `[num_members, batch_size, units]`. If `num_members` is 1, the
+    same batch goes to every member by broadcasting, so an untiled batch
+    `inputs[tf.newaxis]` evaluates all members without copying it.
+
+  In either layout, the `members` argument to `call` evaluates only a subset of
+  the ensemble, e.g., for latency-bounded predictions.
+  """
 
   def __init__(self,
                units,
@@ -532,24 +835,43 @@ class DenseBatchEnsemble(tf.keras.layers.Layer):
       self.bias = None
     self.built = True
 
-  def call(self, inputs):
-    batch_size = tf.shape(inputs)[0]
-    input_dim = tf.shape(inputs)[-1]
-    examples_per_model = batch_size // self.ensemble_size
-    # TODO(trandustin): Reapply fix using proper reshape.
-    inputs = tf.reshape(inputs,
-                        [examples_per_model, self.ensemble_size, input_dim])
-    alpha = tf.expand_dims(self.alpha, 0)
-    gamma = tf.expand_dims(self.gamma, 0)
-    outputs = self.dense(inputs * alpha) * gamma
-
+  def call(self, inputs, members=None):
+    """Computes the layer for tiled or per-member inputs.
+
+    Args:
+      inputs: Tensor of shape `[num_members * batch_size, input_dim]` (tiled)
+        or `[num_members, batch_size, input_dim]` (per-member). For per-member
+        inputs, `num_members` may also be 1 to broadcast across members.
+      members: Optional list or 1-D integer Tensor of member indices to
+        evaluate. Defaults to all members.
+
+    Returns:
+      Tensor of shape `[num_members * batch_size, units]` for tiled inputs and
+      of shape `[num_members, batch_size, units]` for per-member inputs.
+    """
+    inputs = tf.convert_to_tensor(inputs, dtype=self.dtype)
+    alpha = self.alpha
+    gamma = self.gamma
+    bias = self.bias
+    if members is not None:
+      alpha = tf.gather(alpha, members)
+      gamma = tf.gather(gamma, members)
+      if self.use_bias:
+        bias = tf.gather(bias, members)
+    tiled = inputs.shape.ndims == 2
+    if tiled:
+      batch_size = tf.shape(inputs)[0]
+      inputs = tf.reshape(inputs, [tf.shape(alpha)[0], -1, inputs.shape[-1]])
+
+    # Scale each member's inputs and outputs, [num_members, 1, dim].
+    outputs = self.dense(inputs * alpha[:, tf.newaxis]) * gamma[:, tf.newaxis]
     if self.use_bias:
-      bias = tf.expand_dims(self.bias, 0)
-      outputs += bias
+      outputs += bias[:, tf.newaxis]
 
     if self.activation is not None:
       outputs = self.activation(outputs)
-    outputs = tf.reshape(outputs, [batch_size, self.units])
+    if tiled:
+      outputs = tf.reshape(outputs, [batch_size, self.units])
     return outputs
 
   def get_config(self):
@@ -19,6 +19,8 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import time
+
 from absl.testing import parameterized
 import edward2 as ed
 import numpy as np
@@ -286,31 +288,151 @@ class DenseTest(parameterized.TestCase, tf.test.TestCase):
     percent_mismatches = num_mismatches / float(batch_size * units * units)
     self.assertLessEqual(percent_mismatches, 0.05)
 
-    # TODO(trandustin): Reapply test using proper reshape.
-#   def testDenseBatchEnsemble(self):
-#     tf.keras.backend.set_learning_phase(1)  # training time
-#     num_models = 3
-#     examples_per_model = 4
-#     input_dim = 5
-#     output_dim = 5
-#     inputs = tf.random.normal([examples_per_model, input_dim])
-#     batched_inputs = tf.tile(inputs, [num_models, 1])
-#     layer = ed.layers.DenseBatchEnsemble(
-#         output_dim,
-#         alpha_initializer="he_normal",
-#         gamma_initializer="he_normal",
-#         activation=None,
-#         num_models=num_models)
-#
-#     output = layer(batched_inputs)
-#     manual_output = [
-#         layer.dense(inputs*layer.alpha[i]) * layer.gamma[i] + layer.bias[i]
-#         for i in range(num_models)]
-#     manual_output = tf.concat(manual_output, axis=0)
-#
-#     expected_shape = (num_models*examples_per_model, output_dim)
-#     self.assertEqual(output.shape, expected_shape)
-#     self.assertAllClose(output, manual_output)
+  @parameterized.parameters(
+      {"covariance": "full"},
+      {"covariance": "diagonal"},
+      {"covariance": "low_rank"},
+  )
+  def testDenseDVICovariance(self, covariance):
+    features = np.random.rand(3, 6).astype(np.float32)
+    labels = np.random.rand(3, 2).astype(np.float32)
+    model = tf.keras.Sequential([
+        ed.layers.DenseDVI(5, activation=tf.nn.relu, covariance=covariance,
+                           rank=2),
+        ed.layers.DenseDVI(2, activation=None, covariance=covariance, rank=2),
+    ])
+    with tf.GradientTape() as tape:
+      outputs = model(features, training=True)
+      nll = -tf.reduce_sum(outputs.distribution.log_prob(labels))
+    self.assertEqual(outputs.distribution.event_shape, [2])
+    self.assertEqual(outputs.distribution.batch_shape, [3])
+    self.assertTrue(np.isfinite(nll))
+    grads = tape.gradient(nll, model.trainable_variables)
+    for grad in grads:
+      self.assertIsNotNone(grad)
+    outputs2 = model(features, training=True)
+    self.assertAllClose(outputs.distribution.mean(),
+                        outputs2.distribution.mean())
+    self.assertAllClose(outputs.distribution.variance(),
+                        outputs2.distribution.variance())
+
+  def testDenseDVILowRankMatchesFull(self):
+    """Tests that scalable modes match full covariances when exact."""
+    inputs = np.random.rand(3, 4).astype(np.float32)
+    full_layers = [ed.layers.DenseDVI(6), ed.layers.DenseDVI(5)]
+    full_outputs = full_layers[1](full_layers[0](inputs))
+    diagonal_layers = [ed.layers.DenseDVI(6, covariance="diagonal"),
+                       ed.layers.DenseDVI(5, covariance="diagonal")]
+    low_rank_layers = [ed.layers.DenseDVI(6, covariance="low_rank", rank=6),
+                       ed.layers.DenseDVI(5, covariance="low_rank", rank=6)]
+    diagonal_layers[1](diagonal_layers[0](inputs))
+    low_rank_layers[1](low_rank_layers[0](inputs))
+    for layers in (diagonal_layers, low_rank_layers):
+      for layer, full_layer in zip(layers, full_layers):
+        layer.set_weights(full_layer.get_weights())
+    diagonal_outputs = diagonal_layers[1](diagonal_layers[0](inputs))
+    low_rank_outputs = low_rank_layers[1](low_rank_layers[0](inputs))
+    self.assertAllClose(low_rank_outputs.distribution.mean(),
+                        full_outputs.distribution.mean())
+    self.assertAllClose(low_rank_outputs.distribution.covariance(),
+                        full_outputs.distribution.covariance())
+    # Diagonal propagation drops correlations after the first layer, so only
+    # its first layer's variances are exact.
+    self.assertAllClose(
+        diagonal_layers[0](inputs).distribution.variance(),
+        full_layers[0](inputs).distribution.variance())
+
+  @parameterized.parameters(
+      {"inputs_shape": (5, 12)},
+      {"inputs_shape": (5, 3, 12)},
+  )
+  def testDenseVariationalDropoutSparsify(self, inputs_shape):
+    inputs = np.random.rand(*inputs_shape).astype(np.float32)
+    layer = ed.layers.DenseVariationalDropout(4, activation=tf.nn.relu)
+    layer(inputs, training=True)
+    # Zero means have infinite dropout rates, so those weights are pruned.
+    mean = np.random.normal(size=(12, 4)).astype(np.float32)
+    mean[:6] = 0.
+    layer.kernel_initializer.mean.assign(mean)
+    sparsity = layer.sparsify()
+    self.assertAllClose(sparsity, 0.5)
+    outputs = layer(inputs, training=False)
+    expected_outputs = tf.nn.relu(np.dot(inputs, mean))
+    self.assertAllClose(outputs, expected_outputs, atol=1e-5)
+    # Training uses the full variational posterior and discards the sparse
+    # kernel, which further updates would make stale.
+    outputs = tf.convert_to_tensor(layer(inputs, training=True))
+    self.assertEqual(outputs.shape, inputs_shape[:-1] + (4,))
+    self.assertIsNone(layer.sparse_kernel)
+    mean *= 2.
+    layer.kernel_initializer.mean.assign(mean)
+    layer.sparsify()
+    outputs = layer(inputs, training=False)
+    self.assertAllClose(outputs, tf.nn.relu(np.dot(inputs, mean)), atol=1e-5)
+
+  def testDenseBatchEnsemble(self):
+    tf.keras.backend.set_learning_phase(1)  # training time
+    ensemble_size = 3
+    examples_per_model = 4
+    input_dim = 5
+    output_dim = 5
+    inputs = tf.random.normal([examples_per_model, input_dim])
+    batched_inputs = tf.tile(inputs, [ensemble_size, 1])
+    layer = ed.layers.DenseBatchEnsemble(
+        output_dim,
+        alpha_initializer="he_normal",
+        gamma_initializer="he_normal",
+        activation=None,
+        ensemble_size=ensemble_size)
+
+    output = layer(batched_inputs)
+    manual_output = [
+        layer.dense(inputs*layer.alpha[i]) * layer.gamma[i] + layer.bias[i]
+        for i in range(ensemble_size)]
+    manual_output = tf.concat(manual_output, axis=0)
+
+    expected_shape = (ensemble_size*examples_per_model, output_dim)
+    self.assertEqual(output.shape, expected_shape)
+    self.assertAllClose(output, manual_output)
+
+    # Per-member inputs broadcast an untiled batch across members.
+    member_output = layer(inputs[tf.newaxis])
+    self.assertEqual(member_output.shape,
+                     (ensemble_size, examples_per_model, output_dim))
+    self.assertAllClose(member_output,
+                        tf.reshape(manual_output, member_output.shape))
+    subset_output = layer(inputs[tf.newaxis], members=[2, 0])
+    self.assertAllClose(subset_output, tf.gather(member_output, [2, 0]))
+
+
+class DenseVariationalDropoutBenchmark(tf.test.Benchmark):
+
+  def _run(self, fn, num_iters=50):
+    """Returns the average wall time of `fn` after a warm-up call."""
+    fn()
+    start = time.time()
+    for _ in range(num_iters):
+      fn()
+    return (time.time() - start) / num_iters
+
+  def benchmarkSparsify(self):
+    inputs = tf.random.normal([128, 1024])
+    layer = ed.layers.DenseVariationalDropout(1024)
+    layer(inputs, training=False)
+    mean = np.random.normal(size=(1024, 1024)).astype(np.float32)
+    mean[np.random.rand(*mean.shape) < 0.95] = 0.
+    layer.kernel_initializer.mean.assign(mean)
+    dense_time = self._run(
+        tf.function(lambda: layer(inputs, training=False)))
+    sparsity = layer.sparsify()
+    sparse_time = self._run(
+        tf.function(lambda: layer(inputs, training=False)))
+    self.report_benchmark(
+        name="sparsify",
+        wall_time=sparse_time,
+        extras={"sparsity": float(sparsity),
+                "dense_wall_time": dense_time,
+                "speedup": dense_time / sparse_time})
 
 
 if __name__ == "__main__":
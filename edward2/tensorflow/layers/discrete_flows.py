@@ -118,104 +118,33 @@ class DiscreteAutoregressiveFlow(tf.keras.layers.Layer):
 
   def call(self, inputs, **kwargs):
     """Forward pass for left-to-right autoregressive generation."""
-    inputs = tf.convert_to_tensor(inputs)
-    length = inputs.shape[-2]
-    if length is None:
-      raise NotImplementedError('length dimension must be known.')
-    # Form initial sequence tensor of shape [..., 1, vocab_size]. In a loop, we
-    # incrementally build a Tensor of shape [..., t, vocab_size] as t grows.
-    outputs = self._initial_call(inputs[..., 0, :], length, **kwargs)
-    # TODO(trandustin): Use tf.while_loop. Unrolling is memory-expensive for big
-    # models and not valid for variable lengths.
-    for t in range(1, length):
-      outputs = self._per_timestep_call(outputs,
-                                        inputs[..., t, :],
-                                        length,
-                                        t,
-                                        **kwargs)
-    return outputs
-
-  def _initial_call(self, new_inputs, length, **kwargs):
-    """Returns Tensor of shape [..., 1, vocab_size].
-
-    Args:
-      new_inputs: Tensor of shape [..., vocab_size], the new input to generate
-        its output.
-      length: Length of final desired sequence.
-      **kwargs: Optional keyword arguments to layer.
-    """
-    inputs = new_inputs[..., tf.newaxis, :]
-    # TODO(trandustin): To handle variable lengths, extend MADE to subset its
-    # input and output layer weights rather than pad inputs.
-    batch_ndims = inputs.shape.ndims - 2
-    padded_inputs = tf.pad(
-        inputs, paddings=[[0, 0]] * batch_ndims + [[0, length - 1], [0, 0]])
-    net = self.layer(padded_inputs, **kwargs)
-    if net.shape[-1] == 2 * self.vocab_size:
-      loc, scale = tf.split(net, 2, axis=-1)
-      loc = loc[..., 0:1, :]
-      loc = tf.cast(utils.one_hot_argmax(loc, self.temperature), inputs.dtype)
-      scale = scale[..., 0:1, :]
-      scale = tf.cast(utils.one_hot_argmax(scale, self.temperature),
-                      inputs.dtype)
-      inverse_scale = utils.multiplicative_inverse(scale, self.vocab_size)
-      shifted_inputs = utils.one_hot_minus(inputs, loc)
-      outputs = utils.one_hot_multiply(shifted_inputs, inverse_scale)
-    elif net.shape[-1] == self.vocab_size:
-      loc = net
-      loc = loc[..., 0:1, :]
-      loc = tf.cast(utils.one_hot_argmax(loc, self.temperature), inputs.dtype)
-      outputs = utils.one_hot_minus(inputs, loc)
-    else:
-      raise ValueError('Output of layer does not have compatible dimensions.')
-    return outputs
+    return _autoregressive_call(self.layer, inputs, self._transform, **kwargs)
 
-  def _per_timestep_call(self,
-                         current_outputs,
-                         new_inputs,
-                         length,
-                         timestep,
-                         **kwargs):
-    """Returns Tensor of shape [..., timestep+1, vocab_size].
+  def _transform(self, net, new_inputs):
+    """Returns Tensor of shape [..., vocab_size].
 
     Args:
-      current_outputs: Tensor of shape [..., timestep, vocab_size], the so-far
-        generated sequence Tensor.
-      new_inputs: Tensor of shape [..., vocab_size], the new input to generate
-        its output given current_outputs.
-      length: Length of final desired sequence.
-      timestep: Current timestep.
-      **kwargs: Optional keyword arguments to layer.
+      net: Tensor of shape [..., 2*vocab_size] or [..., vocab_size], the
+        layer's output at the current timestep.
+      new_inputs: Tensor of shape [..., vocab_size], the input at the current
+        timestep.
     """
-    inputs = tf.concat([current_outputs,
-                        new_inputs[..., tf.newaxis, :]], axis=-2)
-    # TODO(trandustin): To handle variable lengths, extend MADE to subset its
-    # input and output layer weights rather than pad inputs.
-    batch_ndims = inputs.shape.ndims - 2
-    padded_inputs = tf.pad(
-        inputs,
-        paddings=[[0, 0]] * batch_ndims + [[0, length - timestep - 1], [0, 0]])
-    net = self.layer(padded_inputs, **kwargs)
     if net.shape[-1] == 2 * self.vocab_size:
       loc, scale = tf.split(net, 2, axis=-1)
-      loc = loc[..., :(timestep+1), :]
-      loc = tf.cast(utils.one_hot_argmax(loc, self.temperature), inputs.dtype)
-      scale = scale[..., :(timestep+1), :]
+      loc = tf.cast(utils.one_hot_argmax(loc, self.temperature),
+                    new_inputs.dtype)
       scale = tf.cast(utils.one_hot_argmax(scale, self.temperature),
-                      inputs.dtype)
+                      new_inputs.dtype)
       inverse_scale = utils.multiplicative_inverse(scale, self.vocab_size)
-      shifted_inputs = utils.one_hot_minus(inputs, loc)
-      new_outputs = utils.one_hot_multiply(shifted_inputs, inverse_scale)
+      shifted_inputs = utils.one_hot_minus(new_inputs, loc, hard=True)
+      outputs = utils.one_hot_multiply(shifted_inputs, inverse_scale,
+                                       hard=True)
     elif net.shape[-1] == self.vocab_size:
-      loc = net
-      loc = loc[..., :(timestep+1), :]
-      loc = tf.cast(utils.one_hot_argmax(loc, self.temperature), inputs.dtype)
-      new_outputs = utils.one_hot_minus(inputs, loc)
+      loc = tf.cast(utils.one_hot_argmax(net, self.temperature),
+                    new_inputs.dtype)
+      outputs = utils.one_hot_minus(new_inputs, loc, hard=True)
     else:
       raise ValueError('Output of layer does not have compatible dimensions.')
-    outputs = tf.concat([current_outputs, new_outputs[..., -1:, :]], axis=-2)
-    if not tf.executing_eagerly():
-      outputs.set_shape([None] * batch_ndims + [timestep+1, self.vocab_size])
     return outputs
 
   def reverse(self, inputs, **kwargs):
@@ -228,14 +157,14 @@ class DiscreteAutoregressiveFlow(tf.keras.layers.Layer):
       loc, scale = tf.split(net, 2, axis=-1)
       scale = tf.cast(utils.one_hot_argmax(scale, self.temperature),
                       inputs.dtype)
-      scaled_inputs = utils.one_hot_multiply(inputs, scale)
+      scaled_inputs = utils.one_hot_multiply(inputs, scale, hard=True)
     elif net.shape[-1] == self.vocab_size:
       loc = net
       scaled_inputs = inputs
     else:
       raise ValueError('Output of layer does not have compatible dimensions.')
     loc = tf.cast(utils.one_hot_argmax(loc, self.temperature), inputs.dtype)
-    outputs = utils.one_hot_add(loc, scaled_inputs)
+    outputs = utils.one_hot_add(loc, scaled_inputs, hard=True)
     return outputs
 
   def log_det_jacobian(self, inputs):
@@ -332,13 +261,14 @@ class DiscreteBipartiteFlow(tf.keras.layers.Layer):
       scale = tf.cast(utils.one_hot_argmax(scale, self.temperature),
                       inputs.dtype)
       inverse_scale = utils.multiplicative_inverse(scale, self.vocab_size)
-      shifted_inputs = utils.one_hot_minus(inputs, loc)
-      masked_outputs = (1. - mask) * utils.one_hot_multiply(shifted_inputs,
-                                                            inverse_scale)
+      shifted_inputs = utils.one_hot_minus(inputs, loc, hard=True)
+      masked_outputs = (1. - mask) * utils.one_hot_multiply(
+          shifted_inputs, inverse_scale, hard=True)
     elif net.shape[-1] == self.vocab_size:
       loc = net
       loc = tf.cast(utils.one_hot_argmax(loc, self.temperature), inputs.dtype)
-      masked_outputs = (1. - mask) * utils.one_hot_minus(inputs, loc)
+      masked_outputs = (1. - mask) * utils.one_hot_minus(inputs, loc,
+                                                         hard=True)
     else:
       raise ValueError('Output of layer does not have compatible dimensions.')
     outputs = masked_inputs + masked_outputs
@@ -359,14 +289,15 @@ class DiscreteBipartiteFlow(tf.keras.layers.Layer):
       loc, scale = tf.split(net, 2, axis=-1)
       scale = tf.cast(utils.one_hot_argmax(scale, self.temperature),
                       inputs.dtype)
-      scaled_inputs = utils.one_hot_multiply(inputs, scale)
+      scaled_inputs = utils.one_hot_multiply(inputs, scale, hard=True)
     elif net.shape[-1] == self.vocab_size:
       loc = net
       scaled_inputs = inputs
     else:
       raise ValueError('Output of layer does not have compatible dimensions.')
     loc = tf.cast(utils.one_hot_argmax(loc, self.temperature), inputs.dtype)
-    masked_outputs = (1. - mask) * utils.one_hot_add(loc, scaled_inputs)
+    masked_outputs = (1. - mask) * utils.one_hot_add(loc, scaled_inputs,
+                                                     hard=True)
     outputs = masked_inputs + masked_outputs
     return outputs
 
@@ -382,7 +313,13 @@ class SinkhornAutoregressiveFlow(tf.keras.layers.Layer):
   input must have float dtype.)
   """
 
-  def __init__(self, layer, temperature, **kwargs):
+  def __init__(self,
+               layer,
+               temperature,
+               matching_method='hungarian',
+               sinkhorn_tolerance=None,
+               executor=None,
+               **kwargs):
     """Constructs flow.
 
     Args:
@@ -391,11 +328,22 @@ class SinkhornAutoregressiveFlow(tf.keras.layers.Layer):
         `[..., length, vocab_size ** 2]`. Sinkhorn iterations are applied to
         each `layer` output to produce permutation matrices.
       temperature: Positive value determining bias of gradient estimator.
+      matching_method: Method converting the Sinkhorn outputs to permutation
+        matrices, as in `utils.soft_to_hard_permutation`. 'greedy' keeps the
+        flow in-graph.
+      sinkhorn_tolerance: Tolerance on the marginals at which Sinkhorn
+        iterations stop early, as in `utils.sinkhorn`.
+      executor: Optional `concurrent.futures.Executor` solving the batch's
+        'hungarian' matchings in parallel, as in
+        `utils.soft_to_hard_permutation`. The caller owns it.
       **kwargs: kwargs of parent class.
     """
     super(SinkhornAutoregressiveFlow, self).__init__(**kwargs)
     self.layer = layer
     self.temperature = temperature
+    self.matching_method = matching_method
+    self.sinkhorn_tolerance = sinkhorn_tolerance
+    self.executor = executor
 
   def build(self, input_shape):
     input_shape = tf.TensorShape(input_shape)
@@ -414,97 +362,35 @@ class SinkhornAutoregressiveFlow(tf.keras.layers.Layer):
 
   def call(self, inputs, **kwargs):
     """Forward pass for left-to-right autoregressive generation."""
-    inputs = tf.convert_to_tensor(inputs)
-    length = inputs.shape[-2]
-    if length is None:
-      raise NotImplementedError('length dimension must be known.')
-    # Form initial sequence tensor of shape [..., 1, vocab_size]. In a loop, we
-    # incrementally build a Tensor of shape [..., t, vocab_size] as t grows.
-    outputs = self._initial_call(inputs[..., 0, :], length, **kwargs)
-    for t in range(1, length):
-      outputs = self._per_timestep_call(outputs,
-                                        inputs[..., t, :],
-                                        length,
-                                        t,
-                                        **kwargs)
-    return outputs
+    return _autoregressive_call(self.layer, inputs, self._transform, **kwargs)
 
-  def _initial_call(self, new_inputs, length, **kwargs):
-    """Returns Tensor of shape [..., 1, vocab_size].
+  def _transform(self, logits, new_inputs):
+    """Returns Tensor of shape [..., vocab_size].
 
     Args:
-      new_inputs: Tensor of shape [..., vocab_size], the new input to generate
-        its output.
-      length: Length of final desired sequence.
-      **kwargs: Optional keyword arguments to layer.
+      logits: Tensor of shape [..., vocab_size**2], the layer's output at the
+        current timestep.
+      new_inputs: Tensor of shape [..., vocab_size], the input at the current
+        timestep.
     """
-    inputs = new_inputs[..., tf.newaxis, :]
-    # TODO(trandustin): To handle variable lengths, extend MADE to subset its
-    # input and output layer weights rather than pad inputs.
-    batch_ndims = inputs.shape.ndims - 2
-    padded_inputs = tf.pad(
-        inputs, paddings=[[0, 0]] * batch_ndims + [[0, length - 1], [0, 0]])
-    temperature = 1.
-    logits = self.layer(padded_inputs / temperature, **kwargs)
-    logits = logits[..., 0:1, :]
     logits = tf.reshape(
         logits,
-        logits.shape[:-1].concatenate([self.vocab_size, self.vocab_size]))
-    soft = utils.sinkhorn(logits)
-    hard = tf.cast(utils.soft_to_hard_permutation(soft), inputs.dtype)
-    hard = tf.reshape(hard, logits.shape)
+        tf.concat([tf.shape(logits)[:-1], [self.vocab_size, self.vocab_size]],
+                  axis=0))
+    soft = utils.sinkhorn(logits / self.temperature,
+                          tolerance=self.sinkhorn_tolerance)
+    hard = tf.cast(
+        utils.soft_to_hard_permutation(soft,
+                                       method=self.matching_method,
+                                       executor=self.executor),
+        new_inputs.dtype)
+    hard = tf.reshape(hard, tf.shape(logits))
     # Inverse of permutation matrix is its transpose.
-    # inputs is [batch_size, timestep + 1, vocab_size].
-    # hard is [batch_size, timestep + 1, vocab_size, vocab_size].
-    outputs = tf.matmul(inputs[..., tf.newaxis, :],
+    outputs = tf.matmul(new_inputs[..., tf.newaxis, :],
                         hard,
                         transpose_b=True)[..., 0, :]
     return outputs
 
-  def _per_timestep_call(self,
-                         current_outputs,
-                         new_inputs,
-                         length,
-                         timestep,
-                         **kwargs):
-    """Returns Tensor of shape [..., timestep+1, vocab_size].
-
-    Args:
-      current_outputs: Tensor of shape [..., timestep, vocab_size], the so-far
-        generated sequence Tensor.
-      new_inputs: Tensor of shape [..., vocab_size], the new input to generate
-        its output given current_outputs.
-      length: Length of final desired sequence.
-      timestep: Current timestep.
-      **kwargs: Optional keyword arguments to layer.
-    """
-    inputs = tf.concat([current_outputs,
-                        new_inputs[..., tf.newaxis, :]], axis=-2)
-    # TODO(trandustin): To handle variable lengths, extend MADE to subset its
-    # input and output layer weights rather than pad inputs.
-    batch_ndims = inputs.shape.ndims - 2
-    padded_inputs = tf.pad(
-        inputs,
-        paddings=[[0, 0]] * batch_ndims + [[0, length - timestep - 1], [0, 0]])
-    logits = self.layer(padded_inputs, **kwargs)
-    logits = logits[..., :(timestep+1), :]
-    logits = tf.reshape(
-        logits,
-        logits.shape[:-1].concatenate([self.vocab_size, self.vocab_size]))
-    soft = utils.sinkhorn(logits / self.temperature)
-    hard = tf.cast(utils.soft_to_hard_permutation(soft), inputs.dtype)
-    hard = tf.reshape(hard, logits.shape)
-    # Inverse of permutation matrix is its transpose.
-    # inputs is [batch_size, timestep + 1, vocab_size].
-    # hard is [batch_size, timestep + 1, vocab_size, vocab_size].
-    new_outputs = tf.matmul(inputs[..., tf.newaxis, :],
-                            hard,
-                            transpose_b=True)[..., 0, :]
-    outputs = tf.concat([current_outputs, new_outputs[..., -1:, :]], axis=-2)
-    if not tf.executing_eagerly():
-      outputs.set_shape([None] * batch_ndims + [timestep+1, self.vocab_size])
-    return outputs
-
   def reverse(self, inputs, **kwargs):
     """Reverse pass returning the inverse autoregressive transformation."""
     if not self.built:
@@ -514,8 +400,12 @@ class SinkhornAutoregressiveFlow(tf.keras.layers.Layer):
     logits = tf.reshape(
         logits,
         logits.shape[:-1].concatenate([self.vocab_size, self.vocab_size]))
-    soft = utils.sinkhorn(logits / self.temperature, n_iters=20)
-    hard = utils.soft_to_hard_permutation(soft)
+    soft = utils.sinkhorn(logits / self.temperature,
+                          n_iters=20,
+                          tolerance=self.sinkhorn_tolerance)
+    hard = utils.soft_to_hard_permutation(soft,
+                                          method=self.matching_method,
+                                          executor=self.executor)
     hard = tf.reshape(hard, logits.shape)
     # Recover the permutation by right-multiplying by the permutation matrix.
     outputs = tf.matmul(inputs[..., tf.newaxis, :], hard)[..., 0, :]
@@ -523,3 +413,58 @@ class SinkhornAutoregressiveFlow(tf.keras.layers.Layer):
 
   def log_det_jacobian(self, inputs):
     return tf.cast(0, inputs.dtype)
+
+
+def _autoregressive_call(layer, inputs, transform_fn, **kwargs):
+  """Runs left-to-right autoregressive generation in a `tf.while_loop`.
+
+  If `layer` implements the incremental API of `MADE` (`initial_state`,
+  `update_state`, `call_position`), each timestep evaluates the layer at only
+  the current position. Otherwise each timestep reruns `layer` on the sequence
+  generated so far, with not-yet-generated positions set to zero.
+
+  Args:
+    layer: Autoregressive network, in left-to-right order.
+    inputs: Tensor of shape [..., length, vocab_size].
+    transform_fn: Function taking the layer's output at a timestep and the
+      inputs at that timestep, and returning the outputs at that timestep.
+    **kwargs: Optional keyword arguments to layer, or to its `call_position`
+      for the incremental API.
+
+  Returns:
+    Tensor of same shape and dtype as inputs.
+  """
+  inputs = tf.convert_to_tensor(inputs)
+  length = tf.shape(inputs)[-2]
+  if hasattr(layer, 'call_position'):
+    def incremental_body(timestep, state, outputs):
+      new_inputs = inputs[..., timestep, :]
+      net = layer.call_position(state, timestep, **kwargs)
+      new_outputs = transform_fn(net, new_inputs)
+      state = layer.update_state(state, new_outputs, timestep)
+      return timestep + 1, state, outputs.write(timestep, new_outputs)
+
+    outputs = tf.TensorArray(inputs.dtype, size=length)
+    _, _, outputs = tf.while_loop(
+        lambda timestep, *_: timestep < length,
+        incremental_body,
+        [0, layer.initial_state(inputs), outputs])
+    # Move the length dimension from the front to its position in inputs.
+    outputs = outputs.stack()
+    ndims = inputs.shape.ndims
+    outputs = tf.transpose(outputs,
+                           list(range(1, ndims - 1)) + [0, ndims - 1])
+  else:
+    def body(timestep, outputs):
+      net = layer(outputs, **kwargs)
+      new_outputs = transform_fn(net[..., timestep, :],
+                                 inputs[..., timestep, :])
+      position = tf.one_hot(timestep, depth=length, dtype=inputs.dtype)
+      outputs += position[:, tf.newaxis] * new_outputs[..., tf.newaxis, :]
+      return timestep + 1, outputs
+
+    _, outputs = tf.while_loop(lambda timestep, _: timestep < length,
+                               body,
+                               [0, tf.zeros_like(inputs)])
+  outputs.set_shape(inputs.shape)
+  return outputs
@@ -19,6 +19,9 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+from concurrent import futures
+import multiprocessing
+
 from absl.testing import parameterized
 import edward2 as ed
 import numpy as np
@@ -175,6 +178,42 @@ class DiscreteFlowsTest(parameterized.TestCase, tf.test.TestCase):
     for grad in grads:
       self.assertIsNotNone(grad)
 
+  def testDiscreteAutoregressiveFlowIncremental(self):
+    batch_size = 3
+    vocab_size = 7
+    length = 6
+    network = ed.layers.MADE(vocab_size, [16], activation=tf.nn.relu)
+    inputs = np.random.randint(0, vocab_size - 1, size=(batch_size, length))
+    inputs = tf.one_hot(inputs, depth=vocab_size, dtype=tf.float32)
+    # The layer implements MADE's incremental API; wrapping it in a function
+    # hides that API and reruns the layer over the sequence at each timestep.
+    layer = ed.layers.DiscreteAutoregressiveFlow(network, 1.)
+    full_layer = ed.layers.DiscreteAutoregressiveFlow(
+        lambda inputs, **kwargs: network(inputs, **kwargs), 1.)
+    outputs = layer(inputs)
+    self.assertAllClose(outputs, full_layer(inputs))
+    self.assertAllClose(inputs, layer.reverse(outputs))
+    self.assertAllClose(
+        outputs, tf.function(layer)(inputs))
+
+  def testDiscreteAutoregressiveFlowIncrementalKwargs(self):
+
+    class RecordingMADE(ed.layers.MADE):
+
+      def call_position(self, state, timestep, **kwargs):
+        self.position_kwargs = kwargs
+        return super(RecordingMADE, self).call_position(state, timestep,
+                                                        **kwargs)
+
+    vocab_size = 5
+    network = RecordingMADE(vocab_size, [8])
+    inputs = tf.one_hot(np.random.randint(0, vocab_size, size=(2, 4)),
+                        depth=vocab_size, dtype=tf.float32)
+    layer = ed.layers.DiscreteAutoregressiveFlow(network, 1.)
+    outputs = layer(inputs, training=True)
+    self.assertEqual(network.position_kwargs, {"training": True})
+    self.assertAllClose(outputs, layer(inputs, training=False))
+
   def testDiscreteBipartiteFlowCall(self):
     batch_size = 3
     vocab_size = 79
@@ -219,17 +258,31 @@ class DiscreteFlowsTest(parameterized.TestCase, tf.test.TestCase):
     self.assertAllGreaterEqual(outputs, 0)
     self.assertAllLessEqual(outputs, vocab_size - 1)
 
-  def testDiscreteSinkhornFlowInverse(self):
+  @parameterized.parameters(
+      ('hungarian', False),
+      ('hungarian', True),
+      ('greedy', False),
+  )
+  def testDiscreteSinkhornFlowInverse(self, matching_method, use_executor):
     batch_size = 2
     vocab_size = 79
     length = 5
     units = vocab_size ** 2
     inputs = np.random.randint(0, vocab_size - 1, size=(batch_size, length))
     inputs = tf.one_hot(inputs, depth=vocab_size, dtype=tf.float32)
+    executor = None
+    if use_executor:
+      executor = futures.ProcessPoolExecutor(
+          2, mp_context=multiprocessing.get_context('spawn'))
     layer = ed.layers.SinkhornAutoregressiveFlow(
-        ed.layers.MADE(units, []), 1.)
+        ed.layers.MADE(units, []), 1.,
+        matching_method=matching_method,
+        sinkhorn_tolerance=1e-3,
+        executor=executor)
     rev_fwd_inputs = layer.reverse(layer(inputs))
     fwd_rev_inputs = layer(layer.reverse(inputs))
+    if executor is not None:
+      executor.shutdown()
     self.assertAllEqual(inputs, rev_fwd_inputs)
     self.assertAllEqual(inputs, fwd_rev_inputs)
 
@@ -25,6 +25,7 @@ from edward2.tensorflow import initializers
 from edward2.tensorflow import regularizers
 from edward2.tensorflow.layers import utils
 
+import numpy as np
 import tensorflow.compat.v2 as tf
 import tensorflow_probability as tfp
 
@@ -46,7 +47,7 @@ class ExponentiatedQuadratic(object):
     self.variance = variance
     self.lengthscale = lengthscale
 
-  def __call__(self, x1, x2):
+  def __call__(self, x1, x2, chunk_size=None):
     """Computes exponentiated quadratic over all pairs of inputs.
 
     Args:
@@ -56,22 +57,74 @@ class ExponentiatedQuadratic(object):
       x2: Tensor of shape [batch_x2, ...]. Slices along the batch axis denote an
         individual input passed to the kernel function. It is computed pairwise
         with each input sliced from x1.
+      chunk_size: Optional integer. If specified, the output is computed
+        chunk_size rows of x1 at a time, which bounds the intermediate
+        squared-distance tensors to [chunk_size, batch_x2].
 
     Returns:
       Tensor of shape [batch_x1, batch_x2].
     """
-    size = tf.convert_to_tensor(x1).shape.ndims
-    if size > 2:
-      raise NotImplementedError('Multiple feature dimensions is not yet '
-                                'supported.')
-    x1 = x1 / self.lengthscale
-    x2 = x2 / self.lengthscale
-    x1_squared = tf.reduce_sum(tf.square(x1), list(range(1, len(x1.shape))))
-    x2_squared = tf.reduce_sum(tf.square(x2), list(range(1, len(x2.shape))))
+    scaled_x2, x2_squared = self._scale(x2)
+    if x1 is x2:
+      scaled_x1, x1_squared = scaled_x2, x2_squared
+    else:
+      scaled_x1, x1_squared = self._scale(x1)
+    if chunk_size is None:
+      return self._kernel(scaled_x1, x1_squared, scaled_x2, x2_squared)
+    return self._map_rows(
+        lambda kernel: kernel, scaled_x1, x1_squared, scaled_x2, x2_squared,
+        chunk_size)
+
+  def matmul(self, x1, x2, matrix, chunk_size=1024):
+    """Computes the kernel matrix times `matrix`, without forming the kernel.
+
+    Args:
+      x1: Tensor of shape [batch_x1, ...].
+      x2: Tensor of shape [batch_x2, ...].
+      matrix: Tensor of shape [batch_x2, k].
+      chunk_size: integer, number of rows of x1 processed at a time. Memory is
+        O(chunk_size * batch_x2).
+
+    Returns:
+      Tensor of shape [batch_x1, k].
+    """
+    scaled_x2, x2_squared = self._scale(x2)
+    if x1 is x2:
+      scaled_x1, x1_squared = scaled_x2, x2_squared
+    else:
+      scaled_x1, x1_squared = self._scale(x1)
+    return self._map_rows(
+        lambda kernel: tf.matmul(kernel, matrix), scaled_x1, x1_squared,
+        scaled_x2, x2_squared, chunk_size)
+
+  def diag_part(self, x):
+    """Computes the kernel of each input with itself, of shape [batch_x]."""
+    return self.variance * tf.ones(tf.shape(x)[:1], x.dtype)
+
+  def _scale(self, x):
+    """Flattens features, divides by the lengthscale, and computes norms."""
+    x = tf.convert_to_tensor(x)
+    x = tf.reshape(x, [tf.shape(x)[0], -1]) / self.lengthscale
+    return x, tf.reduce_sum(tf.square(x), axis=-1)
+
+  def _kernel(self, scaled_x1, x1_squared, scaled_x2, x2_squared):
     square = (x1_squared[:, tf.newaxis] +
               x2_squared[tf.newaxis, :] -
-              2 * tf.matmul(x1, x2, transpose_b=True))
-    return self.variance * tf.exp(-square / 2)
+              2 * tf.matmul(scaled_x1, scaled_x2, transpose_b=True))
+    return self.variance * tf.exp(-tf.maximum(square, 0.) / 2)
+
+  def _map_rows(self, fn, scaled_x1, x1_squared, scaled_x2, x2_squared,
+                chunk_size):
+    """Applies fn to the kernel matrix, chunk_size rows of x1 at a time."""
+    # Carry each row's squared norm as an extra column so chunks stay aligned.
+    def chunk_fn(chunk):
+      return fn(self._kernel(chunk[:, :-1], chunk[:, -1],
+                             scaled_x2, x2_squared))
+    return utils.map_chunks(
+        chunk_fn,
+        tf.concat([scaled_x1, x1_squared[:, tf.newaxis]], axis=-1),
+        chunk_size,
+        fn_output_signature=scaled_x1.dtype)
 
   def get_config(self):
     return {'variance': self.variance, 'lengthscale': self.lengthscale}
@@ -99,11 +152,42 @@ class LinearKernel(object):
     Returns:
       Tensor of shape [batch_x1, batch_x2].
     """
-    encoded_x1 = self.encoder(x1)
-    encoded_x2 = self.encoder(x2)
+    encoded_x2 = self._encode(x2)
+    encoded_x1 = encoded_x2 if x1 is x2 else self._encode(x1)
     dot_product = tf.matmul(encoded_x1, encoded_x2, transpose_b=True)
     return self.variance * dot_product + self.bias
 
+  def matmul(self, x1, x2, matrix, chunk_size=None):
+    """Computes the kernel matrix times `matrix`, without forming the kernel.
+
+    Args:
+      x1: Tensor of shape [batch_x1] + encoder domain.
+      x2: Tensor of shape [batch_x2] + encoder domain.
+      matrix: Tensor of shape [batch_x2, k].
+      chunk_size: Unused. The product factors through the encodings, so memory
+        is already linear in the batch sizes.
+
+    Returns:
+      Tensor of shape [batch_x1, k].
+    """
+    del chunk_size  # unused
+    encoded_x2 = self._encode(x2)
+    encoded_x1 = encoded_x2 if x1 is x2 else self._encode(x1)
+    projection = tf.matmul(encoded_x2, matrix, transpose_a=True)
+    return (self.variance * tf.matmul(encoded_x1, projection) +
+            self.bias * tf.reduce_sum(matrix, axis=0, keepdims=True))
+
+  def diag_part(self, x):
+    """Computes the kernel of each input with itself, of shape [batch_x]."""
+    encoded_x = self._encode(x)
+    return (self.variance * tf.reduce_sum(tf.square(encoded_x), axis=-1) +
+            self.bias)
+
+  def _encode(self, x):
+    """Encodes inputs and flattens the encodings to [batch_x, features]."""
+    encoded_x = self.encoder(x)
+    return tf.reshape(encoded_x, [tf.shape(encoded_x)[0], -1])
+
   def get_config(self):
     return {
         'variance': self.variance,
@@ -150,6 +234,12 @@ class GaussianProcess(tf.keras.layers.Layer):
       covariance_fn=ExponentiatedQuadratic(variance=1., lengthscale=1.),
       conditional_inputs=None,
       conditional_outputs=None,
+      cache_posterior=False,
+      predictive='full',
+      chunk_size=1024,
+      solver='cholesky',
+      solver_tolerance=1e-5,
+      max_iterations=1000,
       **kwargs):
     """Constructs layer.
 
@@ -164,14 +254,51 @@ class GaussianProcess(tf.keras.layers.Layer):
         same as conditional_outputs', and ellipses must match layer inputs.
       conditional_outputs: Tensor of shape [batch, units], where batch must be
         the same as conditional_inputs' and units is the layer's units size.
+      cache_posterior: bool, whether to reuse the Cholesky factor of Kmm and
+        Kmm^{-1} (conditional_outputs - mean) across calls. The cache is
+        recomputed whenever the conditioning data or the values of the mean
+        and covariance functions' hyperparameters change. Only eager calls
+        use the cache.
+      predictive: 'full' returns a multivariate normal that is correlated
+        across inputs, with a [batch, batch] covariance matrix per unit.
+        'marginal' returns an independent normal with only the marginal
+        variances, never forming a [batch, batch] matrix.
+      chunk_size: integer, number of rows processed at a time when
+        `predictive='marginal'` and in the kernel products of
+        `solver='cg'`. It bounds memory at O(chunk_size * M).
+      solver: 'cholesky' factorizes Kmm, costing O(M^3) time and O(M^2)
+        memory. 'cg' solves against Kmm with Jacobi-preconditioned conjugate
+        gradients, which only needs kernel matrix products computed
+        `chunk_size` rows at a time and never forms Kmm.
+      solver_tolerance: float, relative residual norm at which conjugate
+        gradients stops.
+      max_iterations: integer, maximum number of conjugate gradient
+        iterations.
       **kwargs: kwargs passed to parent class.
+
+    Raises:
+      ValueError: If `predictive` is not 'full' or 'marginal', or `solver` is
+        not 'cholesky' or 'cg'.
     """
+    if predictive not in ('full', 'marginal'):
+      raise ValueError('predictive must be one of \'full\' or \'marginal\', '
+                       'but saw: {}'.format(predictive))
+    if solver not in ('cholesky', 'cg'):
+      raise ValueError('solver must be one of \'cholesky\' or \'cg\', but '
+                       'saw: {}'.format(solver))
     super(GaussianProcess, self).__init__(**kwargs)
     self.units = int(units)
     self.mean_fn = mean_fn
     self.covariance_fn = covariance_fn
     self.conditional_inputs = conditional_inputs
     self.conditional_outputs = conditional_outputs
+    self.cache_posterior = cache_posterior
+    self.predictive = predictive
+    self.chunk_size = chunk_size
+    self.solver = solver
+    self.solver_tolerance = solver_tolerance
+    self.max_iterations = max_iterations
+    self._posterior_cache = None
 
     self.supports_masking = True
     self.input_spec = tf.keras.layers.InputSpec(min_ndim=2)
@@ -182,6 +309,8 @@ class GaussianProcess(tf.keras.layers.Layer):
     self.built = True
 
   def call(self, inputs):
+    if self.predictive == 'marginal':
+      return self._call_marginal(inputs)
     if self.conditional_inputs is None and self.conditional_outputs is None:
       covariance_matrix = self.covariance_fn(inputs, inputs)
       # Tile locations so output has shape [units, batch_size]. Covariance will
@@ -192,54 +321,204 @@ class GaussianProcess(tf.keras.layers.Layer):
     else:
       knn = self.covariance_fn(inputs, inputs)
       knm = self.covariance_fn(inputs, self.conditional_inputs)
-      kmm = self.covariance_fn(self.conditional_inputs, self.conditional_inputs)
-      kmm = tf.linalg.set_diag(
-          kmm, tf.linalg.diag_part(kmm) + tf.keras.backend.epsilon())
-      kmm_tril = tf.linalg.cholesky(kmm)
-      kmm_tril_operator = tf.linalg.LinearOperatorLowerTriangular(kmm_tril)
-      knm_operator = tf.linalg.LinearOperatorFullMatrix(knm)
-
-      # TODO(trandustin): Vectorize linear algebra for multiple outputs. For
-      # now, we do each separately and stack to obtain a locations Tensor of
-      # shape [units, batch_size].
-      loc = []
-      for conditional_outputs_unit in tf.unstack(self.conditional_outputs,
-                                                 axis=-1):
-        center = conditional_outputs_unit - self.mean_fn(
-            self.conditional_inputs)
-        loc_unit = knm_operator.matvec(
-            kmm_tril_operator.solvevec(kmm_tril_operator.solvevec(center),
-                                       adjoint=True))
-        loc.append(loc_unit)
-      loc = tf.stack(loc) + self.mean_fn(inputs)[tf.newaxis]
-
-      covariance_matrix = knn
-      covariance_matrix -= knm_operator.matmul(
-          kmm_tril_operator.solve(
-              kmm_tril_operator.solve(knm, adjoint_arg=True), adjoint=True))
+      alpha, quadratic_form_factors = self._posterior()
+
+      # Compute locations for all units at once, with shape [units, batch_size].
+      loc = (tf.transpose(tf.matmul(knm, alpha)) +
+             self.mean_fn(inputs)[tf.newaxis])
+
+      a, b = quadratic_form_factors(tf.transpose(knm))
+      covariance_matrix = knn - tf.matmul(a, b, transpose_a=True)
 
     covariance_matrix = tf.linalg.set_diag(
         covariance_matrix,
         tf.linalg.diag_part(covariance_matrix) + tf.keras.backend.epsilon())
 
-    # Form a multivariate normal random variable with batch_shape units and
-    # event_shape batch_size. Then make it be independent across the units
-    # dimension. Then transpose its dimensions so it is [batch_size, units].
     random_variable = (
         generated_random_variables.MultivariateNormalFullCovariance(
             loc=loc, covariance_matrix=covariance_matrix))
-    random_variable = generated_random_variables.Independent(
-        random_variable.distribution, reinterpreted_batch_ndims=1)
-    bijector = tfp.bijectors.Inline(
-        forward_fn=lambda x: tf.transpose(x, perm=[1, 0]),
-        inverse_fn=lambda y: tf.transpose(y, perm=[1, 0]),
-        forward_event_shape_fn=lambda input_shape: input_shape[::-1],
-        forward_event_shape_tensor_fn=lambda input_shape: input_shape[::-1],
-        inverse_log_det_jacobian_fn=lambda y: tf.cast(0, y.dtype),
-        forward_min_event_ndims=2)
-    random_variable = generated_random_variables.TransformedDistribution(
-        random_variable.distribution, bijector=bijector)
-    return random_variable
+    return _units_last(random_variable.distribution)
+
+  def _call_marginal(self, inputs):
+    """Returns an independent normal over the marginal predictive."""
+    inputs = tf.convert_to_tensor(inputs)
+    conditioned = not (self.conditional_inputs is None and
+                       self.conditional_outputs is None)
+    if conditioned:
+      alpha, quadratic_form_factors = self._posterior()
+
+    def marginal_moments(inputs_chunk):
+      """Computes locations [chunk_size, units] and variances [chunk_size]."""
+      loc = self.mean_fn(inputs_chunk)[:, tf.newaxis]
+      variance = _diag_part(self.covariance_fn, inputs_chunk)
+      if conditioned:
+        knm = self.covariance_fn(inputs_chunk, self.conditional_inputs)
+        loc += tf.matmul(knm, alpha)
+        a, b = quadratic_form_factors(tf.transpose(knm))
+        variance -= tf.reduce_sum(a * b, axis=0)
+      else:
+        loc = tf.broadcast_to(loc, [tf.shape(inputs_chunk)[0], self.units])
+      return loc, variance
+
+    loc, variance = utils.map_chunks(marginal_moments,
+                                     inputs,
+                                     self.chunk_size,
+                                     fn_output_signature=(inputs.dtype,
+                                                          inputs.dtype))
+    variance = tf.maximum(variance, 0.) + tf.keras.backend.epsilon()
+    scale = tf.broadcast_to(tf.sqrt(variance)[:, tf.newaxis], tf.shape(loc))
+    random_variable = generated_random_variables.Normal(loc=loc, scale=scale)
+    return generated_random_variables.Independent(
+        random_variable.distribution, reinterpreted_batch_ndims=2)
+
+  def _posterior(self):
+    """Returns the input-independent parts of the posterior predictive.
+
+    Returns:
+      alpha: Tensor of shape [batch, units], Kmm^{-1} (conditional_outputs -
+        mean), where batch is the number of conditional inputs.
+      quadratic_form_factors: Function taking Kmn of shape [batch, n] and
+        returning a pair (a, b) such that Knm Kmm^{-1} Kmn = a^T b.
+    """
+    if self.solver == 'cg':
+      conditional_inputs = tf.convert_to_tensor(self.conditional_inputs)
+      preconditioner = (_diag_part(self.covariance_fn, conditional_inputs) +
+                        tf.keras.backend.epsilon())
+
+      def kmm_matmul(matrix):
+        return _kernel_matmul(
+            self.covariance_fn, conditional_inputs, conditional_inputs,
+            matrix, self.chunk_size) + tf.keras.backend.epsilon() * matrix
+
+      def solve(rhs):
+        return _conjugate_gradient(kmm_matmul, rhs, preconditioner,
+                                   self.solver_tolerance, self.max_iterations)
+
+      center = self.conditional_outputs - self.mean_fn(
+          conditional_inputs)[:, tf.newaxis]
+      return solve(center), lambda kmn: (kmn, solve(kmn))
+
+    kmm_tril, alpha = self._posterior_factors()
+
+    def quadratic_form_factors(kmn):
+      # Knm Kmm^{-1} Kmn = v^T v, where v = L^{-1} Kmn and Kmm = L L^T.
+      v = tf.linalg.triangular_solve(kmm_tril, kmn, lower=True)
+      return v, v
+    return alpha, quadratic_form_factors
+
+  def _posterior_factors(self):
+    """Returns Kmm's Cholesky factor and Kmm^{-1} (conditional_outputs - mean).
+
+    Neither depends on the layer's inputs. If `cache_posterior` is set, they are
+    reused across eager calls until the conditioning data or hyperparameters
+    change.
+
+    Returns:
+      Tuple of Tensors of shape [batch, batch] and [batch, units], where batch
+      is the number of conditional inputs.
+    """
+    use_cache = self.cache_posterior and tf.executing_eagerly()
+    if use_cache:
+      state = _posterior_state(self.conditional_inputs,
+                               self.conditional_outputs,
+                               self.mean_fn,
+                               self.covariance_fn)
+      if (self._posterior_cache is not None and
+          _states_equal(self._posterior_cache[0], state)):
+        return self._posterior_cache[1:]
+    kmm = self.covariance_fn(self.conditional_inputs, self.conditional_inputs)
+    kmm = tf.linalg.set_diag(
+        kmm, tf.linalg.diag_part(kmm) + tf.keras.backend.epsilon())
+    kmm_tril = tf.linalg.cholesky(kmm)
+    center = self.conditional_outputs - self.mean_fn(
+        self.conditional_inputs)[:, tf.newaxis]
+    alpha = tf.linalg.cholesky_solve(kmm_tril, center)
+    if use_cache:
+      self._posterior_cache = (state, kmm_tril, alpha)
+    return kmm_tril, alpha
+
+  def condition_on(self, new_inputs, new_outputs, max_size=None):
+    """Adds observations to the conditioning set.
+
+    Instead of refactoring Kmm, this extends its Cholesky factor with a block
+    update, which costs O(M^2 k) for M existing and k new observations. It is
+    meant for eager loops: successive updates always extend the previous
+    factor, and `cache_posterior=True` also lets layer calls reuse it.
+
+    Args:
+      new_inputs: Tensor of shape [k, ...], matching `conditional_inputs`.
+      new_outputs: Tensor of shape [k, units], matching `conditional_outputs`.
+      max_size: Optional integer. If the conditioning set grows beyond it, the
+        oldest observations are dropped, i.e., it is a sliding window. The
+        factor is downdated with rank-one updates, costing O(M^2) each.
+    """
+    new_inputs = tf.convert_to_tensor(new_inputs, dtype=self.dtype)
+    new_outputs = tf.convert_to_tensor(new_outputs, dtype=self.dtype)
+    if self.conditional_inputs is None:
+      self.conditional_inputs = new_inputs
+      self.conditional_outputs = new_outputs
+      kmm = self.covariance_fn(new_inputs, new_inputs)
+      kmm = tf.linalg.set_diag(
+          kmm, tf.linalg.diag_part(kmm) + tf.keras.backend.epsilon())
+      kmm_tril = tf.linalg.cholesky(kmm)
+    else:
+      # [[L, 0], [L21, L22]] factors [[Kmm, Kmk], [Kkm, Kkk]] given Kmm = L L^T,
+      # where L21 = (L^{-1} Kmk)^T and L22 L22^T = Kkk - L21 L21^T.
+      if (tf.executing_eagerly() and self._posterior_cache is not None and
+          _states_equal(self._posterior_cache[0],
+                        _posterior_state(self.conditional_inputs,
+                                         self.conditional_outputs,
+                                         self.mean_fn,
+                                         self.covariance_fn))):
+        # Extend the factor left by the previous update, even without
+        # `cache_posterior`, unless anything it depends on has changed.
+        kmm_tril = self._posterior_cache[1]
+      else:
+        kmm_tril, _ = self._posterior_factors()
+      kmk = self.covariance_fn(self.conditional_inputs, new_inputs)
+      kkk = self.covariance_fn(new_inputs, new_inputs)
+      kkk = tf.linalg.set_diag(
+          kkk, tf.linalg.diag_part(kkk) + tf.keras.backend.epsilon())
+      tril21 = tf.transpose(
+          tf.linalg.triangular_solve(kmm_tril, kmk, lower=True))
+      tril22 = tf.linalg.cholesky(kkk - tf.matmul(tril21, tril21,
+                                                  transpose_b=True))
+      num_new = tf.shape(new_inputs)[0]
+      kmm_tril = tf.concat([
+          tf.concat([kmm_tril, tf.zeros([tf.shape(kmm_tril)[0], num_new],
+                                        dtype=kmm_tril.dtype)], axis=1),
+          tf.concat([tril21, tril22], axis=1)], axis=0)
+      self.conditional_inputs = tf.concat(
+          [tf.cast(self.conditional_inputs, self.dtype), new_inputs], axis=0)
+      self.conditional_outputs = tf.concat(
+          [tf.cast(self.conditional_outputs, self.dtype), new_outputs], axis=0)
+
+    size = int(kmm_tril.shape[0])
+    if max_size is not None and size > max_size:
+      # Dropping the first d observations from [[L11, 0], [L21, L22]] leaves
+      # L21 L21^T + L22 L22^T, a rank-d update of L22.
+      num_dropped = size - max_size
+      tril21 = kmm_tril[num_dropped:, :num_dropped]
+      kmm_tril = kmm_tril[num_dropped:, num_dropped:]
+      for i in range(num_dropped):
+        kmm_tril = tfp.math.cholesky_update(kmm_tril, tril21[:, i])
+      self.conditional_inputs = self.conditional_inputs[num_dropped:]
+      self.conditional_outputs = self.conditional_outputs[num_dropped:]
+
+    if not tf.executing_eagerly():
+      return
+    center = self.conditional_outputs - self.mean_fn(
+        self.conditional_inputs)[:, tf.newaxis]
+    alpha = tf.linalg.cholesky_solve(kmm_tril, center)
+    self._posterior_cache = (_posterior_state(self.conditional_inputs,
+                                              self.conditional_outputs,
+                                              self.mean_fn,
+                                              self.covariance_fn),
+                             kmm_tril, alpha)
+
+  def clear_posterior_cache(self):
+    """Discards any cached posterior factors."""
+    self._posterior_cache = None
 
   def compute_output_shape(self, input_shape):
     input_shape = tf.TensorShape(input_shape)
@@ -259,11 +538,147 @@ class GaussianProcess(tf.keras.layers.Layer):
             self.covariance_fn),
         'conditional_inputs': None,  # don't serialize as it can be large
         'conditional_outputs': None,  # don't serialize as it can be large
+        'cache_posterior': self.cache_posterior,
+        'predictive': self.predictive,
+        'chunk_size': self.chunk_size,
+        'solver': self.solver,
+        'solver_tolerance': self.solver_tolerance,
+        'max_iterations': self.max_iterations,
     }
     base_config = super(GaussianProcess, self).get_config()
     return dict(list(base_config.items()) + list(config.items()))
 
 
+def _units_last(distribution):
+  """Returns a [batch_size, units] random variable given a per-unit one.
+
+  Args:
+    distribution: Multivariate distribution with batch_shape units and
+      event_shape batch_size.
+
+  Returns:
+    RandomVariable which is independent across units and whose dimensions are
+    transposed so it is [batch_size, units].
+  """
+  random_variable = generated_random_variables.Independent(
+      distribution, reinterpreted_batch_ndims=1)
+  bijector = tfp.bijectors.Inline(
+      forward_fn=lambda x: tf.transpose(x, perm=[1, 0]),
+      inverse_fn=lambda y: tf.transpose(y, perm=[1, 0]),
+      forward_event_shape_fn=lambda input_shape: input_shape[::-1],
+      forward_event_shape_tensor_fn=lambda input_shape: input_shape[::-1],
+      inverse_log_det_jacobian_fn=lambda y: tf.cast(0, y.dtype),
+      forward_min_event_ndims=2)
+  return generated_random_variables.TransformedDistribution(
+      random_variable.distribution, bijector=bijector)
+
+
+def _diag_part(covariance_fn, inputs):
+  """Returns the diagonal of covariance_fn(inputs, inputs), of shape [batch]."""
+  diag_part_fn = getattr(covariance_fn, 'diag_part', None)
+  if diag_part_fn is not None:
+    return diag_part_fn(inputs)
+  return tf.linalg.diag_part(covariance_fn(inputs, inputs))
+
+
+def _kernel_matmul(covariance_fn, x1, x2, matrix, chunk_size):
+  """Computes covariance_fn(x1, x2) @ matrix, chunk_size rows at a time."""
+  matmul_fn = getattr(covariance_fn, 'matmul', None)
+  if matmul_fn is not None:
+    return matmul_fn(x1, x2, matrix, chunk_size=chunk_size)
+  return utils.map_chunks(
+      lambda x1_chunk: tf.matmul(covariance_fn(x1_chunk, x2), matrix),
+      x1,
+      chunk_size,
+      fn_output_signature=matrix.dtype)
+
+
+def _conjugate_gradient(matmul_fn, rhs, preconditioner, tolerance,
+                        max_iterations):
+  """Solves A x = rhs for symmetric positive definite A, column by column.
+
+  Args:
+    matmul_fn: Function computing A @ matrix for a Tensor of shape [M, k].
+    rhs: Tensor of shape [M, k].
+    preconditioner: Tensor of shape [M], the diagonal of a Jacobi
+      preconditioner approximating A.
+    tolerance: float, stop once every column's residual norm is at most
+      tolerance times its right-hand side's norm.
+    max_iterations: integer, maximum number of iterations.
+
+  Returns:
+    Tensor of shape [M, k].
+  """
+  rhs = tf.convert_to_tensor(rhs)
+  preconditioner = preconditioner[:, tf.newaxis]
+  threshold = tolerance * tf.norm(rhs, axis=0)
+
+  def cond(i, x, residual, direction, residual_dot):
+    del x, direction, residual_dot  # unused
+    return tf.logical_and(
+        i < max_iterations,
+        tf.reduce_any(tf.norm(residual, axis=0) > threshold))
+
+  def body(i, x, residual, direction, residual_dot):
+    matmul_direction = matmul_fn(direction)
+    # Converged columns have zero residual and direction; keep them fixed.
+    step = tf.math.divide_no_nan(
+        residual_dot, tf.reduce_sum(direction * matmul_direction, axis=0))
+    x += step * direction
+    residual -= step * matmul_direction
+    preconditioned_residual = residual / preconditioner
+    new_residual_dot = tf.reduce_sum(residual * preconditioned_residual,
+                                     axis=0)
+    direction = (preconditioned_residual +
+                 tf.math.divide_no_nan(new_residual_dot, residual_dot) *
+                 direction)
+    return i + 1, x, residual, direction, new_residual_dot
+
+  preconditioned_rhs = rhs / preconditioner
+  _, x, _, _, _ = tf.while_loop(
+      cond, body,
+      (tf.constant(0), tf.zeros_like(rhs), rhs, preconditioned_rhs,
+       tf.reduce_sum(rhs * preconditioned_rhs, axis=0)))
+  return x
+
+
+def _hyperparameters(fn):
+  """Returns the current values of a mean or covariance function's attributes.
+
+  Args:
+    fn: Mean or covariance function, e.g., `ExponentiatedQuadratic`.
+
+  Returns:
+    List of Python numbers and NumPy arrays. Keras layers contribute the values
+    of their weights; other callables and objects are skipped.
+  """
+  values = []
+  attributes = getattr(fn, '__dict__', {})
+  for key in sorted(attributes):
+    value = attributes[key]
+    if isinstance(value, tf.keras.layers.Layer):
+      values.extend(weight.numpy() for weight in value.weights)
+    elif isinstance(value, (tf.Variable, tf.Tensor)):
+      values.append(value.numpy())
+    elif isinstance(value, (int, float, np.ndarray)):
+      values.append(value)
+  return values
+
+
+def _posterior_state(conditional_inputs, conditional_outputs, mean_fn,
+                     covariance_fn):
+  """Returns a snapshot of everything the posterior factors depend on."""
+  return ([np.array(conditional_inputs), np.array(conditional_outputs)] +
+          _hyperparameters(mean_fn) + _hyperparameters(covariance_fn))
+
+
+def _states_equal(state1, state2):
+  return (len(state1) == len(state2) and
+          all(np.shape(value1) == np.shape(value2) and
+              np.array_equal(value1, value2)
+              for value1, value2 in zip(state1, state2)))
+
+
 @utils.add_weight
 class SparseGaussianProcess(GaussianProcess):
   r"""Gaussian process layer with inducing input and output variables.
@@ -298,6 +713,12 @@ class SparseGaussianProcess(GaussianProcess):
   `inducing_inputs`. The multivariate normal is correlated across input
   dimensions and is independent across output dimensions.
 
+  With `whiten=True`, the inducing outputs are instead parameterized as
+  `mean + L v`, where `Kmm = L L^T` and `v` is the learned variable. The
+  standard normal KL regularizer on `v` is then the exact KL divergence to the
+  GP prior on the inducing outputs, and each call computes `L` once for both the
+  predictive and the regularizer, which does not need it.
+
   #### Examples
 
   We demonstrate a three-layer deep GP with variational inference (Salimbeni and
@@ -345,6 +766,7 @@ class SparseGaussianProcess(GaussianProcess):
       inducing_outputs_regularizer='normal_kl_divergence',
       inducing_inputs_constraint=None,
       inducing_outputs_constraint=None,
+      whiten=False,
       **kwargs):
     """Constructs layer.
 
@@ -366,8 +788,16 @@ class SparseGaussianProcess(GaussianProcess):
         inputs.
       inducing_outputs_constraint: Constraint function applied to the inducing
         outputs.
+      whiten: bool, whether the inducing outputs are whitened by the Cholesky
+        factor of Kmm.
       **kwargs: kwargs passed to parent class.
+
+    Raises:
+      ValueError: If `whiten` is set with `solver='cg'`, which never factorizes
+        Kmm.
     """
+    if whiten and kwargs.get('solver', 'cholesky') != 'cholesky':
+      raise ValueError('whiten requires solver=\'cholesky\'.')
     super(SparseGaussianProcess, self).__init__(
         units=units,
         mean_fn=mean_fn,
@@ -388,6 +818,7 @@ class SparseGaussianProcess(GaussianProcess):
         inducing_inputs_constraint)
     self.inducing_outputs_constraint = constraints.get(
         inducing_outputs_constraint)
+    self.whiten = whiten
 
   def build(self, input_shape=None):
     input_shape = tf.TensorShape(input_shape)
@@ -418,3 +849,192 @@ class SparseGaussianProcess(GaussianProcess):
   def call(self, inputs):
     self.call_weights()
     return super(SparseGaussianProcess, self).call(inputs)
+
+  def _posterior_factors(self):
+    if not self.whiten:
+      return super(SparseGaussianProcess, self)._posterior_factors()
+    kmm = self.covariance_fn(self.conditional_inputs, self.conditional_inputs)
+    kmm = tf.linalg.set_diag(
+        kmm, tf.linalg.diag_part(kmm) + tf.keras.backend.epsilon())
+    kmm_tril = tf.linalg.cholesky(kmm)
+    # The inducing outputs are mean + L v, so Kmm^{-1} (outputs - mean) is
+    # L^{-T} v, a triangular solve.
+    alpha = tf.linalg.triangular_solve(
+        kmm_tril, tf.convert_to_tensor(self.conditional_outputs), lower=True,
+        adjoint=True)
+    return kmm_tril, alpha
+
+  def get_config(self):
+    config = {
+        'num_inducing': self.num_inducing,
+        'inducing_inputs_initializer': initializers.serialize(
+            self.inducing_inputs_initializer),
+        'inducing_outputs_initializer': initializers.serialize(
+            self.inducing_outputs_initializer),
+        'inducing_inputs_regularizer': regularizers.serialize(
+            self.inducing_inputs_regularizer),
+        'inducing_outputs_regularizer': regularizers.serialize(
+            self.inducing_outputs_regularizer),
+        'inducing_inputs_constraint': constraints.serialize(
+            self.inducing_inputs_constraint),
+        'inducing_outputs_constraint': constraints.serialize(
+            self.inducing_outputs_constraint),
+        'whiten': self.whiten,
+    }
+    base_config = super(SparseGaussianProcess, self).get_config()
+    return dict(list(base_config.items()) + list(config.items()))
+
+
+class RandomFeatureGaussianProcess(tf.keras.layers.Layer):
+  r"""Gaussian process layer approximated with random Fourier features.
+
+  The layer approximates a GP with a stationary kernel, by default
+  `ExponentiatedQuadratic`, using the random features of Rahimi and Recht
+  (2007). Namely, the kernel is approximated as k(x, x') ~= phi(x)^T phi(x'),
+  where
+
+  ```none
+  phi(x) = sqrt(2 variance / num_features) cos(x W / lengthscale + b),
+  W ~ Normal(0, 1), b ~ Uniform(0, 2 pi).
+  ```
+
+  The frequencies W are drawn from the kernel's spectral density; pass a
+  different `frequency_initializer` to approximate another stationary kernel.
+  The GP is then a Bayesian linear model over the features with a standard
+  normal prior on the coefficients,
+
+  ```none
+  outputs ~ \prod_{unit=1}^{units} MultivariateNormal(output[:, unit] |
+      mean = phi(inputs) A^{-1} phi(X)^T (conditional_outputs[:, unit]) / s,
+      covariance = phi(inputs) A^{-1} phi(inputs)^T),
+  A = phi(X)^T phi(X) / s + I,
+  ```
+
+  where X are the `conditional_inputs` and s is `noise_variance`. Unlike
+  `GaussianProcess`, conditioning costs O(M D^2 + D^3) and prediction O(N D^2)
+  for M conditional inputs, N inputs, and D random features; the covariance is
+  kept in low-rank form.
+  """
+
+  def __init__(self,
+               units,
+               num_features=1024,
+               variance=1.,
+               lengthscale=1.,
+               trainable_lengthscale=False,
+               noise_variance=1e-3,
+               frequency_initializer=None,
+               conditional_inputs=None,
+               conditional_outputs=None,
+               **kwargs):
+    """Constructs layer.
+
+    Args:
+      units: integer, dimensionality of layer.
+      num_features: integer, number of random features D.
+      variance: float, the kernel's variance.
+      lengthscale: float, the kernel's (initial) lengthscale.
+      trainable_lengthscale: bool, whether the lengthscale is a trainable
+        weight of the layer.
+      noise_variance: float, observation noise variance of the
+        conditional outputs.
+      frequency_initializer: Initializer for the random frequencies W of shape
+        [input_dim, num_features], sampling from the kernel's spectral density
+        for unit lengthscale. Defaults to a standard normal, which corresponds
+        to `ExponentiatedQuadratic`.
+      conditional_inputs: Tensor of shape [batch, input_dim], where batch must
+        be the same as conditional_outputs'.
+      conditional_outputs: Tensor of shape [batch, units], where batch must be
+        the same as conditional_inputs' and units is the layer's units size.
+      **kwargs: kwargs passed to parent class.
+    """
+    super(RandomFeatureGaussianProcess, self).__init__(**kwargs)
+    self.units = int(units)
+    self.num_features = int(num_features)
+    self.variance = variance
+    self.initial_lengthscale = lengthscale
+    self.trainable_lengthscale = trainable_lengthscale
+    self.noise_variance = noise_variance
+    if frequency_initializer is None:
+      frequency_initializer = tf.keras.initializers.RandomNormal(stddev=1.)
+    self.frequency_initializer = initializers.get(frequency_initializer)
+    self.conditional_inputs = conditional_inputs
+    self.conditional_outputs = conditional_outputs
+    self.input_spec = tf.keras.layers.InputSpec(ndim=2)
+
+  def build(self, input_shape=None):
+    input_shape = tf.TensorShape(input_shape)
+    input_dim = input_shape[-1]
+    self.frequencies = self.add_weight(
+        shape=(input_dim, self.num_features),
+        name='frequencies',
+        initializer=self.frequency_initializer,
+        trainable=False)
+    self.phases = self.add_weight(
+        shape=(self.num_features,),
+        name='phases',
+        initializer=tf.keras.initializers.RandomUniform(0., 2. * np.pi),
+        trainable=False)
+    self.lengthscale = self.add_weight(
+        shape=(),
+        name='lengthscale',
+        initializer=tf.keras.initializers.Constant(self.initial_lengthscale),
+        constraint=constraints.get('positive'),
+        trainable=self.trainable_lengthscale)
+    self.built = True
+
+  def random_features(self, inputs):
+    """Computes phi(inputs), a Tensor of shape [batch, num_features]."""
+    projection = tf.matmul(inputs / self.lengthscale, self.frequencies)
+    scale = np.sqrt(2. * self.variance / self.num_features)
+    return scale * tf.cos(projection + self.phases)
+
+  def call(self, inputs):
+    inputs = tf.convert_to_tensor(inputs, dtype=self.dtype)
+    features = self.random_features(inputs)
+    if self.conditional_inputs is None and self.conditional_outputs is None:
+      loc = tf.zeros([self.units, tf.shape(inputs)[0]], dtype=self.dtype)
+      scale_factor = features
+    else:
+      conditional_features = self.random_features(
+          tf.convert_to_tensor(self.conditional_inputs, dtype=self.dtype))
+      precision = tf.matmul(conditional_features, conditional_features,
+                            transpose_a=True) / self.noise_variance
+      precision = tf.linalg.set_diag(precision,
+                                     tf.linalg.diag_part(precision) + 1.)
+      precision_tril = tf.linalg.cholesky(precision)
+      coeffs_mean = tf.linalg.cholesky_solve(
+          precision_tril,
+          tf.matmul(conditional_features, self.conditional_outputs,
+                    transpose_a=True)) / self.noise_variance
+      loc = tf.transpose(tf.matmul(features, coeffs_mean))
+      # phi A^{-1} phi^T = v^T v, where v = L^{-1} phi^T and A = L L^T.
+      scale_factor = tf.transpose(tf.linalg.triangular_solve(
+          precision_tril, tf.transpose(features), lower=True))
+    diag = tf.fill(tf.shape(scale_factor)[:1],
+                   tf.cast(tf.keras.backend.epsilon(), self.dtype))
+    random_variable = (
+        generated_random_variables.MultivariateNormalDiagPlusLowRankCovariance(
+            loc=loc, cov_diag_factor=diag, cov_perturb_factor=scale_factor))
+    return _units_last(random_variable.distribution)
+
+  def compute_output_shape(self, input_shape):
+    input_shape = tf.TensorShape(input_shape)
+    input_shape = input_shape.with_rank(2)
+    return input_shape[:-1].concatenate(self.units)
+
+  def get_config(self):
+    config = {
+        'units': self.units,
+        'num_features': self.num_features,
+        'variance': self.variance,
+        'lengthscale': self.initial_lengthscale,
+        'trainable_lengthscale': self.trainable_lengthscale,
+        'noise_variance': self.noise_variance,
+        'frequency_initializer': initializers.serialize(
+            self.frequency_initializer),
+        'conditional_inputs': None,  # don't serialize as it can be large
+        'conditional_outputs': None,  # don't serialize as it can be large
+    }
+    base_config = super(RandomFeatureGaussianProcess, self).get_config()
+    return dict(list(base_config.items()) + list(config.items()))
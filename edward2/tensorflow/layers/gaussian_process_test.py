@@ -19,6 +19,9 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import time
+from unittest import mock
+
 import edward2 as ed
 import numpy as np
 import tensorflow.compat.v2 as tf
@@ -46,6 +49,237 @@ class GaussianProcessTest(tf.test.TestCase):
     self.assertGreaterEqual(test_nats, 0.)
     self.assertEqual(test_outputs.shape, (test_batch_size, output_dim))
 
+  def testGaussianProcessPosteriorMoments(self):
+    train_batch_size = 6
+    test_batch_size = 4
+    input_dim = 3
+    output_dim = 7
+    features = np.random.rand(train_batch_size, input_dim).astype(np.float32)
+    labels = np.random.rand(train_batch_size, output_dim).astype(np.float32)
+    test_features = np.random.rand(test_batch_size, input_dim).astype(
+        np.float32)
+    layer = ed.layers.GaussianProcess(output_dim,
+                                      conditional_inputs=features,
+                                      conditional_outputs=labels)
+    test_outputs = layer(test_features)
+
+    covariance_fn = ed.layers.ExponentiatedQuadratic(variance=1.,
+                                                     lengthscale=1.)
+    knn = covariance_fn(test_features, test_features).numpy()
+    knm = covariance_fn(test_features, features).numpy()
+    kmm = covariance_fn(features, features).numpy()
+    kmm += tf.keras.backend.epsilon() * np.eye(train_batch_size)
+    kmm_inv = np.linalg.inv(kmm.astype(np.float64))
+    expected_mean = knm.dot(kmm_inv).dot(labels)
+    expected_covariance = knn - knm.dot(kmm_inv).dot(knm.T)
+    # The underlying distribution is over [units, batch_size].
+    distribution = test_outputs.distribution.distribution.distribution
+    mean = tf.transpose(distribution.mean())
+    covariance = distribution.covariance()
+    self.assertEqual(mean.shape, (test_batch_size, output_dim))
+    self.assertAllClose(mean, expected_mean, atol=1e-3)
+    self.assertAllClose(covariance[0], expected_covariance, atol=1e-3)
+    self.assertAllClose(covariance[-1], expected_covariance, atol=1e-3)
+
+  def testGaussianProcessCachePosterior(self):
+    train_batch_size = 5
+    test_batch_size = 3
+    input_dim = 4
+    output_dim = 2
+    features = np.random.rand(train_batch_size, input_dim).astype(np.float32)
+    labels = np.random.rand(train_batch_size, output_dim).astype(np.float32)
+    test_features = np.random.rand(test_batch_size, input_dim).astype(
+        np.float32)
+    lengthscale = tf.Variable(1.)
+    covariance_fn = ed.layers.ExponentiatedQuadratic(variance=1.,
+                                                     lengthscale=lengthscale)
+    layer = ed.layers.GaussianProcess(output_dim,
+                                      covariance_fn=covariance_fn,
+                                      conditional_inputs=features,
+                                      conditional_outputs=labels,
+                                      cache_posterior=True)
+    uncached_layer = ed.layers.GaussianProcess(output_dim,
+                                               covariance_fn=covariance_fn,
+                                               conditional_inputs=features,
+                                               conditional_outputs=labels)
+    kmm_tril, alpha = layer._posterior_factors()
+    cached_kmm_tril, cached_alpha = layer._posterior_factors()
+    self.assertIs(kmm_tril, cached_kmm_tril)
+    self.assertIs(alpha, cached_alpha)
+    self.assertAllClose(layer(test_features).distribution.log_prob(labels[:3]),
+                        uncached_layer(test_features).distribution.log_prob(
+                            labels[:3]))
+
+    # Changing a hyperparameter's value invalidates the cache.
+    lengthscale.assign(2.)
+    new_kmm_tril, _ = layer._posterior_factors()
+    self.assertIsNot(new_kmm_tril, kmm_tril)
+    self.assertNotAllClose(new_kmm_tril, kmm_tril)
+    self.assertAllClose(layer(test_features).distribution.log_prob(labels[:3]),
+                        uncached_layer(test_features).distribution.log_prob(
+                            labels[:3]))
+
+    # So does changing the conditioning data.
+    layer.conditional_outputs = labels + 1.
+    _, new_alpha = layer._posterior_factors()
+    self.assertNotAllClose(new_alpha, alpha)
+
+  def testGaussianProcessConditionOn(self):
+    input_dim = 3
+    output_dim = 2
+    features = np.random.rand(8, input_dim).astype(np.float32)
+    labels = np.random.rand(8, output_dim).astype(np.float32)
+    test_features = np.random.rand(4, input_dim).astype(np.float32)
+    test_labels = np.random.rand(4, output_dim).astype(np.float32)
+    layer = ed.layers.GaussianProcess(output_dim, cache_posterior=True)
+    layer.condition_on(features[:3], labels[:3])
+    layer.condition_on(features[3:4], labels[3:4])
+    layer.condition_on(features[4:6], labels[4:6])
+    expected_layer = ed.layers.GaussianProcess(output_dim,
+                                               conditional_inputs=features[:6],
+                                               conditional_outputs=labels[:6])
+    self.assertAllClose(layer._posterior_cache[1],
+                        expected_layer._posterior_factors()[0], atol=1e-4)
+    self.assertAllClose(
+        layer(test_features).distribution.log_prob(test_labels),
+        expected_layer(test_features).distribution.log_prob(test_labels),
+        rtol=1e-4)
+
+    # Sliding window: keep the 5 most recent observations.
+    layer.condition_on(features[6:], labels[6:], max_size=5)
+    expected_layer = ed.layers.GaussianProcess(output_dim,
+                                               conditional_inputs=features[3:],
+                                               conditional_outputs=labels[3:])
+    self.assertAllClose(layer.conditional_inputs, features[3:])
+    kmm_tril = layer._posterior_cache[1]
+    self.assertIs(layer._posterior_factors()[0], kmm_tril)
+    self.assertAllClose(kmm_tril,
+                        expected_layer._posterior_factors()[0], atol=1e-4)
+    self.assertAllClose(
+        layer(test_features).distribution.log_prob(test_labels),
+        expected_layer(test_features).distribution.log_prob(test_labels),
+        rtol=1e-4)
+
+  def testGaussianProcessConditionOnWithoutCache(self):
+    input_dim = 3
+    output_dim = 2
+    features = np.random.rand(6, input_dim).astype(np.float32)
+    labels = np.random.rand(6, output_dim).astype(np.float32)
+    layer = ed.layers.GaussianProcess(output_dim, cache_posterior=False)
+    layer.condition_on(features[:4], labels[:4])
+    with mock.patch.object(tf.linalg, 'cholesky',
+                           wraps=tf.linalg.cholesky) as cholesky:
+      layer.condition_on(features[4:], labels[4:])
+    # Only the block of the 2 new observations is factorized.
+    self.assertLen(cholesky.call_args_list, 1)
+    self.assertEqual(cholesky.call_args_list[0][0][0].shape, (2, 2))
+    expected_layer = ed.layers.GaussianProcess(output_dim,
+                                               conditional_inputs=features,
+                                               conditional_outputs=labels)
+    self.assertAllClose(layer._posterior_cache[1],
+                        expected_layer._posterior_factors()[0], atol=1e-4)
+
+  def testGaussianProcessMarginal(self):
+    train_batch_size = 6
+    test_batch_size = 7
+    input_dim = 3
+    output_dim = 2
+    features = np.random.rand(train_batch_size, input_dim).astype(np.float32)
+    labels = np.random.rand(train_batch_size, output_dim).astype(np.float32)
+    test_features = np.random.rand(test_batch_size, input_dim).astype(
+        np.float32)
+    for conditional_inputs, conditional_outputs in [(None, None),
+                                                    (features, labels)]:
+      layer = ed.layers.GaussianProcess(output_dim,
+                                        conditional_inputs=conditional_inputs,
+                                        conditional_outputs=conditional_outputs)
+      marginal_layer = ed.layers.GaussianProcess(
+          output_dim,
+          conditional_inputs=conditional_inputs,
+          conditional_outputs=conditional_outputs,
+          predictive='marginal',
+          chunk_size=3)
+      distribution = layer(test_features).distribution.distribution.distribution
+      marginal_outputs = marginal_layer(test_features)
+      self.assertEqual(marginal_outputs.shape, (test_batch_size, output_dim))
+      self.assertAllClose(marginal_outputs.distribution.mean(),
+                          tf.transpose(distribution.mean()), atol=1e-4)
+      self.assertAllClose(marginal_outputs.distribution.variance(),
+                          tf.transpose(distribution.variance()), atol=1e-4)
+
+  def testGaussianProcessConjugateGradient(self):
+    train_batch_size = 12
+    test_batch_size = 5
+    input_dim = 3
+    output_dim = 2
+    features = np.random.rand(train_batch_size, input_dim).astype(np.float32)
+    labels = np.random.rand(train_batch_size, output_dim).astype(np.float32)
+    test_features = np.random.rand(test_batch_size, input_dim).astype(
+        np.float32)
+    # A short lengthscale keeps Kmm well-conditioned.
+    covariance_fn = ed.layers.ExponentiatedQuadratic(variance=1.,
+                                                     lengthscale=0.2)
+    for predictive in ['full', 'marginal']:
+      layer = ed.layers.GaussianProcess(output_dim,
+                                        covariance_fn=covariance_fn,
+                                        conditional_inputs=features,
+                                        conditional_outputs=labels,
+                                        predictive=predictive)
+      cg_layer = ed.layers.GaussianProcess(output_dim,
+                                           covariance_fn=covariance_fn,
+                                           conditional_inputs=features,
+                                           conditional_outputs=labels,
+                                           predictive=predictive,
+                                           chunk_size=5,
+                                           solver='cg')
+      distribution = layer(test_features).distribution
+      cg_distribution = cg_layer(test_features).distribution
+      if predictive == 'full':
+        distribution = distribution.distribution.distribution
+        cg_distribution = cg_distribution.distribution.distribution
+        self.assertAllClose(cg_distribution.covariance(),
+                            distribution.covariance(), atol=1e-4)
+      else:
+        self.assertAllClose(cg_distribution.variance(),
+                            distribution.variance(), atol=1e-4)
+      self.assertAllClose(cg_distribution.mean(), distribution.mean(),
+                          atol=1e-4)
+
+  def testExponentiatedQuadraticChunks(self):
+    x1 = np.random.rand(7, 2, 3).astype(np.float32)
+    x2 = np.random.rand(4, 2, 3).astype(np.float32)
+    matrix = np.random.rand(4, 5).astype(np.float32)
+    covariance_fn = ed.layers.ExponentiatedQuadratic(variance=2.,
+                                                     lengthscale=0.5)
+    kernel = covariance_fn(x1, x2)
+    flat_x1 = x1.reshape(7, 6) / 0.5
+    flat_x2 = x2.reshape(4, 6) / 0.5
+    expected_kernel = 2. * np.exp(-0.5 * np.sum(
+        np.square(flat_x1[:, np.newaxis] - flat_x2[np.newaxis]), axis=-1))
+    self.assertAllClose(kernel, expected_kernel)
+    self.assertAllClose(covariance_fn(x1, x2, chunk_size=3), expected_kernel)
+    self.assertAllClose(covariance_fn.matmul(x1, x2, matrix, chunk_size=3),
+                        expected_kernel.dot(matrix))
+    self.assertAllClose(covariance_fn(x1, x1),
+                        covariance_fn(x1, tf.identity(x1)))
+
+  def testLinearKernelEncodesOnce(self):
+    x1 = np.random.rand(6, 3).astype(np.float32)
+    x2 = np.random.rand(4, 3).astype(np.float32)
+    matrix = np.random.rand(4, 2).astype(np.float32)
+    num_calls = []
+
+    def encoder(x):
+      num_calls.append(1)
+      return tf.reshape(tf.concat([x, x], axis=-1), [-1, 2, 3])
+    covariance_fn = ed.layers.LinearKernel(variance=2., bias=0.5,
+                                           encoder=encoder)
+    kernel = covariance_fn(x1, x1)
+    self.assertLen(num_calls, 1)
+    self.assertAllClose(kernel, 4. * x1.dot(x1.T) + 0.5)
+    self.assertAllClose(covariance_fn.matmul(x1, x2, matrix),
+                        covariance_fn(x1, x2).numpy().dot(matrix))
+
   def testGaussianProcessPrior(self):
     batch_size = 3
     input_dim = 4
@@ -96,6 +330,201 @@ class GaussianProcessTest(tf.test.TestCase):
     for grad in grads:
       self.assertIsNotNone(grad)
 
+  def testRandomFeatureGaussianProcessPrior(self):
+    tf.random.set_seed(0)
+    batch_size = 5
+    input_dim = 3
+    output_dim = 2
+    features = np.random.rand(batch_size, input_dim).astype(np.float32)
+    layer = ed.layers.RandomFeatureGaussianProcess(output_dim,
+                                                   num_features=8192)
+    outputs = layer(features)
+    covariance_fn = ed.layers.ExponentiatedQuadratic(variance=1.,
+                                                     lengthscale=1.)
+    distribution = outputs.distribution.distribution.distribution
+    self.assertEqual(outputs.shape, (batch_size, output_dim))
+    self.assertAllClose(distribution.covariance()[0],
+                        covariance_fn(features, features), atol=0.1)
+
+  def testRandomFeatureGaussianProcessPosterior(self):
+    train_batch_size = 20
+    test_batch_size = 4
+    input_dim = 3
+    output_dim = 2
+    noise_variance = 0.1
+    features = np.random.rand(train_batch_size, input_dim).astype(np.float32)
+    labels = np.random.rand(train_batch_size, output_dim).astype(np.float32)
+    test_features = np.random.rand(test_batch_size, input_dim).astype(
+        np.float32)
+    test_labels = np.random.rand(test_batch_size, output_dim).astype(
+        np.float32)
+    layer = ed.layers.RandomFeatureGaussianProcess(
+        output_dim,
+        num_features=16,
+        noise_variance=noise_variance,
+        trainable_lengthscale=True,
+        conditional_inputs=features,
+        conditional_outputs=labels)
+    with tf.GradientTape() as tape:
+      test_outputs = layer(test_features)
+      nll = -test_outputs.distribution.log_prob(test_labels)
+    self.assertIsNotNone(tape.gradient(nll, layer.lengthscale))
+    self.assertLen(layer.trainable_weights, 1)
+
+    phi = layer.random_features(features).numpy().astype(np.float64)
+    test_phi = layer.random_features(test_features).numpy().astype(np.float64)
+    precision_inv = np.linalg.inv(phi.T.dot(phi) / noise_variance +
+                                  np.eye(16))
+    expected_mean = test_phi.dot(precision_inv).dot(phi.T).dot(
+        labels) / noise_variance
+    expected_covariance = test_phi.dot(precision_inv).dot(test_phi.T)
+    distribution = test_outputs.distribution.distribution.distribution
+    self.assertAllClose(tf.transpose(distribution.mean()), expected_mean,
+                        atol=1e-4)
+    self.assertAllClose(distribution.covariance()[0], expected_covariance,
+                        atol=1e-4)
+    layer.get_config()
+
+  def testSparseGaussianProcessWhiten(self):
+    batch_size = 3
+    input_dim = 4
+    output_dim = 5
+    num_inducing = 6
+    features = np.random.rand(batch_size, input_dim).astype(np.float32)
+    labels = np.random.rand(batch_size, output_dim).astype(np.float32)
+    layer = ed.layers.SparseGaussianProcess(output_dim,
+                                            num_inducing=num_inducing,
+                                            whiten=True)
+    with tf.GradientTape() as tape:
+      predictions = layer(features)
+      nll = -tf.reduce_mean(predictions.distribution.log_prob(labels))
+      loss = nll + sum(layer.losses)
+    grads = tape.gradient(loss, layer.variables)
+    for grad in grads:
+      self.assertIsNotNone(grad)
+    self.assertEqual(predictions.shape, (batch_size, output_dim))
+    layer.get_config()
+
+    # With fixed inducing outputs v, the whitened layer is the exact GP
+    # conditioned on the inducing outputs L v.
+    layer = ed.layers.SparseGaussianProcess(output_dim,
+                                            num_inducing=num_inducing,
+                                            inducing_outputs_initializer="ones",
+                                            inducing_outputs_regularizer=None,
+                                            whiten=True)
+    predictions = layer(features)
+    inducing_inputs = layer.conditional_inputs
+    kmm = layer.covariance_fn(inducing_inputs, inducing_inputs)
+    kmm_tril = np.linalg.cholesky(
+        kmm.numpy().astype(np.float64) +
+        tf.keras.backend.epsilon() * np.eye(num_inducing))
+    exact_layer = ed.layers.GaussianProcess(
+        output_dim,
+        conditional_inputs=inducing_inputs,
+        conditional_outputs=kmm_tril.dot(
+            np.ones([num_inducing, output_dim])).astype(np.float32))
+    distribution = predictions.distribution.distribution.distribution
+    exact_distribution = (
+        exact_layer(features).distribution.distribution.distribution)
+    # The two solve against Kmm differently, so they agree up to float32
+    # round-off amplified by Kmm's conditioning.
+    self.assertAllClose(distribution.mean(), exact_distribution.mean(),
+                        atol=1e-2)
+    self.assertAllClose(distribution.covariance(),
+                        exact_distribution.covariance(), atol=1e-2)
+
+
+class SparseGaussianProcessBenchmark(tf.test.Benchmark):
+
+  def benchmarkDeepGaussianProcessStepTime(self):
+    """Reports the training step time of a three-layer deep GP."""
+    batch_size = 256
+    input_dim = 32
+    num_steps = 10
+    features = np.random.rand(batch_size, input_dim).astype(np.float32)
+    labels = np.random.rand(batch_size, 10).astype(np.float32)
+    for whiten in [False, True]:
+      model = tf.keras.Sequential([
+          ed.layers.SparseGaussianProcess(64, num_inducing=256, whiten=whiten),
+          ed.layers.SparseGaussianProcess(64, num_inducing=256, whiten=whiten),
+          ed.layers.SparseGaussianProcess(10, num_inducing=256, whiten=whiten),
+      ])
+      model(features)
+      optimizer = tf.keras.optimizers.SGD(1e-3)
+
+      @tf.function
+      def train_step(model=model, optimizer=optimizer):
+        with tf.GradientTape() as tape:
+          predictions = model(features)
+          nll = -tf.reduce_mean(predictions.distribution.log_prob(labels))
+          loss = nll + sum(model.losses) / batch_size
+        grads = tape.gradient(loss, model.trainable_variables)
+        optimizer.apply_gradients(zip(grads, model.trainable_variables))
+        return loss
+
+      train_step()
+      start = time.time()
+      for _ in range(num_steps):
+        train_step().numpy()
+      self.report_benchmark(
+          name="deep_gp_whiten_{}".format(whiten),
+          wall_time=(time.time() - start) / num_steps)
+
+
+class RandomFeatureGaussianProcessBenchmark(tf.test.Benchmark):
+
+  def benchmarkAccuracyVersusNumFeatures(self):
+    """Reports the error of the posterior predictive against the exact GP."""
+    np.random.seed(0)
+    train_batch_size = 500
+    test_batch_size = 500
+    input_dim = 4
+    noise_variance = 1e-2
+    features = np.random.rand(train_batch_size, input_dim).astype(np.float32)
+    labels = np.sin(3. * features).sum(axis=-1, keepdims=True).astype(
+        np.float32)
+    labels += np.sqrt(noise_variance) * np.random.randn(
+        *labels.shape).astype(np.float32)
+    test_features = np.random.rand(test_batch_size, input_dim).astype(
+        np.float32)
+
+    # The exact GP with the same observation noise, via its covariance.
+    def noisy_covariance_fn(x1, x2):
+      covariance = ed.layers.ExponentiatedQuadratic(variance=1.,
+                                                    lengthscale=1.)(x1, x2)
+      if x1 is x2:
+        covariance += noise_variance * tf.eye(tf.shape(x1)[0])
+      return covariance
+    exact_layer = ed.layers.GaussianProcess(
+        1,
+        covariance_fn=noisy_covariance_fn,
+        conditional_inputs=features,
+        conditional_outputs=labels,
+        predictive='marginal')
+    start = time.time()
+    exact_mean = exact_layer(test_features).distribution.mean().numpy()
+    exact_wall_time = time.time() - start
+
+    for num_features in [64, 256, 1024, 4096]:
+      layer = ed.layers.RandomFeatureGaussianProcess(
+          1,
+          num_features=num_features,
+          noise_variance=noise_variance,
+          conditional_inputs=features,
+          conditional_outputs=labels)
+      start = time.time()
+      outputs = layer(test_features)
+      distribution = outputs.distribution.distribution.distribution
+      mean = tf.transpose(distribution.mean()).numpy()
+      wall_time = time.time() - start
+      error = np.sqrt(np.mean(np.square(mean - exact_mean)))
+      self.report_benchmark(
+          name="num_features_{}".format(num_features),
+          wall_time=wall_time,
+          extras={"mean_rmse_vs_exact": float(error),
+                  "exact_wall_time": exact_wall_time})
+
+
 if __name__ == '__main__':
   tf.enable_v2_behavior()
   tf.test.main()
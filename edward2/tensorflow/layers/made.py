@@ -35,6 +35,12 @@ class MADE(tf.keras.Model):
   The output's units dimension captures per-time-step representations. For
   example, setting units to 2 can parameterize the location and log-scale of an
   autoregressive Gaussian distribution.
+
+  The network is built for the length of its first inputs. Later calls may
+  pass shorter sequences, or set `length` to evaluate a prefix. These calls
+  use only the rows and columns of the input and output weights belonging to
+  the active prefix. This is equivalent to padding the inputs with zeros and
+  slicing the outputs, but its cost is proportional to the active length.
   """
 
   def __init__(self,
@@ -81,6 +87,7 @@ class MADE(tf.keras.Model):
     if length is None or channels is None:
       raise ValueError('The two last dimensions of the inputs to '
                        '`MADE` should be defined. Found `None`.')
+    self._max_length = length
     masks = create_masks(input_dim=length,
                          hidden_dims=self.hidden_dims,
                          input_order=self.input_order,
@@ -127,10 +134,127 @@ class MADE(tf.keras.Model):
         use_bias=self.use_bias)
     self.network.add(layer)
     self.network.add(tf.keras.layers.Reshape([length, self.units]))
+    self.network.build(input_shape)
     self.built = True
 
-  def call(self, inputs):
-    return self.network(inputs)
+  def call(self, inputs, length=None):
+    """Returns the network's outputs for the first `length` positions.
+
+    Args:
+      inputs: Tensor of shape `[..., input_length, channels]`, where
+        input_length is at most the length the network was built with.
+      length: Number of leading positions to evaluate, at most input_length.
+        Defaults to input_length.
+
+    Returns:
+      Tensor of shape `[..., length, units]`.
+    """
+    inputs = tf.convert_to_tensor(inputs)
+    if length is None:
+      length = inputs.shape[-2]
+    if isinstance(length, int) and length == self._max_length:
+      return self.network(inputs)
+    return self._call_prefix(inputs[..., :length, :], length)
+
+  def initial_state(self, inputs):
+    """Returns the state for incremental evaluation, with no positions seen.
+
+    The incremental API computes the network's outputs one position at a time,
+    in the order positions are written to the state. Each position's output
+    only costs a fixed-size evaluation of the upper layers rather than a full
+    pass over the sequence. For correctness, positions must be written in the
+    autoregressive order of `input_order`; for example, index order when
+    `input_order='left-to-right'`.
+
+    Args:
+      inputs: Tensor of shape `[..., length, channels]`, used only for its
+        batch shape and dtype (and to build the network if needed).
+
+    Returns:
+      Tensor of shape `[..., hidden_dims[0]]` (or `[..., length * units]` if
+      there are no hidden layers): the first layer's pre-activation.
+    """
+    inputs = tf.convert_to_tensor(inputs)
+    if not self.built:
+      self._maybe_build(inputs)
+    kernel = self._dense_layers()[0].kernel
+    shape = tf.concat([tf.shape(inputs)[:-2], [kernel.shape[-1]]], axis=0)
+    return tf.zeros(shape, dtype=inputs.dtype)
+
+  def update_state(self, state, new_inputs, timestep):
+    """Adds the contribution of position `timestep`'s inputs to the state.
+
+    Args:
+      state: Tensor returned by `initial_state` or `update_state`.
+      new_inputs: Tensor of shape `[..., channels]`, the inputs at `timestep`.
+      timestep: Scalar integer Tensor, the position of `new_inputs`.
+
+    Returns:
+      Tensor of same shape as `state`.
+    """
+    channels = new_inputs.shape[-1]
+    kernel = self._dense_layers()[0].kernel
+    kernel = tf.reshape(kernel, [-1, channels, kernel.shape[-1]])[timestep]
+    return state + tf.tensordot(new_inputs, kernel, [[-1], [0]])
+
+  def call_position(self, state, timestep, **kwargs):
+    """Returns the network's output at position `timestep`.
+
+    Args:
+      state: Tensor returned by `initial_state` or `update_state`, holding the
+        inputs at all positions `timestep` depends on.
+      timestep: Scalar integer Tensor, the position to compute.
+      **kwargs: Keyword arguments to the hidden layers' calls, e.g.,
+        `training`.
+
+    Returns:
+      Tensor of shape `[..., units]`, equal to `self(inputs)[..., timestep, :]`.
+    """
+    layers = self._dense_layers()
+    if not self.hidden_dims:
+      net = tf.reshape(state, tf.concat([tf.shape(state)[:-1],
+                                         [-1, self.units]], axis=0))
+      net = net[..., timestep, :]
+    else:
+      net = state
+      if self.use_bias:
+        net += layers[0].bias
+      net = self.activation(net)
+      for layer in layers[1:-1]:
+        net = layer(net, **kwargs)
+      kernel = tf.reshape(layers[-1].kernel, [net.shape[-1], -1, self.units])
+      net = tf.tensordot(net, kernel[:, timestep], [[-1], [0]])
+    if self.use_bias:
+      net += tf.reshape(layers[-1].bias, [-1, self.units])[timestep]
+    return net
+
+  def _call_prefix(self, inputs, length):
+    """Evaluates the network on a prefix using subsets of the weights."""
+    layers = self._dense_layers()
+    channels = inputs.shape[-1]
+    batch_shape = tf.shape(inputs)[:-2]
+    net = tf.reshape(inputs, tf.concat([batch_shape, [length * channels]],
+                                       axis=0))
+    if self.hidden_dims:
+      net = tf.tensordot(net, layers[0].kernel[:length * channels],
+                         [[-1], [0]])
+      if self.use_bias:
+        net += layers[0].bias
+      net = self.activation(net)
+      for layer in layers[1:-1]:
+        net = layer(net)
+      kernel = layers[-1].kernel[:, :length * self.units]
+    else:
+      kernel = layers[-1].kernel[:length * channels, :length * self.units]
+    net = tf.tensordot(net, kernel, [[-1], [0]])
+    if self.use_bias:
+      net += layers[-1].bias[:length * self.units]
+    return tf.reshape(net, tf.concat([batch_shape, [length, self.units]],
+                                     axis=0))
+
+  def _dense_layers(self):
+    return [layer for layer in self.network.layers
+            if isinstance(layer, tf.keras.layers.Dense)]
 
 
 def create_degrees(input_dim,
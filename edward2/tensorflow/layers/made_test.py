@@ -86,6 +86,43 @@ class MADETest(tf.test.TestCase):
     self.assertAllEqual(outputs[:, 0, :], np.zeros((batch_size, units)))
     self.assertEqual(outputs.shape, (batch_size, length, units))
 
+  def testMADEIncremental(self):
+    np.random.seed(2048)
+    batch_size = 2
+    length = 4
+    channels = 3
+    units = 5
+    network = ed.layers.MADE(units, [8, 8], activation=tf.nn.relu)
+    inputs = tf.random.normal([batch_size, length, channels])
+    outputs = network(inputs)
+
+    state = network.initial_state(inputs)
+    for t in range(length):
+      position_outputs = network.call_position(state, t)
+      self.assertAllClose(position_outputs, outputs[:, t, :], atol=1e-5)
+      state = network.update_state(state, inputs[:, t, :], t)
+
+  def testMADEPrefix(self):
+    np.random.seed(4096)
+    batch_size = 2
+    length = 5
+    channels = 3
+    units = 4
+    network = ed.layers.MADE(units, [8], activation=tf.nn.relu)
+    inputs = tf.random.normal([batch_size, length, channels])
+    network(inputs)
+
+    prefix_length = 3
+    prefix_inputs = inputs[:, :prefix_length]
+    padded_inputs = tf.pad(prefix_inputs,
+                           [[0, 0], [0, length - prefix_length], [0, 0]])
+    expected_outputs = network(padded_inputs)[:, :prefix_length]
+    outputs = network(prefix_inputs)
+    self.assertEqual(outputs.shape, (batch_size, prefix_length, units))
+    self.assertAllClose(outputs, expected_outputs, atol=1e-5)
+    self.assertAllClose(network(padded_inputs, length=prefix_length),
+                        expected_outputs, atol=1e-5)
+
 
 if __name__ == '__main__':
   tf.enable_v2_behavior()
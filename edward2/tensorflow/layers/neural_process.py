@@ -25,26 +25,20 @@ import tensorflow.compat.v2 as tf
 import tensorflow_probability as tfp
 
 
-def batch_mlp(inputs, hidden_sizes):
-  """Apply MLP to the final axis of a 3D tensor.
+def batch_mlp(hidden_sizes):
+  """Returns an MLP applied to the final axis of a 3D tensor.
+
+  The MLP maps Tensors of shape [batch_size, n, d_in] to Tensors of shape
+  [batch_size, n, d_out] where d_out = hidden_sizes[-1]. Create it once and
+  reuse it across calls so its weights persist.
 
   Args:
-    inputs: input Tensor of shape [batch_size, n, d_in].
     hidden_sizes: An iterable containing the hidden layer sizes of the MLP.
-
-  Returns:
-    Tensor of shape [batch_size, n, d_out] where d_out = output_sizes[-1].
   """
-  inputs = tf.convert_to_tensor(inputs)
-  batch_size, _, filter_size = inputs.shape.as_list()
-  hidden = tf.reshape(inputs, (-1, filter_size))
-
-  for size in hidden_sizes[:-1]:
-    hidden = tf.keras.layers.Dense(size, activation=tf.nn.relu)(hidden)
-
-  output = tf.keras.layers.Dense(hidden_sizes[-1], activation=None)(hidden)
-  output = tf.reshape(output, (batch_size, -1, hidden_sizes[-1]))
-  return output
+  layers = [tf.keras.layers.Dense(size, activation=tf.nn.relu)
+            for size in hidden_sizes[:-1]]
+  layers.append(tf.keras.layers.Dense(hidden_sizes[-1], activation=None))
+  return tf.keras.Sequential(layers)
 
 
 # TODO(adityagrover): Reimplement using preexisting attention routines in T2T
@@ -114,48 +108,77 @@ def dot_product_attention(q, k, v, normalise):
   return rep
 
 
-def multihead_attention(q, k, v, num_heads=8):
+def multihead_attention(projection_nets, q, k, v):
   """Computes multi-head attention.
 
   Args:
+    projection_nets: List with, for each head, a list of the projection
+      networks for q, k, v, and the dot product output, as returned by
+      `multihead_projection_nets`.
     q: queries. Tensor of  shape [batch_size, m, d_k].
     k: keys. Tensor of shape [batch_size, n, d_k].
     v: values. Tensor of shape [batch_size, n, d_v].
-    num_heads: number of heads. Should divide d_v.
 
   Returns:
     Tensor of shape [batch_size, m, d_v].
   """
-  d_k = q.shape.as_list()[-1]
-  d_v = v.shape.as_list()[-1]
-  head_size = int(d_v / num_heads)
-  key_initializer = tf.keras.initializers.RandomNormal(stddev=d_k**-0.5)
-  value_initializer = tf.keras.initializers.RandomNormal(stddev=d_v**-0.5)
   rep = tf.constant(0.0)
-  for h in range(num_heads):
-    o = dot_product_attention(
-        tf.keras.layers.Conv1D(
-            head_size, 1, kernel_initializer=key_initializer,
-            name='wq%d' % h, use_bias=False, padding='VALID')(q),
-        tf.keras.layers.Conv1D(
-            head_size, 1, kernel_initializer=key_initializer,
-            name='wk%d' % h, use_bias=False, padding='VALID')(k),
-        tf.keras.layers.Conv1D(
-            head_size, 1, kernel_initializer=key_initializer,
-            name='wv%d' % h, use_bias=False, padding='VALID')(v),
-        normalise=True)
-    rep += tf.keras.layers.Conv1D(d_v, 1, kernel_initializer=value_initializer,
-                                  name='wo%d' % h, use_bias=False,
-                                  padding='VALID')(o)
+  for q_net, k_net, v_net, r_net in projection_nets:
+    o = dot_product_attention(q_net(q), k_net(k), v_net(v), normalise=True)
+    rep += r_net(o)
   return rep
 
 
+def multihead_projection_nets(d_k, d_v, num_heads):
+  """Returns the projection networks for each head of multi-head attention.
+
+  Args:
+    d_k: Dimensionality of queries and keys.
+    d_v: Dimensionality of values.
+    num_heads: number of heads. Should divide d_v.
+
+  Returns:
+    List with, for each head, a list of the projection networks for queries,
+    keys, values, and the dot product output.
+  """
+  head_size = int(d_v / num_heads)
+  key_stddev = d_k**-0.5
+  value_stddev = d_v**-0.5
+  projection_nets = []
+  # Each projection gets its own initializer instance. Keras gives all layers
+  # sharing an unseeded instance the same initial kernel.
+  for h in range(num_heads):
+    query_net = tf.keras.layers.Conv1D(
+        head_size, 1, kernel_initializer=tf.keras.initializers.RandomNormal(
+            stddev=key_stddev),
+        name='wq%d' % h, use_bias=False, padding='VALID')
+    key_net = tf.keras.layers.Conv1D(
+        head_size, 1, kernel_initializer=tf.keras.initializers.RandomNormal(
+            stddev=key_stddev),
+        name='wk%d' % h, use_bias=False, padding='VALID')
+    value_net = tf.keras.layers.Conv1D(
+        head_size, 1, kernel_initializer=tf.keras.initializers.RandomNormal(
+            stddev=key_stddev),
+        name='wv%d' % h, use_bias=False, padding='VALID')
+    rep_net = tf.keras.layers.Conv1D(
+        d_v, 1, kernel_initializer=tf.keras.initializers.RandomNormal(
+            stddev=value_stddev),
+        name='wo%d' % h, use_bias=False, padding='VALID')
+    projection_nets.append([query_net, key_net, value_net, rep_net])
+  return projection_nets
+
+
 # TODO(adityagrover): Implement via T2T.
-class Attention(object):
-  """The Attention module."""
+class Attention(tf.keras.layers.Layer):
+  """The Attention module.
+
+  Its networks are created once and reused across calls. The multi-head
+  projections depend on the dimensions of keys and values, so they are created
+  on the first call.
+  """
 
   def __init__(self, rep, output_sizes, att_type, scale=1., normalise=True,
-               num_heads=8):
+               num_heads=8, **kwargs):
     """Creates a attention module.
 
     Takes in context inputs, target inputs and
@@ -174,7 +197,9 @@ class Attention(object):
           1. apply softmax to weights so they sum to 1 across context pts or
           2. apply custom transformation to have weights in [0, 1].
       num_heads: number of heads for multihead.
+      **kwargs: Keyword arguments of parent class.
     """
+    super(Attention, self).__init__(**kwargs)
     self._rep = rep
     self._output_sizes = output_sizes
     self._type = att_type
@@ -182,8 +207,12 @@ class Attention(object):
     self._normalise = normalise
     if self._type == 'multihead':
       self._num_heads = num_heads
+    if self._rep == 'mlp':
+      # Keys and queries share the same embedding.
+      self._mlp = batch_mlp(output_sizes)
+    self._projection_nets = None
 
-  def __call__(self, x1, x2, r):
+  def call(self, x1, x2, r):
     """Applies attention to create aggregated representation of r.
 
     Args:
@@ -200,8 +229,8 @@ class Attention(object):
     if self._rep == 'identity':
       k, q = (x1, x2)
     elif self._rep == 'mlp':
-      k = batch_mlp(x1, self._output_sizes)
-      q = batch_mlp(x2, self._output_sizes)
+      k = self._mlp(x1)
+      q = self._mlp(x2)
     else:
       raise NameError("'rep' not among ['identity', 'mlp']")
 
@@ -212,7 +241,10 @@ class Attention(object):
     elif self._type == 'dot_product':
       rep = dot_product_attention(q, k, r, self._normalise)
     elif self._type == 'multihead':
-      rep = multihead_attention(q, k, r, self._num_heads)
+      if self._projection_nets is None:
+        self._projection_nets = multihead_projection_nets(
+            k.shape[-1], r.shape[-1], self._num_heads)
+      rep = multihead_attention(self._projection_nets, q, k, r)
     else:
       raise NameError(("'att_type' not among ['uniform', 'laplace', "
                        "'dot_product', 'multihead']"))
@@ -252,6 +284,17 @@ class NeuralProcess(tf.keras.Model):
     self._use_deterministic_path = use_deterministic_path
     self._attention = attention_wrapper
 
+    self._latent_encoder_mlp = batch_mlp(latent_encoder_sizes)
+    self._latent_encoder_hidden = tf.keras.layers.Dense(
+        (latent_encoder_sizes[-1] + num_latents)//2, activation=tf.nn.relu)
+    self._latent_encoder_loc = tf.keras.layers.Dense(num_latents,
+                                                     activation=None)
+    self._latent_encoder_scale = tf.keras.layers.Dense(num_latents,
+                                                       activation=None)
+    if use_deterministic_path:
+      self._deterministic_encoder_mlp = batch_mlp(deterministic_encoder_sizes)
+    self._decoder_mlp = batch_mlp(decoder_sizes)
+
   def latent_encoder(self, x, y):
     """Encodes the inputs into one representation.
 
@@ -265,15 +308,11 @@ class NeuralProcess(tf.keras.Model):
       A normal distribution over tensors of shape [batch_size, num_latents].
     """
     encoder_input = tf.concat([x, y], axis=-1)
-    per_example_embedding = batch_mlp(
-        encoder_input, self._latent_encoder_sizes)
+    per_example_embedding = self._latent_encoder_mlp(encoder_input)
     dataset_embedding = tf.reduce_mean(per_example_embedding, axis=1)
-    hidden = tf.keras.layers.Dense(
-        (self._latent_encoder_sizes[-1] + self._num_latents)//2,
-        activation=tf.nn.relu)(dataset_embedding)
-    loc = tf.keras.layers.Dense(self._num_latents, activation=None)(hidden)
-    untransformed_scale = tf.keras.layers.Dense(self._num_latents,
-                                                activation=None)(hidden)
+    hidden = self._latent_encoder_hidden(dataset_embedding)
+    loc = self._latent_encoder_loc(hidden)
+    untransformed_scale = self._latent_encoder_scale(hidden)
     # Constraint scale following Garnelo et al. (2018).
     scale_diag = 0.1 + 0.9 * tf.sigmoid(untransformed_scale)
     return generated_random_variables.MultivariateNormalDiag(
@@ -294,8 +333,7 @@ class NeuralProcess(tf.keras.Model):
       Encodings. Tensor of shape [batch_size, target_observations, d].
     """
     encoder_input = tf.concat([context_x, context_y], axis=-1)
-    per_example_embedding = batch_mlp(encoder_input,
-                                      self._deterministic_encoder_sizes)
+    per_example_embedding = self._deterministic_encoder_mlp(encoder_input)
     per_target_embedding = self._attention(context_x,
                                            target_x,
                                            per_example_embedding)
@@ -315,7 +353,7 @@ class NeuralProcess(tf.keras.Model):
           tensors of shape [batch_size, target_observations, d_y].
     """
     decoder_input = tf.concat([representation, target_x], axis=-1)
-    hidden = batch_mlp(decoder_input, self._decoder_sizes)
+    hidden = self._decoder_mlp(decoder_input)
     loc, untransformed_scale = tf.split(hidden, 2, axis=-1)
     scale_diag = 0.1 + 0.9 * tf.nn.softplus(untransformed_scale)
     return tfp.distributions.MultivariateNormalDiag(loc=loc,
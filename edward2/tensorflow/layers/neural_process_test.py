@@ -187,6 +187,32 @@ class NeuralProcessTest(tf.test.TestCase):
       self.assertEqual(predictive_dist.scale.shape,
                        (batch_size, self.num_targets, 1, 1))
 
+  def testPersistentWeights(self):
+    (valid_context_x,
+     valid_context_y,
+     valid_target_x,
+     valid_target_y) = self.valid_data
+    query = (valid_context_x, valid_context_y), valid_target_x
+
+    for model in self.models:
+      model(query, valid_target_y)
+      num_variables = len(model.trainable_variables)
+      embedding = model.deterministic_encoder(
+          valid_context_x, valid_context_y, valid_target_x)
+      compiled_embedding = tf.function(model.deterministic_encoder)(
+          valid_context_x, valid_context_y, valid_target_x)
+      tf.function(model)(query, valid_target_y)
+      self.assertEqual(len(model.trainable_variables), num_variables)
+      self.assertAllClose(embedding, compiled_embedding)
+
+    # Heads, and queries and keys within a head, start from distinct kernels.
+    projection_nets = self.anp_model._attention._projection_nets
+    (query_net0, key_net0, _, rep_net0), (query_net1, _, _, rep_net1) = (
+        projection_nets[:2])
+    self.assertNotAllClose(query_net0.kernel, key_net0.kernel)
+    self.assertNotAllClose(query_net0.kernel, query_net1.kernel)
+    self.assertNotAllClose(rep_net0.kernel, rep_net1.kernel)
+
 
 if __name__ == '__main__':
   tf.enable_v2_behavior()
@@ -21,6 +21,7 @@ from __future__ import print_function
 
 from edward2.tensorflow import random_variable
 from edward2.tensorflow import transformed_random_variable
+from edward2.tensorflow.layers import utils
 import tensorflow.compat.v2 as tf
 
 
@@ -84,30 +85,193 @@ class ActNorm(tf.keras.layers.Layer):
     return log_det_jacobian
 
 
-def ensemble_batchnorm(x, ensemble_size=1, use_tpu=True, **kwargs):
+class EnsembleBatchNormalization(tf.keras.layers.Layer):
+  """Batch normalization with separate statistics per ensemble member.
+
+  Inputs are tiled across members as in `DenseBatchEnsemble` and
+  `Conv2DBatchEnsemble`: of shape `[ensemble_size * batch_size, ...]`, where
+  the first `batch_size` examples belong to the first member and so on. The
+  layer computes all members' moments with one reduction over a
+  `[ensemble_size, batch_size, ...]` view of the inputs. Scales, offsets, and
+  moving statistics are stacked variables of shape `[ensemble_size, channels]`.
+  All shapes are static given the inputs', so the layer runs as is on
+  accelerators and under XLA.
+  """
+
+  def __init__(self,
+               ensemble_size=1,
+               axis=-1,
+               momentum=0.99,
+               epsilon=1e-3,
+               center=True,
+               scale=True,
+               beta_initializer='zeros',
+               gamma_initializer='ones',
+               moving_mean_initializer='zeros',
+               moving_variance_initializer='ones',
+               beta_regularizer=None,
+               gamma_regularizer=None,
+               beta_constraint=None,
+               gamma_constraint=None,
+               **kwargs):
+    super(EnsembleBatchNormalization, self).__init__(**kwargs)
+    self.ensemble_size = ensemble_size
+    self.axis = axis
+    self.momentum = momentum
+    self.epsilon = epsilon
+    self.center = center
+    self.scale = scale
+    self.beta_initializer = tf.keras.initializers.get(beta_initializer)
+    self.gamma_initializer = tf.keras.initializers.get(gamma_initializer)
+    self.moving_mean_initializer = tf.keras.initializers.get(
+        moving_mean_initializer)
+    self.moving_variance_initializer = tf.keras.initializers.get(
+        moving_variance_initializer)
+    self.beta_regularizer = tf.keras.regularizers.get(beta_regularizer)
+    self.gamma_regularizer = tf.keras.regularizers.get(gamma_regularizer)
+    self.beta_constraint = tf.keras.constraints.get(beta_constraint)
+    self.gamma_constraint = tf.keras.constraints.get(gamma_constraint)
+
+  def build(self, input_shape):
+    input_shape = tf.TensorShape(input_shape)
+    ndims = input_shape.ndims
+    if self.axis < 0:
+      self.axis += ndims
+    if self.axis == 0:
+      raise ValueError('The batch dimension cannot be normalized over.')
+    channels = input_shape[self.axis]
+    if channels is None:
+      raise ValueError('Axis {} of the inputs to `EnsembleBatchNormalization` '
+                       'should be defined. Found `None`.'.format(self.axis))
+    param_shape = [self.ensemble_size, channels]
+    if self.scale:
+      self.gamma = self.add_weight(
+          name='gamma',
+          shape=param_shape,
+          initializer=self.gamma_initializer,
+          regularizer=self.gamma_regularizer,
+          constraint=self.gamma_constraint,
+          trainable=True)
+    else:
+      self.gamma = None
+    if self.center:
+      self.beta = self.add_weight(
+          name='beta',
+          shape=param_shape,
+          initializer=self.beta_initializer,
+          regularizer=self.beta_regularizer,
+          constraint=self.beta_constraint,
+          trainable=True)
+    else:
+      self.beta = None
+    self.moving_mean = self.add_weight(
+        name='moving_mean',
+        shape=param_shape,
+        initializer=self.moving_mean_initializer,
+        trainable=False)
+    self.moving_variance = self.add_weight(
+        name='moving_variance',
+        shape=param_shape,
+        initializer=self.moving_variance_initializer,
+        trainable=False)
+    self.built = True
+
+  def call(self, inputs, training=None):
+    if training is None:
+      training = tf.keras.backend.learning_phase()
+    training_value = utils.smart_constant_value(training)
+    if training_value is not None:
+      return self._normalize(inputs, training=training_value)
+    return tf.cond(pred=training,
+                   true_fn=lambda: self._normalize(inputs, training=True),
+                   false_fn=lambda: self._normalize(inputs, training=False))
+
+  def _normalize(self, inputs, training):
+    """Normalizes inputs using batch moments or moving statistics."""
+    inputs = tf.convert_to_tensor(inputs, dtype=self.dtype)
+    ndims = inputs.shape.ndims
+    # View inputs as [ensemble_size, batch_size, ...]; the channel axis shifts
+    # by one.
+    grouped_shape = tf.concat(
+        [[self.ensemble_size, -1], tf.shape(inputs)[1:]], axis=0)
+    grouped_inputs = tf.reshape(inputs, grouped_shape)
+    channel_axis = self.axis + 1
+    reduction_axes = [i for i in range(1, ndims + 1) if i != channel_axis]
+    # Per-member parameters of shape [ensemble_size, 1, ..., channels, ...].
+    param_shape = [1] * (ndims + 1)
+    param_shape[0] = self.ensemble_size
+    param_shape[channel_axis] = -1
+    reshape = lambda x: None if x is None else tf.reshape(x, param_shape)
+
+    if training:
+      mean, variance = tf.nn.moments(grouped_inputs,
+                                     axes=reduction_axes,
+                                     keepdims=True)
+      flat_shape = [self.ensemble_size, -1]
+      self.moving_mean.assign(
+          self.momentum * self.moving_mean +
+          (1. - self.momentum) * tf.reshape(mean, flat_shape))
+      self.moving_variance.assign(
+          self.momentum * self.moving_variance +
+          (1. - self.momentum) * tf.reshape(variance, flat_shape))
+    else:
+      mean = reshape(self.moving_mean)
+      variance = reshape(self.moving_variance)
+    outputs = tf.nn.batch_normalization(grouped_inputs,
+                                        mean=mean,
+                                        variance=variance,
+                                        offset=reshape(self.beta),
+                                        scale=reshape(self.gamma),
+                                        variance_epsilon=self.epsilon)
+    outputs = tf.reshape(outputs, tf.shape(inputs))
+    outputs.set_shape(inputs.shape)
+    return outputs
+
+  def get_config(self):
+    config = {
+        'ensemble_size': self.ensemble_size,
+        'axis': self.axis,
+        'momentum': self.momentum,
+        'epsilon': self.epsilon,
+        'center': self.center,
+        'scale': self.scale,
+        'beta_initializer': tf.keras.initializers.serialize(
+            self.beta_initializer),
+        'gamma_initializer': tf.keras.initializers.serialize(
+            self.gamma_initializer),
+        'moving_mean_initializer': tf.keras.initializers.serialize(
+            self.moving_mean_initializer),
+        'moving_variance_initializer': tf.keras.initializers.serialize(
+            self.moving_variance_initializer),
+        'beta_regularizer': tf.keras.regularizers.serialize(
+            self.beta_regularizer),
+        'gamma_regularizer': tf.keras.regularizers.serialize(
+            self.gamma_regularizer),
+        'beta_constraint': tf.keras.constraints.serialize(
+            self.beta_constraint),
+        'gamma_constraint': tf.keras.constraints.serialize(
+            self.gamma_constraint),
+    }
+    base_config = super(EnsembleBatchNormalization, self).get_config()
+    return dict(list(base_config.items()) + list(config.items()))
+
+
+def ensemble_batchnorm(x, ensemble_size=1, **kwargs):
   """A modified batch norm layer for Batch Ensemble model.
 
+  Every ensemble member normalizes with its own moments on all devices. The
+  statistics live in one `EnsembleBatchNormalization` layer with stacked
+  `[ensemble_size, channels]` variables, so checkpoints written by the former
+  implementation (one shared `BatchNormalization` on TPU, or one
+  `BatchNormalization` per member named `<name>_<i>` otherwise) do not restore
+  into it.
+
   Args:
     x: input tensor.
     ensemble_size: number of ensemble members.
-    use_tpu: whether the model is running on TPU.
-    **kwargs: Keyword arguments to batch normalization layers.
+    **kwargs: Keyword arguments to `EnsembleBatchNormalization`.
 
   Returns:
     Output tensor for the block.
   """
-  # In BatchEnsemble inference stage, the input to the model is tiled which
-  # leads to dynamic shape because of the tf.split function. Such operation
-  # is not supported in tf2.0 on TPU. For current workaround, we use single
-  # BatchNormalization layer for all ensemble member. This is not correct in
-  # math but works in practice.
-  if ensemble_size == 1 or use_tpu:
-    return tf.keras.layers.BatchNormalization(**kwargs)(x)
-  name = kwargs.get('name')
-  split_inputs = tf.split(x, ensemble_size, axis=0)
-  for i in range(ensemble_size):
-    if name is not None:
-      kwargs['name'] = name + '_{}'.format(i)
-    split_inputs[i] = tf.keras.layers.BatchNormalization(**kwargs)(
-        split_inputs[i])
-  return tf.concat(split_inputs, axis=0)
+  return EnsembleBatchNormalization(ensemble_size=ensemble_size, **kwargs)(x)
@@ -46,6 +46,33 @@ class NormalizationTest(tf.test.TestCase):
     self.assertAllClose(mean, np.zeros(channels), atol=0.25)
     self.assertAllClose(variance, np.ones(channels), atol=0.25)
 
+  def testEnsembleBatchNormalization(self):
+    ensemble_size = 3
+    examples_per_model = 8
+    inputs = np.random.randn(ensemble_size * examples_per_model, 4, 4, 5)
+    inputs += np.arange(ensemble_size).repeat(examples_per_model)[
+        :, np.newaxis, np.newaxis, np.newaxis]
+    inputs = tf.cast(inputs, tf.float32)
+    layer = ed.layers.EnsembleBatchNormalization(ensemble_size=ensemble_size,
+                                                 momentum=0.)
+    outputs = layer(inputs, training=True)
+    self.assertEqual(outputs.shape, inputs.shape)
+    for i, member_inputs in enumerate(tf.split(inputs, ensemble_size)):
+      member_outputs = outputs[i * examples_per_model:
+                               (i + 1) * examples_per_model]
+      mean, variance = tf.nn.moments(member_outputs, axes=[0, 1, 2])
+      self.assertAllClose(mean, np.zeros(5), atol=1e-4)
+      self.assertAllClose(variance, np.ones(5), atol=1e-2)
+      expected_mean, expected_variance = tf.nn.moments(member_inputs,
+                                                       axes=[0, 1, 2])
+      self.assertAllClose(layer.moving_mean[i], expected_mean, atol=1e-4)
+      self.assertAllClose(layer.moving_variance[i], expected_variance,
+                          atol=1e-4)
+
+    # With momentum 0, test-time outputs use the last batch's statistics.
+    test_outputs = layer(inputs, training=False)
+    self.assertAllClose(test_outputs, outputs, atol=1e-2)
+
 
 if __name__ == '__main__':
   tf.enable_v2_behavior()
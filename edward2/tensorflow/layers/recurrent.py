@@ -204,7 +204,7 @@ class LSTMCellFlipout(LSTMCellReparameterization):
     if inputs is not None:
       batch_size = tf.shape(inputs)[0]
       dtype = inputs.dtype
-    input_dim = tf.shape(self.kernel)[0]
+    input_dim = self.kernel.shape[0]
     self.sign_input = 2 * tf.random.uniform(
         [batch_size, input_dim], minval=0, maxval=2, dtype=tf.int32) - 1
     self.sign_output = 2 * tf.random.uniform(
@@ -339,3 +339,190 @@ class LSTMCellFlipout(LSTMCellReparameterization):
 
     h = o * self.activation(c)
     return h, [h, c]
+
+
+class LSTMReparameterization(tf.keras.layers.Layer):
+  """Bayesian LSTM layer over full sequences, estimated via reparameterization.
+
+  The layer computes the same variational approximation as
+  `tf.keras.layers.RNN(LSTMCellReparameterization(...))` but is specialized to
+  whole sequences: the weights are sampled once per call, the input projections
+  `inputs @ kernel` for all timesteps are computed with a single matmul, and only
+  the recurrent projection runs inside a `tf.while_loop`, as one matmul over the
+  concatenated gates per step.
+
+  Inputs have shape `[batch_size, timesteps, input_dim]`. Dropout and masking
+  are not supported; use the cell with `tf.keras.layers.RNN` for those.
+  """
+
+  _cell_class = LSTMCellReparameterization
+
+  def __init__(self,
+               units,
+               activation='tanh',
+               recurrent_activation='sigmoid',
+               use_bias=True,
+               kernel_initializer='trainable_normal',
+               recurrent_initializer='trainable_normal',
+               bias_initializer='zeros',
+               unit_forget_bias=True,
+               kernel_regularizer='normal_kl_divergence',
+               recurrent_regularizer='normal_kl_divergence',
+               bias_regularizer=None,
+               kernel_constraint=None,
+               recurrent_constraint=None,
+               bias_constraint=None,
+               return_sequences=False,
+               return_state=False,
+               **kwargs):
+    super(LSTMReparameterization, self).__init__(**kwargs)
+    self.units = units
+    self.return_sequences = return_sequences
+    self.return_state = return_state
+    self.cell = self._cell_class(
+        units=units,
+        activation=activation,
+        recurrent_activation=recurrent_activation,
+        use_bias=use_bias,
+        kernel_initializer=kernel_initializer,
+        recurrent_initializer=recurrent_initializer,
+        bias_initializer=bias_initializer,
+        unit_forget_bias=unit_forget_bias,
+        kernel_regularizer=kernel_regularizer,
+        recurrent_regularizer=recurrent_regularizer,
+        bias_regularizer=bias_regularizer,
+        kernel_constraint=kernel_constraint,
+        recurrent_constraint=recurrent_constraint,
+        bias_constraint=bias_constraint,
+        dtype=self.dtype)
+    self.input_spec = tf.keras.layers.InputSpec(ndim=3)
+
+  def build(self, input_shape):
+    input_shape = tf.TensorShape(input_shape)
+    self.cell.build(input_shape[-1:])
+    self.input_spec = tf.keras.layers.InputSpec(
+        ndim=3, axes={-1: input_shape[-1]})
+    self.built = True
+
+  def call_weights(self):
+    """Samples the cell's weights; called once at the start of each call."""
+    self.cell.call_weights()
+
+  def _input_projection(self, inputs):
+    """Returns `inputs @ kernel` of shape `[batch, timesteps, 4*units]`."""
+    kernel = tf.convert_to_tensor(self.cell.kernel)
+    return tf.tensordot(inputs, kernel, [[-1], [0]])
+
+  def _recurrent_projection_fn(self, inputs):
+    """Returns a function mapping `h_tm1` to `h_tm1 @ recurrent_kernel`."""
+    del inputs  # unused
+    recurrent_kernel = tf.convert_to_tensor(self.cell.recurrent_kernel)
+    return lambda h_tm1: tf.matmul(h_tm1, recurrent_kernel)
+
+  def call(self, inputs, initial_state=None):
+    inputs = tf.convert_to_tensor(inputs, dtype=self.dtype)
+    self.call_weights()
+    # Read the weights in the cell's order (kernel, recurrent kernel, bias), so
+    # under a fixed seed they take the same samples as in the cell.
+    projected_inputs = self._input_projection(inputs)
+    recurrent_projection = self._recurrent_projection_fn(inputs)
+    if self.cell.use_bias:
+      projected_inputs = tf.nn.bias_add(projected_inputs,
+                                        tf.convert_to_tensor(self.cell.bias))
+    # Move time to the leading axis so each step reads a contiguous slice.
+    projected_inputs = tf.transpose(projected_inputs, [1, 0, 2])
+    timesteps = tf.shape(projected_inputs)[0]
+    if initial_state is None:
+      batch_size = tf.shape(inputs)[0]
+      initial_state = [tf.zeros([batch_size, self.units], dtype=self.dtype),
+                       tf.zeros([batch_size, self.units], dtype=self.dtype)]
+    h, c = initial_state
+    projected_inputs_ta = tf.TensorArray(
+        self.dtype, size=timesteps).unstack(projected_inputs)
+    outputs_ta = tf.TensorArray(self.dtype, size=timesteps)
+
+    def step(t, h_tm1, c_tm1, outputs_ta):
+      z = projected_inputs_ta.read(t) + recurrent_projection(h_tm1)
+      z_i, z_f, z_c, z_o = tf.split(z, num_or_size_splits=4, axis=-1)
+      i = self.cell.recurrent_activation(z_i)
+      f = self.cell.recurrent_activation(z_f)
+      c = f * c_tm1 + i * self.cell.activation(z_c)
+      o = self.cell.recurrent_activation(z_o)
+      h = o * self.cell.activation(c)
+      return t + 1, h, c, outputs_ta.write(t, h)
+
+    _, h, c, outputs_ta = tf.while_loop(
+        lambda t, *_: t < timesteps,
+        step,
+        (tf.constant(0), h, c, outputs_ta))
+    if self.return_sequences:
+      outputs = tf.transpose(outputs_ta.stack(), [1, 0, 2])
+    else:
+      outputs = h
+    if self.return_state:
+      return [outputs, h, c]
+    return outputs
+
+  def get_config(self):
+    config = self.cell.get_config()
+    for key in ('name', 'trainable', 'dtype', 'dropout', 'recurrent_dropout',
+                'implementation'):
+      config.pop(key, None)
+    config.update({
+        'return_sequences': self.return_sequences,
+        'return_state': self.return_state,
+    })
+    base_config = super(LSTMReparameterization, self).get_config()
+    return dict(list(base_config.items()) + list(config.items()))
+
+
+class LSTMFlipout(LSTMReparameterization):
+  """Bayesian LSTM layer over full sequences, estimated via Flipout.
+
+  This is the sequence-level counterpart of `LSTMCellFlipout`. The per-example
+  sign flips are drawn once per sequence by the cell and shared across
+  timesteps. Each step computes the mean and perturbation recurrent projections
+  with one batched matmul.
+  """
+
+  _cell_class = LSTMCellFlipout
+
+  def _is_flipout(self):
+    # Like LSTMCellFlipout, fall back to reparameterization unless both kernels
+    # are random variables.
+    return (isinstance(self.cell.kernel, random_variable.RandomVariable) and
+            isinstance(self.cell.recurrent_kernel,
+                       random_variable.RandomVariable))
+
+  def call(self, inputs, initial_state=None):
+    inputs = tf.convert_to_tensor(inputs, dtype=self.dtype)
+    # Draw the sign flips before the weights, as `LSTMCellFlipout`'s
+    # `get_initial_state` does under `tf.keras.layers.RNN`.
+    self.cell._call_sign_flips(inputs)  # pylint: disable=protected-access
+    return super(LSTMFlipout, self).call(inputs, initial_state=initial_state)
+
+  def _input_projection(self, inputs):
+    if not self._is_flipout():
+      return super(LSTMFlipout, self)._input_projection(inputs)
+    sign_input = self.cell.sign_input[:, tf.newaxis, :]
+    sign_output = self.cell.sign_output[:, tf.newaxis, :]
+    kernel_mean = self.cell.kernel.distribution.mean()
+    perturbation = self.cell.kernel - kernel_mean
+    outputs = tf.tensordot(inputs, kernel_mean, [[-1], [0]])
+    outputs += tf.tensordot(inputs * sign_input,
+                            perturbation, [[-1], [0]]) * sign_output
+    return outputs
+
+  def _recurrent_projection_fn(self, inputs):
+    if not self._is_flipout():
+      return super(LSTMFlipout, self)._recurrent_projection_fn(inputs)
+    sign_input = self.cell.recurrent_sign_input
+    sign_output = self.cell.recurrent_sign_output
+    kernel_mean = self.cell.recurrent_kernel.distribution.mean()
+    perturbation = self.cell.recurrent_kernel - kernel_mean
+    kernels = tf.stack([kernel_mean, perturbation])
+
+    def recurrent_projection(h_tm1):
+      z = tf.matmul(tf.stack([h_tm1, h_tm1 * sign_input]), kernels)
+      return z[0] + z[1] * sign_output
+    return recurrent_projection
@@ -232,6 +232,72 @@ class RecurrentTest(parameterized.TestCase, tf.test.TestCase):
     self.assertAllClose(outputs2, outputs3)
     self.assertLen(model.losses, 2)
 
+  @parameterized.parameters(
+      {"lstm": ed.layers.LSTMReparameterization,
+       "kernel_initializer": "trainable_normal"},
+      {"lstm": ed.layers.LSTMReparameterization,
+       "kernel_initializer": "trainable_deterministic"},
+      {"lstm": ed.layers.LSTMFlipout,
+       "kernel_initializer": "trainable_normal"},
+      {"lstm": ed.layers.LSTMFlipout,
+       "kernel_initializer": "trainable_deterministic"},
+  )
+  def testLSTMMatchesCell(self, lstm, kernel_initializer):
+    batch_size, timesteps, dim = 5, 4, 12
+    hidden_size = 10
+    inputs = np.random.rand(batch_size, timesteps, dim).astype(np.float32)
+    layer = lstm(hidden_size,
+                 kernel_initializer=kernel_initializer,
+                 recurrent_initializer=kernel_initializer,
+                 bias_initializer="trainable_normal",
+                 return_sequences=True,
+                 return_state=True)
+    # Build the layer first: building samples weights, which shifts the seeds.
+    first_outputs, _, _ = layer(inputs)
+    tf.random.set_seed(37)
+    outputs, h, c = layer(inputs)
+    # Under the same seed, the cell samples the same weights (and sign flips).
+    tf.random.set_seed(37)
+    rnn = tf.keras.layers.RNN(layer.cell,
+                              return_sequences=True,
+                              return_state=True)
+    expected_outputs, expected_h, expected_c = rnn(inputs)
+    self.assertEqual(outputs.shape, (batch_size, timesteps, hidden_size))
+    self.assertAllClose(outputs, expected_outputs)
+    self.assertAllClose(h, expected_h)
+    self.assertAllClose(c, expected_c)
+    self.assertAllClose(h, outputs[:, -1])
+    if kernel_initializer == "trainable_normal":
+      self.assertNotAllClose(outputs, first_outputs)
+    layer.get_config()
+
+  @parameterized.parameters(
+      {"lstm": ed.layers.LSTMFlipout},
+      {"lstm": ed.layers.LSTMReparameterization},
+  )
+  def testLSTMModel(self, lstm):
+    batch_size, timesteps, dim = 5, 3, 12
+    hidden_size = 10
+    inputs = np.random.rand(batch_size, timesteps, dim).astype(np.float32)
+    labels = np.random.rand(batch_size, hidden_size).astype(np.float32)
+    layer = lstm(hidden_size)
+    model = tf.keras.Sequential([layer])
+    with tf.GradientTape() as tape:
+      outputs1 = model(inputs)
+      nll = tf.keras.losses.mean_squared_error(labels, outputs1)
+      kl = sum(model.losses)
+      loss = tf.reduce_mean(nll) + kl
+    grads = tape.gradient(loss, model.trainable_variables)
+    for grad in grads:
+      self.assertIsNotNone(grad)
+    outputs2 = model(inputs)
+    self.assertEqual(outputs1.shape, (batch_size, hidden_size))
+    self.assertNotAllClose(outputs1, outputs2)
+    self.assertLen(model.losses, 2)
+
+    compiled_outputs = tf.function(model)(inputs)
+    self.assertEqual(compiled_outputs.shape, (batch_size, hidden_size))
+
 
 if __name__ == "__main__":
   tf.enable_v2_behavior()
@@ -21,7 +21,6 @@ from __future__ import print_function
 
 import functools
 import numpy as np
-import tensorflow.compat.v1 as tf1
 import tensorflow.compat.v2 as tf
 
 # SciPy is not a mandatory dependency when using the TF backend.
@@ -70,6 +69,117 @@ def add_weight(cls):
   return cls
 
 
+def prune_kernel(kernel, threshold=3.):
+  """Prunes a kernel's posterior mean according to its dropout rate.
+
+  For weight ~ Normal(mu, sigma**2), the additive parameterization of
+  variational dropout (Molchanov et al., 2017) has dropout rate
+  `alpha = sigma**2 / mu**2`. Weights whose `log_alpha` exceeds `threshold` are
+  set to zero.
+
+  Args:
+    kernel: RandomVariable whose distribution has a mean and variance. Its
+      last dimension is the number of output units.
+    threshold: Threshold on `log_alpha` above which weights are pruned.
+
+  Returns:
+    Tuple of a `tf.SparseTensor` of shape `[units, prod(kernel.shape[:-1])]`,
+    which is the pruned mean reshaped to a matrix and transposed, and the
+    fraction of weights which were pruned.
+  """
+  mean = kernel.distribution.mean()
+  log_alpha = (tf.math.log(kernel.distribution.variance()) -
+               tf.math.log(tf.square(mean) + tf.keras.backend.epsilon()))
+  mean = tf.where(log_alpha > threshold, tf.zeros_like(mean), mean)
+  matrix = tf.transpose(tf.reshape(mean, [-1, mean.shape[-1]]))
+  sparse_kernel = tf.sparse.from_dense(matrix)
+  sparsity = 1. - tf.cast(tf.size(sparse_kernel.values),
+                          tf.float32) / tf.cast(tf.size(matrix), tf.float32)
+  return sparse_kernel, sparsity
+
+
+def random_sign(shape, dtype=tf.float32, seed=None):
+  """Draws -1 or 1 with equal probability, i.e., Rademacher samples.
+
+  Each random integer supplies 30 signs via its bits. This is cheaper than
+  drawing one integer per sign and casting it.
+
+  Args:
+    shape: 1-D integer Tensor or Python list.
+    dtype: Dtype of the returned Tensor.
+    seed: Optional Python integer to seed the random draw.
+
+  Returns:
+    Tensor of the given shape and dtype.
+  """
+  num_bits = 30
+  shape = tf.convert_to_tensor(shape, dtype=tf.int32)
+  size = tf.reduce_prod(shape)
+  draws = tf.random.uniform([(size + num_bits - 1) // num_bits, 1],
+                            minval=0,
+                            maxval=2**num_bits,
+                            dtype=tf.int32,
+                            seed=seed)
+  bits = tf.bitwise.bitwise_and(
+      tf.bitwise.right_shift(draws, tf.range(num_bits)), 1)
+  bits = tf.reshape(bits, [-1])[:size]
+  return tf.reshape(1. - 2. * tf.cast(bits, dtype), shape)
+
+
+def sparse_dense_matmul(inputs, sparse_kernel):
+  """Multiplies `[..., features]` inputs by a transposed sparse kernel.
+
+  Args:
+    inputs: Tensor of shape `[..., features]`.
+    sparse_kernel: `tf.SparseTensor` of shape `[units, features]`, as returned
+      by `prune_kernel`.
+
+  Returns:
+    Tensor of shape `[..., units]`.
+  """
+  input_shape = tf.shape(inputs)
+  flat_inputs = tf.reshape(inputs, [-1, input_shape[-1]])
+  # TF's sparse matmul takes the sparse argument first, so we compute
+  # (kernel^T inputs^T)^T.
+  outputs = tf.transpose(tf.sparse.sparse_dense_matmul(sparse_kernel,
+                                                       flat_inputs,
+                                                       adjoint_b=True))
+  units = sparse_kernel.shape[0]
+  outputs = tf.reshape(outputs, tf.concat([input_shape[:-1], [units]], 0))
+  outputs.set_shape(inputs.shape[:-1].concatenate(units))
+  return outputs
+
+
+def map_chunks(fn, inputs, chunk_size, fn_output_signature):
+  """Applies fn to consecutive chunks of inputs' rows, one chunk at a time.
+
+  Args:
+    fn: Function taking a Tensor of shape [chunk_size, ...] and returning a
+      (nested structure of) Tensor(s) whose leading dimension is chunk_size.
+    inputs: Tensor of shape [batch, ...].
+    chunk_size: integer, number of rows per chunk.
+    fn_output_signature: Output signature of fn, as in `tf.map_fn`.
+
+  Returns:
+    fn's outputs, concatenated along the leading dimension to size batch.
+  """
+  # Pad the inputs to a multiple of chunk_size and map over the chunks, which
+  # runs them one at a time.
+  batch_size = tf.shape(inputs)[0]
+  num_chunks = (batch_size + chunk_size - 1) // chunk_size
+  paddings = ([[0, num_chunks * chunk_size - batch_size]] +
+              [[0, 0]] * (inputs.shape.ndims - 1))
+  inputs_chunks = tf.reshape(
+      tf.pad(inputs, paddings),
+      tf.concat([[num_chunks, chunk_size], tf.shape(inputs)[1:]], 0))
+  outputs = tf.map_fn(fn, inputs_chunks,
+                      fn_output_signature=fn_output_signature)
+
+  def unchunk(x):
+    return tf.reshape(x, tf.concat([[-1], tf.shape(x)[2:]], 0))[:batch_size]
+  return tf.nest.map_structure(unchunk, outputs)
+
+
 def one_hot_argmax(inputs, temperature, axis=-1):
   """Returns one-hot of argmax with backward pass set to softmax-temperature."""
   vocab_size = inputs.shape[-1]
@@ -82,7 +192,7 @@ def one_hot_argmax(inputs, temperature, axis=-1):
   return outputs
 
 
-def one_hot_add(inputs, shift):
+def one_hot_add(inputs, shift, hard=False):
   """Performs (inputs + shift) % vocab_size in the one-hot space.
 
   Args:
@@ -93,10 +203,16 @@ def one_hot_add(inputs, shift):
       inputs. Soft values perform a "weighted shift": for example,
       shift=[0.2, 0.3, 0.5] performs a linear combination of 0.2 * shifting by
       zero; 0.3 * shifting by one; and 0.5 * shifting by two.
+    hard: Whether inputs and shift are hard one-hot Tensors. If True, the
+      outputs are computed from their integer indices; see
+      `_one_hot_index_op`.
 
   Returns:
     Tensor of same shape and dtype as inputs.
   """
+  if hard:
+    return _one_hot_index_op(
+        lambda x, y, n: tf.math.floormod(x + y, n), one_hot_add, inputs, shift)
   # Compute circular 1-D convolution with shift as the kernel.
   inputs = tf.cast(inputs, tf.complex64)
   shift = tf.cast(shift, tf.complex64)
@@ -104,7 +220,7 @@ def one_hot_add(inputs, shift):
       tf.signal.ifft(tf.signal.fft(inputs) * tf.signal.fft(shift)))
 
 
-def one_hot_minus(inputs, shift):
+def one_hot_minus(inputs, shift, hard=False):
   """Performs (inputs - shift) % vocab_size in the one-hot space.
 
   Args:
@@ -115,10 +231,17 @@ def one_hot_minus(inputs, shift):
       inputs. Soft values perform a "weighted shift": for example,
       shift=[0.2, 0.3, 0.5] performs a linear combination of 0.2 * shifting by
       zero; 0.3 * shifting by one; and 0.5 * shifting by two.
+    hard: Whether inputs and shift are hard one-hot Tensors. If True, the
+      outputs are computed from their integer indices; see
+      `_one_hot_index_op`.
 
   Returns:
     Tensor of same shape and dtype as inputs.
   """
+  if hard:
+    return _one_hot_index_op(
+        lambda x, y, n: tf.math.floormod(x - y, n), one_hot_minus, inputs,
+        shift)
   # TODO(trandustin): Implement with circular conv1d.
   inputs = tf.convert_to_tensor(inputs)
   shift = tf.cast(shift, inputs.dtype)
@@ -132,7 +255,7 @@ def one_hot_minus(inputs, shift):
   return outputs
 
 
-def one_hot_multiply(inputs, scale):
+def one_hot_multiply(inputs, scale, hard=False):
   """Performs (inputs * scale) % vocab_size in the one-hot space.
 
   Args:
@@ -143,10 +266,19 @@ def one_hot_multiply(inputs, scale):
       inputs. Soft values perform a "weighted scale": for example,
       scale=[0.2, 0.3, 0.5] performs a linear combination of
       0.2 * scaling by zero; 0.3 * scaling by one; and 0.5 * scaling by two.
+    hard: Whether inputs and scale are hard one-hot Tensors. If True, the
+      outputs are computed from their integer indices; see
+      `_one_hot_index_op`.
 
   Returns:
     Tensor of same shape and dtype as inputs.
   """
+  if hard:
+    # Scaling by zero returns all zeros, which tf.one_hot gives for index -1.
+    return _one_hot_index_op(
+        lambda x, y, n: tf.where(tf.equal(y, 0), -tf.ones_like(x),
+                                 tf.math.floormod(x * y, n)),
+        one_hot_multiply, inputs, scale)
   # TODO(trandustin): Implement with circular conv1d.
   inputs = tf.convert_to_tensor(inputs)
   scale = tf.cast(scale, inputs.dtype)
@@ -168,6 +300,49 @@ def one_hot_multiply(inputs, scale):
   return outputs
 
 
+def _one_hot_index_op(index_fn, soft_fn, inputs, other):
+  """Applies modular arithmetic to hard one-hot Tensors via their indices.
+
+  The forward pass takes the argmax indices of inputs and other, applies
+  `index_fn`, and one-hots the result. This costs O(vocab_size) per position
+  rather than the soft computation's FFT or vocab_size x vocab_size matrices.
+  The backward pass differentiates `soft_fn`, so it is only evaluated when
+  gradients are required; for hard one-hot values both functions agree.
+
+  Args:
+    index_fn: Function taking the integer indices of inputs and other, and
+      vocab_size, and returning integer indices in [0, vocab_size). Index -1
+      produces an all-zero output.
+    soft_fn: Function taking inputs and other and returning the same outputs
+      for hard one-hot values, differentiably.
+    inputs: Tensor of shape `[..., vocab_size]`. A hard one-hot Tensor.
+    other: Tensor of shape `[..., vocab_size]`. A hard one-hot Tensor.
+
+  Returns:
+    Tensor of same shape and dtype as inputs.
+  """
+  @tf.custom_gradient
+  def index_op(inputs, other):
+    """Forward pass in the index space with the gradient of soft_fn."""
+    vocab_size = inputs.shape[-1]
+    indices = index_fn(tf.argmax(inputs, axis=-1),
+                       tf.argmax(other, axis=-1),
+                       vocab_size)
+    outputs = tf.one_hot(indices, depth=vocab_size, dtype=inputs.dtype)
+
+    def grad(doutputs):
+      with tf.GradientTape() as tape:
+        tape.watch([inputs, other])
+        soft_outputs = tf.cast(soft_fn(inputs, other), inputs.dtype)
+      return tape.gradient(soft_outputs, [inputs, other],
+                           output_gradients=doutputs)
+    return outputs, grad
+
+  inputs = tf.convert_to_tensor(inputs)
+  other = tf.cast(other, inputs.dtype)
+  return index_op(inputs, other)
+
+
 def py_multiplicative_inverse(a, n):
   """Multiplicative inverse of a modulo n (in Python).
 
@@ -204,35 +379,60 @@ def py_multiplicative_inverse(a, n):
 def multiplicative_inverse(a, n):
   """Multiplicative inverse of a modulo n.
 
+  The inverses of all integers modulo n are precomputed once per n and looked
+  up in-graph, so the op needs no Python callback.
+
   Args:
     a: Tensor of shape [..., vocab_size]. It denotes an integer in the one-hot
       space.
-    n: int Tensor of shape [...].
+    n: int or int Tensor with a statically known value, the modulus.
 
   Returns:
-    Tensor of same shape and dtype as a.
+    Tensor of same shape and dtype as a. Integers with no inverse map to zero.
   """
   a = tf.convert_to_tensor(a)
-  n = tf.convert_to_tensor(n)
+  n = tf.get_static_value(tf.convert_to_tensor(n))
+  if n is None:
+    raise ValueError('The modulus `n` must be statically known.')
   vocab_size = a.shape[-1]
-  a_dtype = a.dtype
   sparse_a = tf.argmax(a, axis=-1)
-  # TODO(trandustin): Change to tf.py_function.
-  sparse_outputs = tf1.py_func(
-      py_multiplicative_inverse, [sparse_a, n], tf.int32)
-  sparse_outputs.set_shape(sparse_a.shape)
-  outputs = tf.one_hot(sparse_outputs, depth=vocab_size, dtype=a_dtype)
+  table = tf.constant(_multiplicative_inverse_table(int(n)))
+  sparse_outputs = tf.gather(table, tf.math.floormod(sparse_a, int(n)))
+  outputs = tf.one_hot(sparse_outputs, depth=vocab_size, dtype=a.dtype)
   return outputs
 
 
-def soft_to_hard_permutation(inputs):
+_MULTIPLICATIVE_INVERSE_TABLES = {}
+
+
+def _multiplicative_inverse_table(n):
+  """Returns an int32 np.ndarray of the inverses of range(n) modulo n.
+
+  Integers with no inverse map to zero. Tables are cached per n.
+
+  Args:
+    n: int.
+  """
+  if n not in _MULTIPLICATIVE_INVERSE_TABLES:
+    table = np.zeros(n, dtype=np.int32)
+    for a in range(1, n):
+      if np.gcd(a, n) == 1:
+        table[a] = py_multiplicative_inverse(a, n)
+    _MULTIPLICATIVE_INVERSE_TABLES[n] = table
+  return _MULTIPLICATIVE_INVERSE_TABLES[n]
+
+
+def soft_to_hard_permutation(inputs, method='hungarian', executor=None):
   """Returns permutation matrices by solving a matching problem.
 
   Solves linear sum assignment to convert doubly-stochastic matrices to
-  permutation matrices. It uses scipy.optimize.linear_sum_assignment to solve
-  the optimization problem max_P sum_i,j M_i,j P_i,j with P a permutation
-  matrix. Notice the negative sign; the reason, the original function solves a
-  minimization problem.
+  permutation matrices. With `method='hungarian'`, it uses
+  scipy.optimize.linear_sum_assignment to solve the optimization problem
+  max_P sum_i,j M_i,j P_i,j with P a permutation matrix. Notice the negative
+  sign; the reason, the original function solves a minimization problem. With
+  `method='greedy'`, it repeatedly matches the largest remaining entry. This
+  is exact when each row is close to one-hot, and it runs in-graph so it can
+  be compiled.
 
   Code is adapted from Mena et al. [1].
 
@@ -243,6 +443,14 @@ def soft_to_hard_permutation(inputs):
   Args:
     inputs: A `Tensor` with shape `[:, vocab_size, vocab_size]` that is
       doubly-stochastic in its last two dimensions.
+    method: 'hungarian' or 'greedy'.
+    executor: Optional `concurrent.futures.Executor` that solves the batch's
+      assignments in parallel if `method='hungarian'`. The caller owns it and
+      shuts it down. Use a `ProcessPoolExecutor`: SciPy's
+      linear_sum_assignment holds the GIL, so threads solve one assignment at
+      a time. Create it with the 'spawn' or 'forkserver' start method, since
+      forking a process that runs TensorFlow is unsafe. If None, the
+      assignments are solved serially.
 
   Returns:
     outputs: A hard permutation `Tensor` with the same shape as `inputs` (in
@@ -253,26 +461,71 @@ def soft_to_hard_permutation(inputs):
   def hungarian(x):
     """Hungarian algorithm."""
     x = x.numpy()
-    if x.ndim == 2:
-      x = np.reshape(x, [1, x.shape[0], x.shape[1]])
-    sol = np.zeros((x.shape[0], x.shape[1]), dtype=np.int32)
-    for i in range(x.shape[0]):
-      try:
-        sol[i, :] = linear_sum_assignment(-x[i, :])[1].astype(np.int32)
-      except NameError:
-        raise NameError('linear_sum_assignment requires SciPy to be installed.')
-    return tf.convert_to_tensor(sol)
+    x = np.reshape(x, [-1, x.shape[-2], x.shape[-1]])
+    try:
+      if executor is not None:
+        sol = list(executor.map(_maximum_assignment, x))
+      else:
+        sol = [_maximum_assignment(matrix) for matrix in x]
+    except NameError:
+      raise NameError('linear_sum_assignment requires SciPy to be installed.')
+    return tf.convert_to_tensor(np.stack(sol))
 
   vocab_size = inputs.shape[-1]
-  # Note: tf.py_function isn't currently supported on headless GPUs.
-  # TODO(vafa): Fix tf.py_function headless GPU bug.
-  permutation_lists = tf.py_function(hungarian, [inputs], tf.int32)
+  if method == 'hungarian':
+    # Note: tf.py_function isn't currently supported on headless GPUs.
+    # TODO(vafa): Fix tf.py_function headless GPU bug.
+    permutation_lists = tf.py_function(hungarian, [inputs], tf.int32)
+  elif method == 'greedy':
+    permutation_lists = _greedy_assignment(inputs)
+  else:
+    raise ValueError('Matching method is not valid: {}'.format(method))
   hard = tf.one_hot(permutation_lists, depth=vocab_size)
   outputs = tf.stop_gradient(hard - inputs) + inputs
   return outputs
 
 
-def sinkhorn(inputs, n_iters=20):
+def _maximum_assignment(x):
+  """Returns the column assigned to each row, maximizing the total of x."""
+  return linear_sum_assignment(-x)[1].astype(np.int32)
+
+
+def _greedy_assignment(inputs):
+  """Greedily assigns columns to rows in order of decreasing inputs.
+
+  Args:
+    inputs: A `Tensor` with shape `[..., vocab_size, vocab_size]`.
+
+  Returns:
+    int32 `Tensor` of shape `[-1, vocab_size]`, the column assigned to each row
+    of each flattened batch member.
+  """
+  vocab_size = inputs.shape[-1]
+  scores = tf.reshape(inputs, [-1, vocab_size * vocab_size])
+  batch_size = tf.shape(scores)[0]
+  rows = tf.range(vocab_size * vocab_size) // vocab_size
+  columns = tf.range(vocab_size * vocab_size) % vocab_size
+
+  def body(step, scores, assignment):
+    # Match the largest entry, then exclude its row and column.
+    index = tf.argmax(scores, axis=-1, output_type=tf.int32)
+    row = index // vocab_size
+    column = index % vocab_size
+    assignment = tf.tensor_scatter_nd_update(
+        assignment, tf.stack([tf.range(batch_size), row], axis=-1), column)
+    matched = tf.logical_or(tf.equal(rows, row[:, tf.newaxis]),
+                            tf.equal(columns, column[:, tf.newaxis]))
+    scores = tf.where(matched, scores.dtype.min * tf.ones_like(scores), scores)
+    return step + 1, scores, assignment
+
+  _, _, assignment = tf.while_loop(
+      lambda step, *_: step < vocab_size,
+      body,
+      [0, scores, tf.zeros([batch_size, vocab_size], dtype=tf.int32)])
+  return assignment
+
+
+def sinkhorn(inputs, n_iters=20, tolerance=None):
   """Performs incomplete Sinkhorn normalization to inputs.
 
   By a theorem by Sinkhorn and Knopp [1], a sufficiently well-behaved  matrix
@@ -295,8 +548,12 @@ def sinkhorn(inputs, n_iters=20):
 
   Args:
     inputs: A `Tensor` with shape `[..., vocab_size, vocab_size]`.
-    n_iters: Number of sinkhorn iterations (in practice, as little as 20
-      iterations are needed to achieve decent convergence for `vocab_size` ~100)
+    n_iters: Maximum number of sinkhorn iterations (in practice, as little as
+      20 iterations are needed to achieve decent convergence for `vocab_size`
+      ~100)
+    tolerance: Iterations stop early once every row sum is within tolerance of
+      one (column sums are exactly one after each iteration). If None, all
+      `n_iters` iterations run.
 
   Returns:
     outputs: A `Tensor` of close-to-doubly-stochastic matrices with shape
@@ -305,11 +562,22 @@ def sinkhorn(inputs, n_iters=20):
   vocab_size = tf.shape(inputs)[-1]
   log_alpha = tf.reshape(inputs, [-1, vocab_size, vocab_size])
 
-  for _ in range(n_iters):
-    log_alpha -= tf.reshape(tf.reduce_logsumexp(log_alpha, axis=2),
-                            [-1, vocab_size, 1])
-    log_alpha -= tf.reshape(tf.reduce_logsumexp(log_alpha, axis=1),
-                            [-1, 1, vocab_size])
+  def cond(step, log_alpha, row_logsumexp):
+    del log_alpha  # unused arg
+    if tolerance is None:
+      return step < n_iters
+    row_error = tf.reduce_max(tf.abs(tf.math.expm1(row_logsumexp)))
+    return tf.logical_and(step < n_iters, row_error > tolerance)
+
+  def body(step, log_alpha, row_logsumexp):
+    # The row normalizers are carried over from the previous iteration, where
+    # they also measure convergence.
+    log_alpha -= row_logsumexp[..., tf.newaxis]
+    log_alpha -= tf.reduce_logsumexp(log_alpha, axis=1, keepdims=True)
+    return step + 1, log_alpha, tf.reduce_logsumexp(log_alpha, axis=2)
+
+  _, log_alpha, _ = tf.while_loop(
+      cond, body, [0, log_alpha, tf.reduce_logsumexp(log_alpha, axis=2)])
   outputs = tf.exp(log_alpha)
   return outputs
 
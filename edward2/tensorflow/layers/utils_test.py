@@ -19,6 +19,9 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+from concurrent import futures
+import multiprocessing
+
 from absl.testing import parameterized
 import edward2 as ed
 import numpy as np
@@ -164,6 +167,33 @@ class UtilsTest(parameterized.TestCase, tf.test.TestCase):
     outputs = one_hot_add_fn(inputs, shift)
     self.assertEqual(outputs.shape, (batch_size, length, vocab_size))
 
+  @parameterized.parameters(
+      (ed.layers.utils.one_hot_add,),
+      (ed.layers.utils.one_hot_minus,),
+      (ed.layers.utils.one_hot_multiply,),
+  )
+  def testOneHotHard(self, one_hot_fn):
+    batch_size = 4
+    length = 3
+    vocab_size = 7
+    inputs = tf.one_hot(
+        np.random.randint(0, vocab_size, size=(batch_size, length)),
+        depth=vocab_size)
+    other = tf.one_hot(
+        np.random.randint(0, vocab_size, size=(batch_size, length)),
+        depth=vocab_size)
+    weights = tf.random.normal([batch_size, length, vocab_size])
+    with tf.GradientTape(persistent=True) as tape:
+      tape.watch([inputs, other])
+      soft_outputs = one_hot_fn(inputs, other)
+      hard_outputs = one_hot_fn(inputs, other, hard=True)
+      soft_loss = tf.reduce_sum(weights * soft_outputs)
+      hard_loss = tf.reduce_sum(weights * hard_outputs)
+    self.assertAllClose(soft_outputs, hard_outputs, atol=1e-5)
+    self.assertAllClose(tape.gradient(soft_loss, [inputs, other]),
+                        tape.gradient(hard_loss, [inputs, other]),
+                        atol=1e-5)
+
   def testMultiplicativeInverse(self):
     batch_size = 3
     vocab_size = 79
@@ -177,6 +207,14 @@ class UtilsTest(parameterized.TestCase, tf.test.TestCase):
     inputs_inv_inputs = tf.math.floormod(inputs * inv_inputs, vocab_size)
     self.assertAllEqual(inputs_inv_inputs, np.ones((batch_size, length)))
 
+  def testMultiplicativeInverseInGraph(self):
+    vocab_size = 12
+    inputs = tf.one_hot([1, 5, 7, 11, 4], depth=vocab_size)
+    outputs = tf.function(ed.layers.utils.multiplicative_inverse)(inputs,
+                                                                  vocab_size)
+    # 4 is not coprime with 12 so it has no inverse.
+    self.assertAllEqual(tf.argmax(outputs, axis=-1), [1, 5, 7, 11, 0])
+
   def testApproximatelyStochastic(self):
     rng = np.random.RandomState(0)
     tf.random.set_seed(1)
@@ -191,6 +229,16 @@ class UtilsTest(parameterized.TestCase, tf.test.TestCase):
                             np.tile([1.0], (batch_size, dims)),
                             atol=1e-3)
 
+  def testSinkhornTolerance(self):
+    log_alpha = tf.random.normal([4, 6, 6])
+    result = ed.layers.utils.sinkhorn(log_alpha, n_iters=1000, tolerance=1e-4)
+    self.assertAllClose(tf.reduce_sum(result, 1), tf.ones([4, 6]), atol=1e-4)
+    self.assertAllClose(tf.reduce_sum(result, 2), tf.ones([4, 6]), atol=1e-4)
+    self.assertAllClose(
+        result,
+        tf.function(ed.layers.utils.sinkhorn)(log_alpha, n_iters=1000,
+                                              tolerance=1e-4))
+
   def testSoftToHardPermutation(self):
     """The solution of the matching for the identity matrix is range(N)."""
     dims = 10
@@ -198,6 +246,47 @@ class UtilsTest(parameterized.TestCase, tf.test.TestCase):
     result_matching = ed.layers.utils.soft_to_hard_permutation(identity)
     self.assertAllEqual(result_matching[0], np.eye(dims))
 
+  def _random_permutations(self, batch_size, dims):
+    """Returns permutations and doubly-stochastic matrices peaked at them."""
+    permutations = np.stack([np.random.permutation(dims)
+                             for _ in range(batch_size)])
+    log_alpha = 5. * tf.one_hot(permutations, depth=dims) + tf.random.normal(
+        [batch_size, dims, dims], stddev=0.1)
+    return permutations, ed.layers.utils.sinkhorn(log_alpha)
+
+  @parameterized.parameters(
+      {'method': 'hungarian', 'use_executor': False},
+      {'method': 'hungarian', 'use_executor': True},
+      {'method': 'greedy', 'use_executor': False},
+  )
+  def testSoftToHardPermutationBatch(self, method, use_executor):
+    permutations, soft = self._random_permutations(batch_size=5, dims=6)
+    if use_executor:
+      with futures.ProcessPoolExecutor(
+          2, mp_context=multiprocessing.get_context('spawn')) as executor:
+        hard = ed.layers.utils.soft_to_hard_permutation(
+            soft, method=method, executor=executor)
+    else:
+      hard = ed.layers.utils.soft_to_hard_permutation(soft, method=method)
+    self.assertAllEqual(tf.argmax(hard, axis=-1), permutations)
+
+  def testGreedyAssignmentInGraph(self):
+    permutations, soft = self._random_permutations(batch_size=5, dims=6)
+    self.assertAllEqual(tf.function(ed.layers.utils._greedy_assignment)(soft),
+                        permutations)
+
+  @parameterized.parameters(
+      {'shape': [7]},
+      {'shape': [64, 3, 31]},
+  )
+  def testRandomSign(self, shape):
+    tf.random.set_seed(2)
+    signs = ed.layers.utils.random_sign(shape, dtype=tf.float32)
+    self.assertEqual(signs.shape, shape)
+    self.assertAllEqual(np.abs(signs), np.ones(shape))
+    if np.prod(shape) > 1000:
+      self.assertAllClose(np.mean(signs), 0., atol=0.05)
+
 
 if __name__ == '__main__':
   tf.enable_v2_behavior()
@@ -19,14 +19,29 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import weakref
+
 from edward2 import trace
 from edward2.tensorflow import random_variable
+import tensorflow.compat.v1 as tf1
 import tensorflow.compat.v2 as tf
 import tensorflow_probability as tfp
 
+# Number of most recent values whose reverse is kept, per distribution.
+_CACHE_SIZE = 4
+
 
 class TransformedDistribution(tfp.distributions.Distribution):
-  """Distribution of f(x), where x ~ p(x) and f is reversible."""
+  """Distribution of f(x), where x ~ p(x) and f is reversible.
+
+  Within a graph, e.g., while tracing a `tf.function`, the distribution caches
+  the results of reversing values, keyed on Tensor identity. Scoring the same
+  Tensor with several methods (e.g., `log_prob` and `cdf`), or scoring its own
+  samples, then reverses each value at most once. Eager calls do not use the
+  cache: the layer's variables may change between them, and a cached result
+  would neither reflect the new values nor be differentiable with respect to
+  them.
+  """
 
   def __init__(self, base, reversible_layer, name=None):
     """Constructs a transformed distribution.
@@ -34,6 +49,8 @@ class TransformedDistribution(tfp.distributions.Distribution):
     Args:
       base: Base distribution.
       reversible_layer: Callable with methods `reverse` and `log_det_jacobian`.
+        It may also implement `reverse_and_log_det`, returning both outputs
+        at once; this is used when both are needed.
       name: Name for scoping operations in the class.
     """
     self.base = base
@@ -47,6 +64,7 @@ class TransformedDistribution(tfp.distributions.Distribution):
         base.allow_nan_stats,
         parameters=dict(locals()),
         name=name)
+    self._cache = []
 
   def _event_shape_tensor(self):
     return self.base.event_shape_tensor()
@@ -67,35 +85,30 @@ class TransformedDistribution(tfp.distributions.Distribution):
   def _call_sample_n(self, sample_shape, seed, name, **kwargs):
     x = self.base.sample(sample_shape, seed, **kwargs)
     y = self.reversible_layer(x)
+    self._cache_entry(y, x)
     return y
 
   def _log_prob(self, value):
-    x = self.reversible_layer.reverse(value)
-    log_det_jacobian = self.reversible_layer.log_det_jacobian(value)
+    x, log_det_jacobian = self._reverse_and_log_det(value)
     return self.base.log_prob(x) + log_det_jacobian
 
   def _prob(self, value):
     if not hasattr(self.base, '_prob'):
       return tf.exp(self.log_prob(value))
-    x = self.reversible_layer.reverse(value)
-    log_det_jacobian = self.reversible_layer.log_det_jacobian(value)
+    x, log_det_jacobian = self._reverse_and_log_det(value)
     return self.base.prob(x) * tf.exp(log_det_jacobian)
 
   def _log_cdf(self, value):
-    x = self.reversible_layer.reverse(value)
-    return self.base.log_cdf(x)
+    return self.base.log_cdf(self._reverse(value))
 
   def _cdf(self, value):
-    x = self.reversible_layer.reverse(value)
-    return self.base.cdf(x)
+    return self.base.cdf(self._reverse(value))
 
   def _log_survival_function(self, value):
-    x = self.reversible_layer.reverse(value)
-    return self.base.log_survival_function(x)
+    return self.base.log_survival_function(self._reverse(value))
 
   def _survival_function(self, value):
-    x = self.reversible_layer.reverse(value)
-    return self.base.survival_function(x)
+    return self.base.survival_function(self._reverse(value))
 
   def _quantile(self, value):
     inverse_cdf = self.base.quantile(value)
@@ -109,6 +122,57 @@ class TransformedDistribution(tfp.distributions.Distribution):
     entropy = self.base.entropy() - log_det_jacobian
     return entropy
 
+  def _reverse(self, value):
+    """Returns `reversible_layer.reverse(value)`, using the cache."""
+    entry = self._cache_entry(value)
+    if entry['x'] is None:
+      entry['x'] = self.reversible_layer.reverse(value)
+    return entry['x']
+
+  def _reverse_and_log_det(self, value):
+    """Returns the reverse of value and its log-det-Jacobian, using the cache."""
+    entry = self._cache_entry(value)
+    if entry['log_det_jacobian'] is None:
+      if (entry['x'] is None and
+          hasattr(self.reversible_layer, 'reverse_and_log_det')):
+        entry['x'], entry['log_det_jacobian'] = (
+            self.reversible_layer.reverse_and_log_det(value))
+      else:
+        entry['log_det_jacobian'] = self.reversible_layer.log_det_jacobian(
+            value)
+    if entry['x'] is None:
+      entry['x'] = self.reversible_layer.reverse(value)
+    return entry['x'], entry['log_det_jacobian']
+
+  def _cache_entry(self, value, x=None):
+    """Returns the cache entry for value, adding one if needed.
+
+    Entries are keyed on the identity of value and of the graph it is used in,
+    so Tensors cached while tracing a function are not reused outside of it.
+    Values are held by weak reference, and entries from other graphs are
+    dropped. When executing eagerly, the returned entry is not cached.
+
+    Args:
+      value: Tensor in the support of the distribution.
+      x: Optional Tensor, the known reverse of value.
+
+    Returns:
+      Dictionary with keys 'value', 'graph', 'x', and 'log_det_jacobian'. The
+      last two are None if not yet computed.
+    """
+    if tf.executing_eagerly():
+      return {'value': None, 'graph': None, 'x': x, 'log_det_jacobian': None}
+    graph = tf1.get_default_graph()
+    self._cache = [entry for entry in self._cache
+                   if entry['graph'] is graph and entry['value']() is not None]
+    for entry in self._cache:
+      if entry['value']() is value:
+        return entry
+    entry = {'value': weakref.ref(value), 'graph': graph, 'x': x,
+             'log_det_jacobian': None}
+    self._cache = self._cache[-(_CACHE_SIZE - 1):] + [entry]
+    return entry
+
 
 @trace.traceable
 def TransformedRandomVariable(rv,  # pylint: disable=invalid-name
@@ -20,8 +20,10 @@ from __future__ import division
 from __future__ import print_function
 
 import edward2 as ed
+from edward2.tensorflow import transformed_random_variable
 import numpy as np
 import tensorflow.compat.v2 as tf
+import tensorflow_probability as tfp
 
 
 class TransformedRandomVariableTest(tf.test.TestCase):
@@ -51,6 +53,91 @@ class TransformedRandomVariableTest(tf.test.TestCase):
     self.assertGreater(y_sample, 0.)
     self.assertTrue(np.isfinite(y_log_prob))
 
+  def testTransformedDistributionReversesOnce(self):
+    class CountingExp(tf.keras.layers.Layer):
+      """Exponential activation function counting calls to its reverse."""
+
+      def __init__(self, **kwargs):
+        super(CountingExp, self).__init__(**kwargs)
+        self.num_reverse_calls = 0
+
+      def call(self, inputs):
+        return tf.exp(inputs)
+
+      def reverse(self, inputs):
+        self.num_reverse_calls += 1
+        return tf.math.log(inputs)
+
+      def log_det_jacobian(self, inputs):
+        raise ValueError('reverse_and_log_det should be used instead.')
+
+      def reverse_and_log_det(self, inputs):
+        self.num_reverse_calls += 1
+        outputs = tf.math.log(inputs)
+        return outputs, -outputs
+
+    layer = CountingExp()
+    base = tfp.distributions.Normal(0., 1.)
+    distribution = transformed_random_variable.TransformedDistribution(
+        base, layer)
+
+    @tf.function
+    def score(value):
+      return (distribution.log_prob(value),
+              distribution.prob(value),
+              distribution.cdf(value),
+              distribution.survival_function(value))
+
+    value = tf.constant([0.5, 1., 2.])
+    log_prob, prob, cdf, survival_function = score(value)
+    self.assertEqual(layer.num_reverse_calls, 1)
+    expected = tfp.distributions.LogNormal(0., 1.)
+    self.assertAllClose(log_prob, expected.log_prob(value))
+    self.assertAllClose(prob, expected.prob(value))
+    self.assertAllClose(cdf, expected.cdf(value))
+    self.assertAllClose(survival_function, expected.survival_function(value))
+
+    # Eager calls reverse the value each time.
+    distribution.log_prob(value)
+    distribution.log_prob(value)
+    self.assertEqual(layer.num_reverse_calls, 3)
+
+  def testTransformedDistributionVariableUpdate(self):
+    class Scale(tf.keras.layers.Layer):
+      """Scales inputs by a trainable exp(log_scale)."""
+
+      def build(self, input_shape):
+        self.log_scale = self.add_weight('log_scale', shape=(),
+                                         initializer='zeros')
+        self.built = True
+
+      def call(self, inputs):
+        return inputs * tf.exp(self.log_scale)
+
+      def reverse(self, inputs):
+        return inputs * tf.exp(-self.log_scale)
+
+      def log_det_jacobian(self, inputs):
+        return -self.log_scale * tf.ones_like(inputs)
+
+    layer = Scale()
+    layer.build(())
+    distribution = transformed_random_variable.TransformedDistribution(
+        tfp.distributions.Normal(0., 1.), layer)
+    value = tf.constant([0.5, 1., 2.])
+    self.assertAllClose(distribution.log_prob(value),
+                        tfp.distributions.Normal(0., 1.).log_prob(value))
+
+    layer.log_scale.assign(np.log(2.))
+    with tf.GradientTape() as tape:
+      log_prob = distribution.log_prob(value)
+    self.assertAllClose(log_prob,
+                        tfp.distributions.Normal(0., 2.).log_prob(value))
+    grad = tape.gradient(log_prob, layer.log_scale)
+    self.assertIsNotNone(grad)
+    # d/ds sum log Normal(value | 0, exp(s)) = sum (value^2 exp(-2s) - 1).
+    self.assertAllClose(grad, np.sum(value.numpy()**2 / 4. - 1.))
+
 
 if __name__ == '__main__':
   tf.enable_v2_behavior()